@@ -0,0 +1,119 @@
+"""
+CompressedText benchmark
+
+Builds the same synthetic workload (long answers, JSON tool params, Bash/Read
+style tool output) with compression disabled and enabled, then reports the
+database file size and read latency of full-thread history/tool-log reads.
+
+Usage:
+    python benchmarks/bench_compression.py [--threads 50] [--turns 20]
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from discord_ai_agent.database import SessionStore, PROFILES
+
+WORDS = (
+    "session thread agent tool result error file python discord database index "
+    "query stream commit latency bash grep read write config deploy log"
+).split()
+
+
+def fake_text(rng: random.Random, words: int) -> str:
+    """Generate pseudo-natural text"""
+    lines = []
+    for _ in range(max(1, words // 12)):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+    return "\n".join(lines)
+
+
+def fake_tool_output(rng: random.Random) -> str:
+    """Generate output resembling ls -la / file reads"""
+    return "\n".join(
+        f"-rw-r--r--  1 bot bot {rng.randint(100, 99999):>6} Oct 17 12:{i % 60:02d} "
+        f"{rng.choice(WORDS)}_{i}.py"
+        for i in range(rng.randint(20, 200))
+    )
+
+
+def populate(store: SessionStore, threads: int, turns: int) -> None:
+    """Write the synthetic workload"""
+    rng = random.Random(42)
+    for thread_id in range(threads):
+        store.create_thread_session(thread_id, user_id=thread_id, agent_name="bench")
+        for _ in range(turns):
+            store.add_message(thread_id, "user", fake_text(rng, 30))
+            for _ in range(3):
+                params = {"command": fake_text(rng, 10), "file_path": "/workspace/x.py"}
+                store.log_tool_use(
+                    thread_id,
+                    "Bash",
+                    json.dumps(params, indent=2, ensure_ascii=False),
+                    fake_tool_output(rng),
+                )
+            store.add_message(thread_id, "assistant", fake_text(rng, 400))
+    store.flush()
+
+
+def run(name: str, compression: str, threads: int, turns: int) -> None:
+    """Populate a fresh database and measure size and read latency"""
+    profile = replace(PROFILES["performance"], compression=compression)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        store = SessionStore(str(db_path), profile=profile)
+
+        start = time.perf_counter()
+        populate(store, threads, turns)
+        write_time = time.perf_counter() - start
+
+        # Checkpoint the WAL (readers first, so the writer closes last)
+        store.read_engine.dispose()
+        store.engine.dispose()
+        size_mb = sum(
+            p.stat().st_size for p in db_path.parent.glob(db_path.name + "*")
+        ) / 1024 / 1024
+
+        start = time.perf_counter()
+        for thread_id in range(threads):
+            store.get_conversation_history(thread_id)
+            store.get_tool_logs(thread_id)
+        read_ms = (time.perf_counter() - start) * 1000 / threads
+
+        print(
+            f"{name:<6} size={size_mb:7.2f} MB  write={write_time:6.2f}s  "
+            f"read(thread history + tool logs)={read_ms:6.2f} ms/thread"
+        )
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{args.threads} threads x {args.turns} turns (2 messages + 3 tool logs per turn)")
+    run("none", "none", args.threads, args.turns)
+    run("zlib", "zlib", args.threads, args.turns)
+    try:
+        import zstandard  # noqa: F401
+
+        run("zstd", "zstd", args.threads, args.turns)
+    except ImportError:
+        print("zstd   skipped (pip install zstandard)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+ThreadMessageQueue memory and per-operation cost
+
+Touches many threads the way the bot does (enqueue, take the lock, drain,
+go idle) and reports retained memory with eviction disabled and enabled,
+then times mark_deleted / get_queue_size on one deep queue.
+
+Usage:
+    python benchmarks/bench_message_queue.py [--threads 100000] [--depth 10000]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from discord_ai_agent.message_queue import QueueSettings, ThreadMessageQueue
+
+
+async def touch_threads(queue: ThreadMessageQueue, threads: int) -> None:
+    """One message per thread, processed to completion"""
+    for thread_id in range(threads):
+        queue.add_message(thread_id, message_id=thread_id, user_id=1, content="hello")
+        async with queue.get_lock(thread_id):
+            queue.set_processing(thread_id, True)
+            while queue.get_next_message(thread_id) is not None:
+                pass
+            queue.set_processing(thread_id, False)
+
+
+def retained_kb(idle_ttl: float, threads: int) -> tuple:
+    queue = ThreadMessageQueue(QueueSettings(idle_ttl=idle_ttl))
+    tracemalloc.start()
+    asyncio.run(touch_threads(queue, threads))
+    queue.evict_idle()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / 1024, queue.get_stats()["total_threads"]
+
+
+def per_call_us(func, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=100_000)
+    parser.add_argument("--depth", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{args.threads} threads touched once")
+    for label, ttl in (("no eviction", float("inf")), ("idle_ttl=0", 0.0)):
+        kb, kept = retained_kb(ttl, args.threads)
+        print(f"  {label:<14}{kb:>10.0f} KB retained, {kept} thread states")
+
+    queue = ThreadMessageQueue()
+    for message_id in range(args.depth):
+        queue.add_message(1, message_id, user_id=1, content="x")
+    calls = min(args.depth, 5000)
+    size_us = per_call_us(lambda i: queue.get_queue_size(1), calls)
+    delete_us = per_call_us(lambda i: queue.mark_deleted(1, args.depth - 1 - i), calls)
+    print(f"queue depth {args.depth}")
+    print(f"  get_queue_size {size_us:>8.2f} us")
+    print(f"  mark_deleted   {delete_us:>8.2f} us (from the back of the queue)")
+
+
+if __name__ == "__main__":
+    main()
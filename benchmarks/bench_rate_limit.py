@@ -0,0 +1,109 @@
+"""
+RateLimiter check cost, memory and cleanup at many active users
+
+Gives every user a request history (one request a minute for --history
+minutes, on a simulated clock), then times one more check per user and
+reports the memory retained per user. The previous implementation, which
+kept every request timestamp of the last hour, is included for comparison.
+Finally every user goes idle and cleanup() is timed.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [--users 100000] [--history 10]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from discord_ai_agent.rate_limit import RateLimiter
+
+
+class TimestampListLimiter:
+    """The previous RateLimiter (one timestamp per request), for comparison"""
+
+    def __init__(self, per_minute, per_hour, clock):
+        self.per_minute = per_minute
+        self.per_hour = per_hour
+        self.clock = clock
+        self.requests = defaultdict(list)
+
+    async def check_rate_limit(self, user_id):
+        now = self.clock()
+        self.requests[user_id] = [r for r in self.requests[user_id] if now - r < 3600]
+        user_requests = self.requests[user_id]
+        minute_ago = now - 60
+        if sum(1 for r in user_requests if r > minute_ago) >= self.per_minute:
+            min(r for r in user_requests if r > minute_ago)
+            return False, ""
+        if len(user_requests) >= self.per_hour:
+            min(user_requests)
+            return False, ""
+        user_requests.append(now)
+        return True, ""
+
+
+async def fill(limiter, clock, users, history):
+    """One request per user per simulated minute"""
+    for _ in range(history):
+        clock[0] += 60
+        for user_id in range(users):
+            await limiter.check_rate_limit(user_id)
+
+
+async def per_check_us(limiter, users):
+    start = time.perf_counter()
+    for user_id in range(users):
+        await limiter.check_rate_limit(user_id)
+    return (time.perf_counter() - start) * 1e6 / users
+
+
+def measure(name, make, users, history):
+    clock = [0.0]
+    tracemalloc.start()
+    limiter = make(lambda: clock[0])
+    asyncio.run(fill(limiter, clock, users, history))
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    clock[0] += 1
+    cost = asyncio.run(per_check_us(limiter, users))
+    print(f"{name:<22} {cost:8.2f} us/check {retained / users:8.0f} B/user")
+    return limiter, clock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--history", type=int, default=10, help="past requests per user")
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.history} requests each in the last hour")
+    measure(
+        "timestamp list (old)",
+        lambda clock: TimestampListLimiter(10, 100, clock),
+        args.users,
+        args.history,
+    )
+    limiter, clock = measure(
+        "sliding window counter",
+        lambda clock: RateLimiter(10, 100, clock=clock),
+        args.users,
+        args.history,
+    )
+
+    clock[0] += 2 * 3600
+    start = time.perf_counter()
+    removed = limiter.cleanup()
+    print(
+        f"cleanup: {removed} idle users in {(time.perf_counter() - start) * 1e3:.1f} ms, "
+        f"{limiter.get_stats()['tracked_users']} left"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Hot read path microbenchmark (ORM vs Core)
+
+Measures per-call cost of the lookups on the message path, comparing the
+previous ORM reads (declarative instances in a short-lived Session) with the
+Core statements in database/queries.py that build slotted rows directly.
+The thread cache is disabled so every thread lookup reaches the database.
+
+Usage:
+    python benchmarks/bench_read_path.py [--threads 200] [--calls 5000]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import desc
+
+from discord_ai_agent.database import (
+    SessionStore,
+    PROFILES,
+    ThreadInfo,
+    ThreadSession,
+    ConversationHistory,
+)
+from discord_ai_agent.database.models import ChannelSettings
+
+
+def per_call_us(func, calls: int) -> float:
+    """Average wall time of func(i) in microseconds"""
+    func(0)  # Warm the statement cache and connection pool
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) * 1e6 / calls
+
+
+def orm_thread_info(store: SessionStore, thread_id: int) -> ThreadInfo:
+    """Previous cache-miss path: ORM query, then convert"""
+    db = store._get_read_session()
+    try:
+        session = (
+            db.query(ThreadSession).filter(ThreadSession.thread_id == thread_id).first()
+        )
+        return SessionStore._to_thread_info(session)
+    finally:
+        db.close()
+
+
+def orm_recent_messages(store: SessionStore, thread_id: int):
+    """Previous get_recent_messages"""
+    db = store._get_read_session()
+    try:
+        return (
+            db.query(ConversationHistory)
+            .filter(ConversationHistory.thread_id == thread_id)
+            .order_by(desc(ConversationHistory.id))
+            .limit(10)
+            .all()
+        )
+    finally:
+        db.close()
+
+
+def orm_channel_routes(store: SessionStore) -> int:
+    """Previous routing-table load"""
+    db = store._get_read_session()
+    try:
+        return len([SessionStore._to_channel_route(s) for s in db.query(ChannelSettings)])
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    profile = replace(PROFILES["performance"], thread_cache_size=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(str(Path(tmp) / "bench.db"), profile=profile)
+        for thread_id in range(args.threads):
+            store.create_thread_session(thread_id, user_id=thread_id, agent_name="bench")
+            store.set_channel_default_agent(thread_id, guild_id=1, agent_name="bench")
+            for turn in range(20):
+                store.add_message(thread_id, "user", f"prompt {turn} " * 20)
+                store.add_message(thread_id, "assistant", f"answer {turn} " * 80)
+        store.flush()
+
+        n = args.threads
+        cases = [
+            (
+                "thread info (cache miss)",
+                lambda i: orm_thread_info(store, i % n),
+                lambda i: store.get_thread_info(i % n),
+            ),
+            (
+                "recent messages (10)",
+                lambda i: orm_recent_messages(store, i % n),
+                lambda i: store.get_recent_messages(i % n, 10),
+            ),
+            (
+                f"channel routes ({n} rows)",
+                lambda i: orm_channel_routes(store),
+                lambda i: store.refresh_channel_routes(),
+            ),
+        ]
+
+        print(f"{args.calls} calls each, {n} threads")
+        print(f"{'lookup':<28}{'ORM us':>10}{'Core us':>10}{'speedup':>10}")
+        for name, before, after in cases:
+            calls = args.calls if "routes" not in name else max(1, args.calls // 20)
+            orm = per_call_us(before, calls)
+            core = per_call_us(after, calls)
+            print(f"{name:<28}{orm:>10.1f}{core:>10.1f}{orm / core:>9.1f}x")
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
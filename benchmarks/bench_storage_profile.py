@@ -0,0 +1,98 @@
+"""
+SessionStore storage profile benchmark
+
+Compares SQLite storage profiles under concurrent writers (message + tool log
+inserts, as during agent turns) and concurrent channel-settings readers.
+
+Usage:
+    python benchmarks/bench_storage_profile.py [--threads 8] [--turns 50]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from discord_ai_agent.database import SessionStore, StorageProfile, PROFILES
+
+
+def run_profile(name: str, profile: StorageProfile, threads: int, turns: int) -> None:
+    """Run the workload against a fresh database using the given profile"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(str(Path(tmp) / "bench.db"), profile=profile)
+        for thread_id in range(threads):
+            store.create_thread_session(thread_id, user_id=thread_id, agent_name="bench")
+        store.set_channel_default_agent(1, guild_id=1, agent_name="bench")
+
+        errors = []
+        reads = [0]
+        stop_readers = threading.Event()
+
+        def writer(thread_id: int):
+            try:
+                for i in range(turns):
+                    store.add_message(thread_id, "user", f"prompt {i}")
+                    for _ in range(3):
+                        store.log_tool_use(thread_id, "Bash", '{"command": "ls"}')
+                    store.add_message(thread_id, "assistant", "answer " * 50)
+            except Exception as e:  # "database is locked" etc.
+                errors.append(e)
+
+        def reader():
+            while not stop_readers.is_set():
+                try:
+                    store.get_channel_settings(1)
+                    reads[0] += 1
+                except Exception as e:
+                    errors.append(e)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+
+        start = time.perf_counter()
+        for t in readers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        store.flush()
+        elapsed = time.perf_counter() - start
+        stop_readers.set()
+        for t in readers:
+            t.join()
+
+        rows = threads * turns * 5
+        print(
+            f"{name:<22} {elapsed:8.3f}s  {rows / elapsed:10.0f} rows/s  "
+            f"{reads[0] / elapsed:10.0f} reads/s  errors={len(errors)}"
+        )
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent writer threads")
+    parser.add_argument("--turns", type=int, default=50, help="Agent turns per thread")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{args.threads} writer threads x {args.turns} turns (5 rows per turn), 2 readers")
+    run_profile("legacy", PROFILES["legacy"], args.threads, args.turns)
+    run_profile("durable", PROFILES["durable"], args.threads, args.turns)
+    run_profile("performance", PROFILES["performance"], args.threads, args.turns)
+    run_profile(
+        "performance/batched",
+        replace(PROFILES["performance"], durability="batched"),
+        args.threads,
+        args.turns,
+    )
+
+
+if __name__ == "__main__":
+    main()
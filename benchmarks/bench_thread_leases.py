@@ -0,0 +1,284 @@
+"""
+Thread leases across bot processes: no turn runs twice, none is lost
+
+Starts several node processes on one shared SQLite session DB. Every node
+receives the same stream of thread messages (as replicas on the same gateway
+would, each with its own small delivery delay) and feeds it to the bot's own
+DiscordAIBot.on_message, process_thread_queue and run_lease_heartbeat: journal
+the message, lease the thread, queue it locally, claim it before the turn,
+ack it afterwards (leaving a tombstone), adopt journal entries of expired
+threads on each heartbeat. Only Discord is stubbed out, and the agent turn
+is a sleep. One node is SIGKILLed mid-run. Every turn start is appended to a
+shared log; afterwards the log must show each message started at most once,
+and every message either handled or reported as interrupted.
+
+Usage:
+    python benchmarks/bench_thread_leases.py [--nodes 3] [--messages 600]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import discord
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from discord_ai_agent.database import open_backend
+from discord_ai_agent.discord_bot import DiscordAIBot
+from discord_ai_agent.message_queue import QueueSettings, ThreadMessageQueue
+from discord_ai_agent.ownership import LeaseSettings, ThreadOwnership
+
+BOT_ID = 42
+FIRST_MESSAGE_ID = 1000
+
+
+def events(args):
+    """(thread ID, message ID) of the shared message stream, in order"""
+    rng = random.Random(args.seed)
+    return [
+        (rng.randrange(args.threads) + 1, FIRST_MESSAGE_ID + i)
+        for i in range(args.messages)
+    ]
+
+
+class TurnLog:
+    """Shared append-only log of turn starts, adoptions and interruptions"""
+
+    def __init__(self, path, name):
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self.name = name
+
+    def __call__(self, kind, thread_id, message_ids):
+        # O_APPEND: one write per line, so lines of different nodes never mix
+        ids = ",".join(map(str, message_ids))
+        os.write(self.fd, f"{kind} {self.name} {thread_id} {ids}\n".encode())
+
+
+class PartialMessage:
+    """Reactions on a message the bot has not fetched; they go nowhere"""
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+
+class BenchThread(discord.Thread):
+    """A thread created by the bot; messages and notices go nowhere"""
+
+    def __init__(self, thread_id):
+        self.id = thread_id
+        self.owner_id = BOT_ID
+
+    def get_partial_message(self, message_id):
+        return PartialMessage()
+
+    async def send(self, *args, **kwargs):
+        pass
+
+
+class BenchMessage(PartialMessage):
+    """What on_message reads of a discord.Message"""
+
+    def __init__(self, thread, message_id):
+        self.id = message_id
+        self.channel = thread
+        self.content = f"m{message_id}"
+        self.author = SimpleNamespace(id=1, bot=False, name="user", display_name="user")
+        self.attachments = []
+
+
+class LoggingOwnership(ThreadOwnership):
+    """ThreadOwnership that logs what each scan adopted"""
+
+    def __init__(self, store, settings, log):
+        super().__init__(store, settings)
+        self.log = log
+
+    async def scan(self, bot_id):
+        adopted, interrupted = await super().scan(bot_id)
+        for thread_id, message_ids in interrupted.items():
+            self.log("interrupted", thread_id, message_ids)
+        for thread_id, entries in adopted.items():
+            self.log("adopted", thread_id, [e.message_id for e in entries])
+        return adopted, interrupted
+
+
+class BenchBot(DiscordAIBot):
+    """DiscordAIBot with its queue and lease paths only, minus the gateway"""
+
+    user = SimpleNamespace(id=BOT_ID)  # Client.user is only set at login
+
+    def __init__(self, store, settings, log, turn_seconds):
+        # The state on_message, process_thread_queue and run_lease_heartbeat
+        # use; no agent registry, Claude CLI or Discord connection
+        self.session_store = store
+        self.message_queue = ThreadMessageQueue(QueueSettings(durable=True))
+        self.ownership = LoggingOwnership(store, settings, log)
+        self._hourglass_marked = set()
+        self._reaction_tasks = set()
+        self._shed_notices = {}
+        self.threads = {}
+        self.log = log
+        self.turn_seconds = turn_seconds
+
+    def is_ready(self):
+        return True
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_channel(self, thread_id):
+        thread = self.threads.get(thread_id)
+        if thread is None:
+            thread = self.threads[thread_id] = BenchThread(thread_id)
+        return thread
+
+    async def handle_thread_messages(self, thread, messages):
+        """The agent turn: log its start, then take turn_seconds"""
+        self.log("turn", thread.id, [m.message_id for m in messages])
+        await asyncio.sleep(self.turn_seconds)
+
+
+async def run_node(index, args, db_path, log_path, start):
+    logging.disable(logging.WARNING)
+    store = open_backend(None, db_path)
+    await store.start()
+    settings = LeaseSettings(
+        enabled=True, ttl=args.ttl, heartbeat=args.heartbeat, node_id=f"node{index}"
+    )
+    bot = BenchBot(store, settings, TurnLog(log_path, f"node{index}"), args.turn)
+    tasks = set()
+
+    async def heartbeats():
+        while True:
+            await asyncio.sleep(args.heartbeat)
+            await bot.run_lease_heartbeat()
+
+    beat = asyncio.create_task(heartbeats())
+    rng = random.Random(args.seed * 100 + index)
+    for i, (thread_id, message_id) in enumerate(events(args)):
+        # Each replica sees the gateway event after its own small delay
+        delay = start + i * args.interval + rng.uniform(0, args.jitter) - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = BenchMessage(bot.get_channel(thread_id), message_id)
+        task = asyncio.create_task(bot.on_message(message))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    # Keep adopting until the journal is drained
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        await asyncio.sleep(args.heartbeat)
+        busy = tasks or bot._reaction_tasks
+        if not busy and not await store.load_message_queue(BOT_ID):
+            break
+    beat.cancel()
+    pending = [*tasks, *bot._reaction_tasks]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(beat, *pending, return_exceptions=True)
+    await bot.ownership.release_all()
+    await store.close()
+
+
+def node_main(index, args, db_path, log_path, start):
+    asyncio.run(run_node(index, args, db_path, log_path, start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between messages")
+    parser.add_argument("--jitter", type=float, default=0.003, help="max delivery delay per node")
+    parser.add_argument("--turn", type=float, default=0.05, help="seconds per agent turn")
+    parser.add_argument("--ttl", type=float, default=2.0)
+    parser.add_argument("--heartbeat", type=float, default=0.5)
+    parser.add_argument("--kill-after", type=float, default=1.5, help="SIGKILL node0 (0 = never)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="max seconds to drain")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_thread_leases_")
+    db_path = os.path.join(workdir, "sessions.db")
+    log_path = os.path.join(workdir, "turns.log")
+    Path(log_path).touch()
+
+    async def migrate():
+        store = open_backend(None, db_path)
+        await store.start()
+        await store.close()
+
+    logging.disable(logging.INFO)
+    asyncio.run(migrate())
+
+    async def still_journaled():
+        store = open_backend(None, db_path)
+        await store.start()
+        entries = await store.load_message_queue(BOT_ID)
+        await store.close()
+        return {entry.message_id for entry in entries}
+
+    start = time.time() + 3.0  # Let every node connect before the first message
+    ctx = multiprocessing.get_context("spawn")
+    nodes = [
+        ctx.Process(target=node_main, args=(i, args, db_path, log_path, start))
+        for i in range(args.nodes)
+    ]
+    for node in nodes:
+        node.start()
+    if args.kill_after > 0:
+        time.sleep(max(0.0, start + args.kill_after - time.time()))
+        os.kill(nodes[0].pid, signal.SIGKILL)
+        print(f"SIGKILL node0 at +{args.kill_after:.1f}s")
+    for node in nodes:
+        node.join()
+    elapsed = time.time() - start
+
+    started = Counter()
+    per_node = Counter()
+    interrupted = set()
+    takeovers = set()
+    for line in Path(log_path).read_text().splitlines():
+        kind, name, thread_id, ids = line.split(" ")
+        message_ids = [int(i) for i in ids.split(",")]
+        if kind == "turn":
+            started.update(message_ids)
+            per_node[name] += 1
+        elif kind == "interrupted":
+            interrupted.update(message_ids)
+        elif kind == "adopted":
+            takeovers.add(int(thread_id))
+
+    all_ids = {message_id for _, message_id in events(args)}
+    duplicates = sorted(m for m, count in started.items() if count > 1)
+    unfinished = asyncio.run(still_journaled())
+    missing = sorted(all_ids - started.keys() - interrupted - unfinished)
+    print(f"{args.messages} messages in {args.threads} threads, {args.nodes} nodes, {elapsed:.1f}s")
+    print("turns per node: " + ", ".join(f"{n}={c}" for n, c in sorted(per_node.items())))
+    print(f"threads adopted from the journal: {len(takeovers)}")
+    print(f"interrupted (claimed by a dead node): {len(interrupted)}")
+    print(f"started twice: {len(duplicates)} {duplicates[:10]}")
+    print(f"lost: {len(missing)} {missing[:10]}")
+    if unfinished:
+        print(f"still journaled after --timeout: {len(unfinished)}")
+    sys.exit(1 if duplicates or missing or unfinished else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Application Config Loader
+
+Loads non-secret bot settings from config.yaml in the project root.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = Path(__file__).parent.parent / "config.yaml"
+
+
+def load_config_section(name: str, config_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Load one top-level section of config.yaml
+
+    Args:
+        name: Section name (e.g. "storage")
+        config_path: Path to config.yaml (default: project root)
+
+    Returns:
+        Section contents, or an empty dict if the file or section is missing
+    """
+    path = Path(config_path) if config_path else CONFIG_PATH
+    if not path.exists():
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config_data = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"Failed to load {path}: {e}")
+        return {}
+
+    return config_data.get(name) or {}
@@ -0,0 +1,254 @@
+"""Registry of in-flight agent turns, so they can be cancelled
+
+Each agent turn runs in its own task, registered under its thread ID and the
+IDs of the messages that triggered it. A turn is cancelled by thread (/cancel,
+an admin, shutdown) or by one of its trigger messages (the prompt was
+deleted). Cancelling does two things at once:
+
+- Cancels the turn's task. The CancelledError unwinds the Agent SDK stream,
+  lets the bot record what the turn produced so far and releases the
+  scheduler slot, so the next queued turn can start.
+- Terminates the turn's process tree. The Claude CLI is started with a
+  per-turn marker in its environment (TURN_ENV_VAR). Every process that
+  inherited it (the CLI, its MCP servers, Bash tool commands, including ones
+  reparented after their parent died) gets SIGTERM, then SIGKILL after
+  kill_grace seconds. Processes are found through /proc, so on platforms
+  without it only the SDK's own transport shutdown applies.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Environment variable that tags every process spawned for one agent turn
+TURN_ENV_VAR = "DISCORD_AI_AGENT_TURN"
+
+# Seconds between SIGTERM and SIGKILL for a cancelled turn's processes
+KILL_GRACE = 3.0
+
+_SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+@dataclass(eq=False)
+class RunningTurn:
+    """One agent turn registered with TurnRegistry"""
+
+    thread_id: int
+    user_id: int
+    trigger_ids: Tuple[int, ...]  # Messages whose deletion cancels the turn
+    token: str  # Value of TURN_ENV_VAR for the turn's processes
+    task: Optional[asyncio.Task] = None
+    started_at: float = field(default_factory=time.monotonic)
+    cancel_reason: Optional[str] = None
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Environment to add to the Claude CLI's so its processes can be found"""
+        return {TURN_ENV_VAR: self.token}
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+
+def _tagged_pids(token: str) -> List[int]:
+    """PIDs of live processes whose environment carries the turn marker"""
+    marker = f"{TURN_ENV_VAR}={token}".encode()
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    pids = []
+    for name in entries:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/environ", "rb") as f:
+                environ = f.read()
+        except OSError:
+            continue  # Exited, or not ours
+        if marker in environ.split(b"\0"):
+            pids.append(int(name))
+    return pids
+
+
+def _send_signal(pids: Iterable[int], sig: int) -> None:
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+async def terminate_turn_processes(token: str, grace: float = KILL_GRACE) -> int:
+    """
+    Terminate every process tagged with a turn's marker
+
+    Args:
+        token: RunningTurn.token
+        grace: Seconds to wait after SIGTERM before sending SIGKILL
+
+    Returns:
+        Number of processes signalled
+    """
+    pids = await asyncio.to_thread(_tagged_pids, token)
+    if not pids:
+        return 0
+    _send_signal(pids, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    survivors = pids
+    while survivors and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        survivors = await asyncio.to_thread(_tagged_pids, token)
+    if survivors:
+        logger.warning(f"Killing {len(survivors)} processes that ignored SIGTERM")
+        _send_signal(survivors, _SIGKILL)
+    return len(pids)
+
+
+class TurnRegistry:
+    """
+    In-flight agent turns by thread, with cancellation
+
+    Use ``await registry.run(thread_id, user_id, trigger_ids, turn_func)``
+    around the agent run; cancel() / cancel_message() may be called from any
+    other task on the same event loop.
+    """
+
+    def __init__(self, kill_grace: float = KILL_GRACE):
+        """
+        Initialize the registry
+
+        Args:
+            kill_grace: Seconds between SIGTERM and SIGKILL on cancellation
+        """
+        self.kill_grace = kill_grace
+        self._turns: Dict[int, RunningTurn] = {}
+        self._by_message: Dict[int, int] = {}  # trigger message ID -> thread ID
+        self._kill_tasks: set[asyncio.Task] = set()
+        self._cancelled_total = 0
+        self._killed_total = 0  # Processes signalled by cancellations
+
+    async def run(
+        self,
+        thread_id: int,
+        user_id: int,
+        trigger_ids: Iterable[int],
+        turn_func: Callable[[RunningTurn], Awaitable[None]],
+    ) -> RunningTurn:
+        """
+        Run one agent turn in its own task until it finishes or is cancelled
+
+        Args:
+            thread_id: Discord thread ID
+            user_id: Discord user ID of the requester
+            trigger_ids: IDs of the messages that triggered the turn
+            turn_func: Called with the RunningTurn; returns the turn's coroutine
+
+        Returns:
+            The finished turn (``turn.cancelled`` tells whether it was cancelled)
+
+        Raises:
+            RuntimeError: If the thread already has a turn running
+        """
+        if thread_id in self._turns:
+            raise RuntimeError(f"Thread {thread_id} already has an agent turn running")
+        turn = RunningTurn(thread_id, user_id, tuple(trigger_ids), secrets.token_hex(8))
+        turn.task = asyncio.create_task(turn_func(turn), name=f"agent-turn-{thread_id}")
+        self._turns[thread_id] = turn
+        for message_id in turn.trigger_ids:
+            self._by_message[message_id] = thread_id
+        try:
+            await turn.task
+        except asyncio.CancelledError:
+            # Swallow only our own cancellation, not that of the caller
+            current = asyncio.current_task()
+            if not turn.cancelled or (current is not None and current.cancelling()):
+                raise
+        finally:
+            del self._turns[thread_id]
+            for message_id in turn.trigger_ids:
+                self._by_message.pop(message_id, None)
+        return turn
+
+    def get(self, thread_id: int) -> Optional[RunningTurn]:
+        """Turn running in a thread, if any"""
+        return self._turns.get(thread_id)
+
+    def cancel(self, thread_id: int, reason: str) -> bool:
+        """
+        Cancel the turn running in a thread and terminate its processes
+
+        Args:
+            thread_id: Discord thread ID
+            reason: Why the turn was cancelled (shown to users)
+
+        Returns:
+            True if a running turn was cancelled
+        """
+        turn = self._turns.get(thread_id)
+        if turn is None or turn.cancelled or turn.task.done():
+            return False
+        turn.cancel_reason = reason
+        turn.task.cancel()
+        self._cancelled_total += 1
+        logger.info(
+            f"Agent turn cancelled: thread={thread_id}, reason={reason}, "
+            f"ran {time.monotonic() - turn.started_at:.1f}s"
+        )
+        task = asyncio.create_task(self._terminate(turn))
+        self._kill_tasks.add(task)
+        task.add_done_callback(self._kill_tasks.discard)
+        return True
+
+    def cancel_message(self, message_id: int, reason: str) -> bool:
+        """
+        Cancel the turn triggered by a message (e.g. because it was deleted)
+
+        Returns:
+            True if a running turn was cancelled
+        """
+        thread_id = self._by_message.get(message_id)
+        return thread_id is not None and self.cancel(thread_id, reason)
+
+    async def cancel_all(self, reason: str) -> int:
+        """
+        Cancel every running turn and wait until their processes are gone
+
+        Returns:
+            Number of turns cancelled
+        """
+        cancelled = sum(self.cancel(thread_id, reason) for thread_id in list(self._turns))
+        await asyncio.gather(*self._kill_tasks, return_exceptions=True)
+        return cancelled
+
+    async def _terminate(self, turn: RunningTurn) -> None:
+        try:
+            killed = await terminate_turn_processes(turn.token, self.kill_grace)
+        except Exception as e:
+            logger.error(f"Failed to terminate processes of thread {turn.thread_id}: {e}")
+            return
+        self._killed_total += killed
+        if killed:
+            logger.info(f"Terminated {killed} processes of thread {turn.thread_id}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get registry statistics
+
+        Returns:
+            Dictionary with running/cancelled turn counts and the number of
+            processes signalled by cancellations
+        """
+        return {
+            "running_turns": len(self._turns),
+            "cancelled_turns": self._cancelled_total,
+            "killed_processes": self._killed_total,
+        }
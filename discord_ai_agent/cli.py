@@ -78,6 +78,17 @@ def main():
     """Main CLI entry point"""
     setup_environment()
 
+    # Database maintenance subcommands (e.g. compress-db)
+    from discord_ai_agent import db_cli
+
+    if len(sys.argv) > 1 and sys.argv[1] in db_cli.COMMANDS:
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+            datefmt="%H:%M:%S",
+        )
+        sys.exit(db_cli.main(sys.argv[1:]))
+
     parser = argparse.ArgumentParser(
         description="Discord AI Agent Bot - AI-powered Discord bots with Claude Agent SDK",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -97,6 +108,26 @@ Examples:
   # Show version
   discord-ai-agent --version
 
+  # Compress existing conversation history / tool logs in the session DB
+  discord-ai-agent compress-db --db ./agents/shared_sessions.db --vacuum
+
+  # Archive idle threads / restore an archived thread
+  discord-ai-agent archive --db ./agents/shared_sessions.db --idle-days 30
+  discord-ai-agent restore-thread 123456789012345678
+
+  # Export transcripts for analysis / import into a fresh DB
+  discord-ai-agent export -o transcripts.jsonl.gz --since 2025-01-01 --agent default
+  discord-ai-agent export -o ./transcripts --format parquet --guild 123456789
+  discord-ai-agent import transcripts.jsonl.gz --db ./restored/shared_sessions.db
+
+  # Tool latency / error rate per day and agent
+  discord-ai-agent tool-stats --since 2025-01-01 --agent default
+
+  # Per-guild shards (storage.shards): copy an existing DB in, inspect, rebalance
+  discord-ai-agent shard-import --db ./agents/shared_sessions.db --shards 4
+  discord-ai-agent shard-status
+  discord-ai-agent shard-move 123456789 2
+
 For more information, visit: https://github.com/yourusername/discord-ai-agent
         """,
     )
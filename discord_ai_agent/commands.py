@@ -1,10 +1,13 @@
 """
 Discord Slash Commands
 
-Implements slash commands for agent selection and channel configuration.
+Implements slash commands for agent selection, channel configuration,
+conversation history search and cancelling a running agent.
 """
 
+import asyncio
 import logging
+import time
 from typing import List, TYPE_CHECKING
 
 import discord
@@ -15,6 +18,40 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Maximum hits shown by /search (keeps the reply under Discord's 2000 chars)
+SEARCH_RESULT_LIMIT = 8
+# /search everyone fetches this many times the limit, since hits in channels
+# the caller cannot read are dropped
+SEARCH_OVERFETCH = 4
+
+
+async def _can_read(
+    bot: "DiscordAIBot", interaction: discord.Interaction, thread_id: int
+) -> bool:
+    """
+    Check whether the invoking member may read a thread's messages
+
+    Args:
+        bot: DiscordAIBot instance
+        interaction: Slash command interaction (in a guild)
+        thread_id: Discord thread ID of a search hit
+
+    Returns:
+        True if the member can view the thread and read its history
+    """
+    channel = interaction.guild.get_channel_or_thread(thread_id)
+    if channel is None:
+        # Archived threads are not cached
+        try:
+            channel = await bot.fetch_channel(thread_id)
+        except discord.HTTPException:
+            return False  # Gone, hidden from the bot, or unknown: do not show it
+    guild = getattr(channel, "guild", None)
+    if guild is None or guild.id != interaction.guild_id:
+        return False
+    permissions = channel.permissions_for(interaction.user)
+    return permissions.view_channel and permissions.read_message_history
+
 
 async def setup_commands(bot: "DiscordAIBot"):
     """
@@ -129,7 +166,7 @@ async def setup_commands(bot: "DiscordAIBot"):
         try:
             if agent is None:
                 # Show current settings
-                settings = bot.session_store.get_channel_settings(
+                settings = await bot.session_store.get_channel_settings(
                     interaction.channel_id
                 )
                 if settings and settings.default_agent:
@@ -151,7 +188,7 @@ async def setup_commands(bot: "DiscordAIBot"):
 
             # Clear settings if empty string
             if agent == "":
-                bot.session_store.set_channel_default_agent(
+                await bot.session_store.set_channel_default_agent(
                     channel_id=interaction.channel_id,
                     guild_id=interaction.guild_id,
                     agent_name=None,
@@ -180,7 +217,7 @@ async def setup_commands(bot: "DiscordAIBot"):
                 return
 
             # Update settings
-            bot.session_store.set_channel_default_agent(
+            await bot.session_store.set_channel_default_agent(
                 channel_id=interaction.channel_id,
                 guild_id=interaction.guild_id,
                 agent_name=agent,
@@ -251,4 +288,143 @@ async def setup_commands(bot: "DiscordAIBot"):
             logger.error(f"Error in settings autocomplete: {e}")
             return []
 
+    @bot.tree.command(name="search", description="過去の会話履歴を検索")
+    @app_commands.describe(
+        query="検索キーワード (スペース区切りでAND検索)",
+        everyone="サーバー内の全スレッドを検索 (スレッド管理権限が必要。デフォルト: 自分のスレッドのみ)",
+    )
+    async def search(
+        interaction: discord.Interaction,
+        query: str,
+        everyone: bool = False,
+    ):
+        """Full-text search over conversation history"""
+        try:
+            if everyone:
+                # Other users' threads: only within this server, for moderators
+                if interaction.guild_id is None:
+                    await interaction.response.send_message(
+                        "❌ `everyone` はサーバー内でのみ使用できます", ephemeral=True
+                    )
+                    return
+                if not interaction.permissions.manage_threads:
+                    await interaction.response.send_message(
+                        "❌ `everyone` の検索には管理者 (スレッド管理権限) が必要です",
+                        ephemeral=True,
+                    )
+                    return
+
+            # Checking uncached threads may need REST calls: reply within 3 s
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+            started = time.perf_counter()
+            hits = await bot.session_store.search_messages(
+                query,
+                user_id=None if everyone else interaction.user.id,
+                guild_id=interaction.guild_id,
+                # Hits in unreadable channels are dropped below
+                limit=SEARCH_RESULT_LIMIT * (SEARCH_OVERFETCH if everyone else 1),
+            )
+            if everyone:
+                # One check per thread, all threads resolved concurrently
+                thread_ids = list(dict.fromkeys(hit.thread_id for hit in hits))
+                allowed = await asyncio.gather(
+                    *(_can_read(bot, interaction, t) for t in thread_ids)
+                )
+                readable = {t for t, ok in zip(thread_ids, allowed) if ok}
+                hits = [hit for hit in hits if hit.thread_id in readable][
+                    :SEARCH_RESULT_LIMIT
+                ]
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if not hits:
+                await interaction.followup.send(
+                    f"🔍 `{query}` に一致するメッセージは見つかりませんでした",
+                    ephemeral=True,
+                )
+                return
+
+            lines = [f"🔍 `{query}` の検索結果: {len(hits)}件 ({elapsed_ms:.0f}ms)"]
+            for i, hit in enumerate(hits, 1):
+                guild = hit.guild_id or "@me"
+                link = f"https://discord.com/channels/{guild}/{hit.thread_id}"
+                if hit.message_id:
+                    link += f"/{hit.message_id}"
+                snippet = " ".join(hit.snippet.split())
+                lines.append(
+                    f"**{i}.** {hit.created_at:%Y-%m-%d %H:%M} "
+                    f"`{hit.agent_name}` ({hit.role}) {link}\n> {snippet}"
+                )
+
+            content = "\n".join(lines)
+            if len(content) > 2000:  # Discord message limit
+                content = content[:1997] + "..."
+            await interaction.followup.send(content, ephemeral=True)
+
+            logger.info(
+                f"User {interaction.user.id} searched '{query}': "
+                f"{len(hits)} hits in {elapsed_ms:.1f}ms"
+            )
+
+        except Exception as e:
+            logger.error(f"Error in search command: {e}", exc_info=True)
+            try:
+                # After defer() only the followup can answer
+                send = (
+                    interaction.followup.send
+                    if interaction.response.is_done()
+                    else interaction.response.send_message
+                )
+                await send(f"❌ 検索中にエラーが発生しました: {str(e)}", ephemeral=True)
+            except discord.HTTPException as send_error:
+                logger.warning(f"Failed to report search error: {send_error}")
+
+    @bot.tree.command(name="cancel", description="このスレッドで実行中のエージェントを中断")
+    async def cancel(interaction: discord.Interaction):
+        """Cancel the agent turn running (or waiting) in this thread"""
+        try:
+            thread_id = interaction.channel_id
+            turn = bot.turns.get(thread_id)
+            if turn is None:
+                await interaction.response.send_message(
+                    "ℹ️ このスレッドで実行中の処理はありません", ephemeral=True
+                )
+                return
+
+            # The requester and the thread owner may cancel; so may anyone who
+            # can manage threads here (admins/moderators)
+            is_admin = interaction.permissions.manage_threads
+            allowed = is_admin or interaction.user.id == turn.user_id
+            if not allowed:
+                session = await bot.session_store.get_thread_info(thread_id)
+                allowed = session is not None and session.user_id == interaction.user.id
+            if not allowed:
+                await interaction.response.send_message(
+                    "❌ 中断できるのは依頼したユーザー・スレッドの作成者・"
+                    "管理者 (スレッド管理権限) のみです",
+                    ephemeral=True,
+                )
+                return
+
+            reason = f"{interaction.user.display_name} による /cancel"
+            if bot.turns.cancel(thread_id, reason):
+                await interaction.response.send_message(f"🛑 {reason}")
+                logger.info(
+                    f"User {interaction.user.id} cancelled the agent turn in thread {thread_id}"
+                )
+            else:
+                await interaction.response.send_message(
+                    "ℹ️ 処理は既に終了しています", ephemeral=True
+                )
+
+        except Exception as e:
+            logger.error(f"Error in cancel command: {e}", exc_info=True)
+            try:
+                await interaction.response.send_message(
+                    f"❌ 中断中にエラーが発生しました: {str(e)}",
+                    ephemeral=True,
+                )
+            except:
+                pass
+
     logger.info("Slash commands registered")
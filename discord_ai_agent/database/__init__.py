@@ -1,12 +1,42 @@
 """Database module for persistent session storage"""
 
 from .models import Base, ThreadSession, ConversationHistory, ToolLog
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
 from .session_store import SessionStore
+from .async_store import AsyncSessionStore
+from .memory_store import MemorySessionStore
+from .sharded_store import ShardedSessionStore, ShardMap
+from .backend import SessionBackend, open_backend
+from .storage_profile import StorageProfile, PROFILES
+from .retention import RetentionPolicy, RetentionManager
 
 __all__ = [
     "Base",
     "ThreadSession",
     "ConversationHistory",
     "ToolLog",
+    "ThreadInfo",
+    "ChannelRoute",
+    "MessageRow",
+    "SearchHit",
+    "ToolRollup",
+    "QueueEntry",
     "SessionStore",
+    "AsyncSessionStore",
+    "MemorySessionStore",
+    "ShardedSessionStore",
+    "ShardMap",
+    "SessionBackend",
+    "open_backend",
+    "StorageProfile",
+    "PROFILES",
+    "RetentionPolicy",
+    "RetentionManager",
 ]
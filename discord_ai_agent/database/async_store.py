@@ -0,0 +1,474 @@
+"""Async facade for SessionStore that keeps database I/O off the event loop"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+from .models import ThreadSession, ConversationHistory, ToolLog
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
+from .session_store import SessionStore
+from .sharded_store import ShardedSessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSessionStore:
+    """
+    Async wrapper around SessionStore (the SQLite SessionBackend)
+
+    Exposes the same method surface as SessionStore, but every call runs on a
+    dedicated executor so SQLite commits (and their fsyncs) never block the
+    Discord gateway heartbeat or other threads' streaming.
+
+    A single worker is used by default: SQLite allows one writer at a time, and
+    a single worker keeps writes in submission order. Over a
+    ShardedSessionStore, calls for one thread (or guild) run on a
+    single-worker executor of their shard instead, so each shard keeps its
+    writes in order while different shards commit in parallel; calls that
+    fan out to every shard use the shared executor.
+    """
+
+    def __init__(self, store: SessionStore, max_workers: int = 1):
+        """
+        Initialize the async session store
+
+        Args:
+            store: Underlying synchronous SessionStore (or ShardedSessionStore)
+            max_workers: Number of executor threads for database calls
+        """
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="session-store"
+        )
+        self._sharded = isinstance(store, ShardedSessionStore)
+        self._shard_executors: Dict[int, ThreadPoolExecutor] = {}
+
+    async def _run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking store call on the shared executor"""
+        return await self._run_on(self._executor, func, *args, **kwargs)
+
+    async def _run_on(
+        self, executor: ThreadPoolExecutor, func: Callable[..., Any], *args, **kwargs
+    ) -> Any:
+        """Run a blocking store call on the given executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def _shard_executor(self, index: int) -> ThreadPoolExecutor:
+        """Single-worker executor of one shard (created on first use)"""
+        executor = self._shard_executors.get(index)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"session-shard-{index:02d}"
+            )
+            self._shard_executors[index] = executor
+        return executor
+
+    async def _thread_executor(self, thread_id: int) -> ThreadPoolExecutor:
+        """Executor for calls about one thread"""
+        if not self._sharded:
+            return self._executor
+        index = self.store.cached_shard_index(thread_id)
+        if index is None:
+            # Unknown thread: look it up in every shard once
+            index = await self._run(self.store.shard_index_for_thread, thread_id)
+        return self._shard_executor(index)
+
+    def _guild_executor(self, guild_id: Optional[int]) -> ThreadPoolExecutor:
+        """Executor for calls about one guild"""
+        if not self._sharded:
+            return self._executor
+        return self._shard_executor(self.store.shard_map.shard_for_guild(guild_id))
+
+    async def _run_for_thread(
+        self, thread_id: int, func: Callable[..., Any], *args
+    ) -> Any:
+        """Run a blocking store call about one thread on its shard's executor"""
+        return await self._run_on(await self._thread_executor(thread_id), func, *args)
+
+    async def _iter_pages(
+        self, pages, executor: Optional[ThreadPoolExecutor] = None
+    ) -> AsyncIterator[List[Any]]:
+        """Advance a blocking page iterator on the executor, one page at a time"""
+        while True:
+            page = await self._run_on(executor or self._executor, next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def start(self) -> None:
+        """Nothing to do: SessionStore connects and migrates when constructed"""
+
+    async def close(self) -> None:
+        """Wait for pending database calls, flush buffered writes and shut down"""
+        for executor in [self._executor, *self._shard_executors.values()]:
+            await asyncio.to_thread(executor.shutdown, wait=True)
+        await asyncio.to_thread(self.store.close)
+        logger.info("Async session store closed")
+
+    async def flush(self) -> int:
+        """Async version of SessionStore.flush"""
+        return await self._run(self.store.flush)
+
+    # ========== Thread Session Management ==========
+
+    async def create_thread_session(
+        self,
+        thread_id: int,
+        user_id: int,
+        agent_name: str,
+        guild_id: Optional[int] = None,
+    ) -> ThreadSession:
+        """Async version of SessionStore.create_thread_session"""
+        return await self._run_on(
+            self._guild_executor(guild_id),
+            self.store.create_thread_session,
+            thread_id,
+            user_id,
+            agent_name,
+            guild_id,
+        )
+
+    async def get_thread_session(self, thread_id: int) -> Optional[ThreadSession]:
+        """Async version of SessionStore.get_thread_session"""
+        return await self._run_for_thread(
+            thread_id, self.store.get_thread_session, thread_id
+        )
+
+    async def get_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """
+        Async version of SessionStore.get_thread_info
+
+        Cache hits are answered inline without an executor round trip.
+        """
+        info = self.store.get_cached_thread_info(thread_id)
+        if info is not None:
+            return info
+        return await self._run_for_thread(
+            thread_id, self.store.get_thread_info, thread_id
+        )
+
+    async def update_last_active(self, thread_id: int) -> None:
+        """Async version of SessionStore.update_last_active"""
+        await self._run_for_thread(thread_id, self.store.update_last_active, thread_id)
+
+    async def update_sdk_session_id(self, thread_id: int, sdk_session_id: str) -> None:
+        """Async version of SessionStore.update_sdk_session_id"""
+        await self._run_for_thread(
+            thread_id, self.store.update_sdk_session_id, thread_id, sdk_session_id
+        )
+
+    async def set_thread_inactive(self, thread_id: int) -> None:
+        """Async version of SessionStore.set_thread_inactive"""
+        await self._run_for_thread(thread_id, self.store.set_thread_inactive, thread_id)
+
+    async def get_user_sessions(
+        self, user_id: int, active_only: bool = True
+    ) -> List[ThreadSession]:
+        """Async version of SessionStore.get_user_sessions"""
+        return await self._run(self.store.get_user_sessions, user_id, active_only)
+
+    async def delete_thread_session(self, thread_id: int) -> bool:
+        """Async version of SessionStore.delete_thread_session"""
+        return await self._run_for_thread(
+            thread_id, self.store.delete_thread_session, thread_id
+        )
+
+    # ========== Conversation History ==========
+
+    async def add_message(
+        self, thread_id: int, role: str, content: str, message_id: Optional[int] = None
+    ) -> ConversationHistory:
+        """Async version of SessionStore.add_message"""
+        return await self._run_for_thread(
+            thread_id, self.store.add_message, thread_id, role, content, message_id
+        )
+
+    async def get_conversation_history(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ConversationHistory]:
+        """Async version of SessionStore.get_conversation_history"""
+        return await self._run_for_thread(
+            thread_id, self.store.get_conversation_history, thread_id, limit
+        )
+
+    async def get_conversation_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ConversationHistory]:
+        """Async version of SessionStore.get_conversation_page"""
+        return await self._run_for_thread(
+            thread_id,
+            self.store.get_conversation_page,
+            thread_id,
+            after_id,
+            before_id,
+            limit,
+        )
+
+    async def iter_conversation_history(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ConversationHistory]]:
+        """Async version of SessionStore.iter_conversation_history"""
+        executor = await self._thread_executor(thread_id)
+        pages = self.store.iter_conversation_history(
+            thread_id, page_size, after_id, before_id, reverse
+        )
+        async for page in self._iter_pages(pages, executor):
+            yield page
+
+    async def get_recent_messages(self, thread_id: int, count: int = 10) -> List[MessageRow]:
+        """Async version of SessionStore.get_recent_messages"""
+        return await self._run_for_thread(
+            thread_id, self.store.get_recent_messages, thread_id, count
+        )
+
+    async def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[SearchHit]:
+        """Async version of SessionStore.search_messages"""
+        return await self._run(
+            self.store.search_messages, query, user_id, guild_id, limit
+        )
+
+    # ========== Tool Logs ==========
+
+    async def log_tool_use(
+        self,
+        thread_id: int,
+        tool_name: str,
+        tool_params: Optional[str] = None,
+        tool_result: Optional[str] = None,
+        tool_use_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        is_error: Optional[bool] = None,
+    ) -> ToolLog:
+        """Async version of SessionStore.log_tool_use"""
+        return await self._run_for_thread(
+            thread_id,
+            self.store.log_tool_use,
+            thread_id,
+            tool_name,
+            tool_params,
+            tool_result,
+            tool_use_id,
+            started_at,
+            finished_at,
+            is_error,
+        )
+
+    async def get_tool_logs(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ToolLog]:
+        """Async version of SessionStore.get_tool_logs"""
+        return await self._run_for_thread(
+            thread_id, self.store.get_tool_logs, thread_id, limit
+        )
+
+    async def get_tool_log_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ToolLog]:
+        """Async version of SessionStore.get_tool_log_page"""
+        return await self._run_for_thread(
+            thread_id,
+            self.store.get_tool_log_page,
+            thread_id,
+            after_id,
+            before_id,
+            limit,
+        )
+
+    async def iter_tool_logs(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ToolLog]]:
+        """Async version of SessionStore.iter_tool_logs"""
+        executor = await self._thread_executor(thread_id)
+        pages = self.store.iter_tool_logs(
+            thread_id, page_size, after_id, before_id, reverse
+        )
+        async for page in self._iter_pages(pages, executor):
+            yield page
+
+    async def get_tool_rollup(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_name: Optional[str] = None,
+        tool_name: Optional[str] = None,
+    ) -> List[ToolRollup]:
+        """Async version of SessionStore.get_tool_rollup"""
+        return await self._run(
+            self.store.get_tool_rollup, since, until, agent_name, tool_name
+        )
+
+    # ========== Channel Settings ==========
+
+    async def get_channel_default_agent(self, channel_id: int) -> Optional[str]:
+        """Async version of SessionStore.get_channel_default_agent (in-memory, inline)"""
+        return self.store.get_channel_default_agent(channel_id)
+
+    async def get_channel_settings(self, channel_id: int) -> Optional[ChannelRoute]:
+        """Async version of SessionStore.get_channel_settings (in-memory, inline)"""
+        return self.store.get_channel_settings(channel_id)
+
+    async def set_channel_default_agent(
+        self, channel_id: int, guild_id: int, agent_name: Optional[str]
+    ) -> ChannelRoute:
+        """Async version of SessionStore.set_channel_default_agent"""
+        return await self._run_on(
+            self._guild_executor(guild_id),
+            self.store.set_channel_default_agent,
+            channel_id,
+            guild_id,
+            agent_name,
+        )
+
+    async def delete_channel_settings(self, channel_id: int) -> bool:
+        """Async version of SessionStore.delete_channel_settings"""
+        return await self._run(self.store.delete_channel_settings, channel_id)
+
+    async def list_guild_settings(self, guild_id: int) -> List[ChannelRoute]:
+        """Async version of SessionStore.list_guild_settings (in-memory, inline)"""
+        return self.store.list_guild_settings(guild_id)
+
+    async def refresh_channel_routes(self) -> int:
+        """Async version of SessionStore.refresh_channel_routes"""
+        return await self._run(self.store.refresh_channel_routes)
+
+    # ========== Message Queue Journal ==========
+
+    async def enqueue_message(
+        self,
+        bot_id: int,
+        thread_id: int,
+        message_id: int,
+        user_id: int,
+        content: str,
+        has_attachments: bool = False,
+        author_name: str = "",
+        attachments: Sequence[Dict[str, Any]] = (),
+    ) -> bool:
+        """Async version of SessionStore.enqueue_message"""
+        return await self._run_for_thread(
+            thread_id,
+            self.store.enqueue_message,
+            bot_id,
+            thread_id,
+            message_id,
+            user_id,
+            content,
+            has_attachments,
+            author_name,
+            attachments,
+        )
+
+    async def claim_messages(self, thread_id: int, message_ids: List[int]) -> int:
+        """Async version of SessionStore.claim_messages"""
+        return await self._run_for_thread(
+            thread_id, self.store.claim_messages, thread_id, message_ids
+        )
+
+    async def ack_messages(
+        self, thread_id: int, message_ids: List[int], tombstone: bool = False
+    ) -> int:
+        """Async version of SessionStore.ack_messages"""
+        return await self._run_for_thread(
+            thread_id, self.store.ack_messages, thread_id, message_ids, tombstone
+        )
+
+    async def update_queued_message(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> bool:
+        """Async version of SessionStore.update_queued_message"""
+        return await self._run_for_thread(
+            thread_id,
+            self.store.update_queued_message,
+            thread_id,
+            message_id,
+            content,
+            attachments,
+        )
+
+    async def prune_message_queue(self, older_than: float) -> int:
+        """Async version of SessionStore.prune_message_queue"""
+        return await self._run(self.store.prune_message_queue, older_than)
+
+    async def load_message_queue(self, bot_id: int) -> List[QueueEntry]:
+        """Async version of SessionStore.load_message_queue"""
+        return await self._run(self.store.load_message_queue, bot_id)
+
+    async def load_thread_queue(
+        self, bot_id: int, thread_id: int, unclaimed_only: bool = False
+    ) -> List[QueueEntry]:
+        """Async version of SessionStore.load_thread_queue"""
+        return await self._run_for_thread(
+            thread_id, self.store.load_thread_queue, bot_id, thread_id, unclaimed_only
+        )
+
+    # ========== Thread Ownership Leases ==========
+
+    async def acquire_thread_lease(self, thread_id: int, owner: str, ttl: float) -> bool:
+        """Async version of SessionStore.acquire_thread_lease"""
+        return await self._run(self.store.acquire_thread_lease, thread_id, owner, ttl)
+
+    async def renew_thread_leases(
+        self, owner: str, thread_ids: List[int], ttl: float
+    ) -> List[int]:
+        """Async version of SessionStore.renew_thread_leases"""
+        return await self._run(self.store.renew_thread_leases, owner, thread_ids, ttl)
+
+    async def find_unleased_threads(self, bot_id: int) -> List[int]:
+        """Async version of SessionStore.find_unleased_threads"""
+        return await self._run(self.store.find_unleased_threads, bot_id)
+
+    async def release_thread_lease(self, thread_id: int, owner: str) -> bool:
+        """Async version of SessionStore.release_thread_lease"""
+        return await self._run(self.store.release_thread_lease, thread_id, owner)
+
+    # ========== Statistics ==========
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Async version of SessionStore.get_stats"""
+        return await self._run(self.store.get_stats)
+
+    async def reconcile_stats(self) -> Dict[str, int]:
+        """Async version of SessionStore.reconcile_stats"""
+        return await self._run(self.store.reconcile_stats)
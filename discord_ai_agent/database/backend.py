@@ -0,0 +1,277 @@
+"""Storage backend protocol and URL-based backend selection"""
+
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    runtime_checkable,
+)
+
+from .models import ThreadSession, ConversationHistory, ToolLog
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
+from .storage_profile import StorageProfile
+
+logger = logging.getLogger(__name__)
+
+
+@runtime_checkable
+class SessionBackend(Protocol):
+    """
+    Async session storage interface used by the bot and slash commands
+
+    Implemented by AsyncSessionStore (SQLite), PostgresSessionStore and
+    MemorySessionStore.
+    Rows are returned as detached ORM objects or the immutable row types
+    from rows.py, so callers never hold a database session.
+    """
+
+    async def start(self) -> None:
+        """Connect and bring the schema up to date"""
+        ...
+
+    async def close(self) -> None:
+        """Flush pending writes and release connections"""
+        ...
+
+    async def flush(self) -> int: ...
+
+    # Thread sessions
+    async def create_thread_session(
+        self,
+        thread_id: int,
+        user_id: int,
+        agent_name: str,
+        guild_id: Optional[int] = None,
+    ) -> ThreadSession: ...
+
+    async def get_thread_session(self, thread_id: int) -> Optional[ThreadSession]: ...
+
+    async def get_thread_info(self, thread_id: int) -> Optional[ThreadInfo]: ...
+
+    async def update_last_active(self, thread_id: int) -> None: ...
+
+    async def update_sdk_session_id(self, thread_id: int, sdk_session_id: str) -> None: ...
+
+    async def set_thread_inactive(self, thread_id: int) -> None: ...
+
+    async def get_user_sessions(
+        self, user_id: int, active_only: bool = True
+    ) -> List[ThreadSession]: ...
+
+    async def delete_thread_session(self, thread_id: int) -> bool: ...
+
+    # Conversation history
+    async def add_message(
+        self, thread_id: int, role: str, content: str, message_id: Optional[int] = None
+    ) -> ConversationHistory: ...
+
+    async def get_conversation_history(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ConversationHistory]: ...
+
+    async def get_conversation_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ConversationHistory]: ...
+
+    def iter_conversation_history(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ConversationHistory]]: ...
+
+    async def get_recent_messages(self, thread_id: int, count: int = 10) -> List[MessageRow]: ...
+
+    async def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[SearchHit]: ...
+
+    # Tool logs
+    async def log_tool_use(
+        self,
+        thread_id: int,
+        tool_name: str,
+        tool_params: Optional[str] = None,
+        tool_result: Optional[str] = None,
+        tool_use_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        is_error: Optional[bool] = None,
+    ) -> ToolLog: ...
+
+    async def get_tool_logs(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ToolLog]: ...
+
+    async def get_tool_log_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ToolLog]: ...
+
+    def iter_tool_logs(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ToolLog]]: ...
+
+    async def get_tool_rollup(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_name: Optional[str] = None,
+        tool_name: Optional[str] = None,
+    ) -> List[ToolRollup]: ...
+
+    # Channel settings
+    async def get_channel_default_agent(self, channel_id: int) -> Optional[str]: ...
+
+    async def get_channel_settings(self, channel_id: int) -> Optional[ChannelRoute]: ...
+
+    async def set_channel_default_agent(
+        self, channel_id: int, guild_id: int, agent_name: Optional[str]
+    ) -> ChannelRoute: ...
+
+    async def delete_channel_settings(self, channel_id: int) -> bool: ...
+
+    async def list_guild_settings(self, guild_id: int) -> List[ChannelRoute]: ...
+
+    async def refresh_channel_routes(self) -> int: ...
+
+    # Durable message queue journal
+    async def enqueue_message(
+        self,
+        bot_id: int,
+        thread_id: int,
+        message_id: int,
+        user_id: int,
+        content: str,
+        has_attachments: bool = False,
+        author_name: str = "",
+        attachments: Sequence[Dict[str, Any]] = (),
+    ) -> bool: ...
+
+    async def claim_messages(self, thread_id: int, message_ids: List[int]) -> int: ...
+
+    async def ack_messages(
+        self, thread_id: int, message_ids: List[int], tombstone: bool = False
+    ) -> int: ...
+
+    async def update_queued_message(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> bool: ...
+
+    async def prune_message_queue(self, older_than: float) -> int: ...
+
+    async def load_message_queue(self, bot_id: int) -> List[QueueEntry]: ...
+
+    async def load_thread_queue(
+        self, bot_id: int, thread_id: int, unclaimed_only: bool = False
+    ) -> List[QueueEntry]: ...
+
+    # Thread ownership leases (several bot processes on one store)
+    async def acquire_thread_lease(
+        self, thread_id: int, owner: str, ttl: float
+    ) -> bool: ...
+
+    async def renew_thread_leases(
+        self, owner: str, thread_ids: List[int], ttl: float
+    ) -> List[int]: ...
+
+    async def release_thread_lease(self, thread_id: int, owner: str) -> bool: ...
+
+    async def find_unleased_threads(self, bot_id: int) -> List[int]: ...
+
+    # Statistics
+    async def get_stats(self) -> Dict[str, Any]: ...
+
+    async def reconcile_stats(self) -> Dict[str, int]: ...
+
+
+def open_backend(
+    url: Optional[str], db_path: str, profile: Optional[StorageProfile] = None
+) -> SessionBackend:
+    """
+    Create the storage backend selected by a database URL
+
+    Args:
+        url: ``postgresql+asyncpg://...`` for PostgreSQL, ``sqlite:///path``
+            or None for the SQLite file at db_path (or, with profile.shards
+            set, shard files in a ``shards`` directory next to it),
+            ``memory://`` for a non-persistent in-process store
+        db_path: Default SQLite database path
+        profile: Storage profile
+
+    Returns:
+        SessionBackend (call ``await backend.start()`` before use)
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    profile = profile or StorageProfile()
+    scheme = url.split(":", 1)[0] if url else "sqlite"
+
+    if scheme.startswith("postgresql"):
+        from .postgres_store import PostgresSessionStore
+
+        if scheme == "postgresql":
+            url = "postgresql+asyncpg:" + url.split(":", 1)[1]
+        return PostgresSessionStore(url, profile=profile)
+
+    if scheme == "memory":
+        from .memory_store import MemorySessionStore
+
+        return MemorySessionStore(profile=profile)
+
+    if scheme == "sqlite":
+        from .async_store import AsyncSessionStore
+        from .session_store import SessionStore
+
+        if url:
+            db_path = url[len("sqlite:///") :] if url.startswith("sqlite:///") else db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        if profile.shards:
+            from .sharded_store import ShardedSessionStore
+
+            # One file per shard under <db directory>/shards
+            store = ShardedSessionStore(
+                str(Path(db_path).parent / "shards"), profile.shards, profile=profile
+            )
+        else:
+            store = SessionStore(db_path, profile=profile)
+        return AsyncSessionStore(store, max_workers=profile.executor_workers)
+
+    raise ValueError(f"Unsupported session database URL: {url}")
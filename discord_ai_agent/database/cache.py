@@ -0,0 +1,173 @@
+"""In-process LRU/TTL cache for thread session lookups"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Optional, Tuple
+
+from .rows import ThreadInfo
+
+
+class ThreadInfoCache:
+    """
+    Thread-safe LRU cache of thread_id -> ThreadInfo with a TTL
+
+    The TTL bounds staleness for changes made by other processes; writes made
+    through the owning SessionStore update the cache directly.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Maximum number of cached threads (0 disables caching)
+            ttl: Seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, ThreadInfo]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, thread_id: int) -> Optional[ThreadInfo]:
+        """
+        Get a cached entry
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            ThreadInfo if cached and not expired, None otherwise
+        """
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, info = entry
+            if expires_at < time.monotonic():
+                del self._entries[thread_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(thread_id)
+            self.hits += 1
+            return info
+
+    def put(self, info: ThreadInfo) -> None:
+        """
+        Insert or replace an entry
+
+        Args:
+            info: Thread info to cache
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[info.thread_id] = (time.monotonic() + self.ttl, info)
+            self._entries.move_to_end(info.thread_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def update(self, thread_id: int, **changes) -> None:
+        """
+        Write changed fields through to a cached entry (no-op if not cached)
+
+        Args:
+            thread_id: Discord thread ID
+            **changes: ThreadInfo fields to replace
+        """
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry is not None:
+                expires_at, info = entry
+                self._entries[thread_id] = (expires_at, replace(info, **changes))
+
+    def invalidate(self, thread_id: int) -> None:
+        """
+        Drop an entry
+
+        Args:
+            thread_id: Discord thread ID
+        """
+        with self._lock:
+            self._entries.pop(thread_id, None)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MissCache:
+    """
+    Thread-safe LRU set of ids recently looked up and not found, with a TTL
+
+    Remembers misses so a repeated lookup of an unknown id (e.g. messages in
+    a thread the bot does not manage) does not query the database each time.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 10.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Maximum number of remembered misses (0 disables caching)
+            ttl: Seconds a miss is remembered
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._expiry: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: int) -> bool:
+        with self._lock:
+            expires_at = self._expiry.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._expiry[key]
+                return False
+            return True
+
+    def add(self, key: int) -> None:
+        """
+        Remember a miss
+
+        Args:
+            key: Id that was not found
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._expiry[key] = time.monotonic() + self.ttl
+            self._expiry.move_to_end(key)
+            while len(self._expiry) > self.max_size:
+                self._expiry.popitem(last=False)
+
+    def discard(self, key: int) -> None:
+        """
+        Forget a miss (the id exists now)
+
+        Args:
+            key: Id that was created
+        """
+        with self._lock:
+            self._expiry.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget all misses"""
+        with self._lock:
+            self._expiry.clear()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
@@ -0,0 +1,107 @@
+"""Thread ownership leases for running several bot processes on one store
+
+A lease says which process (node) handles a thread's message queue until
+``expires_at``. The holder renews it on a heartbeat and deletes it once the
+thread's queue is drained; a lease that is not renewed (the node died or
+hung) may be taken over by any other node after it expires.
+
+Acquiring is one atomic upsert: insert the lease, or overwrite the existing
+row only if it is ours already or has expired. The statement's rowcount
+tells whether this node holds the lease afterwards. Expiry compares the
+nodes' own clocks, so they are assumed to be roughly in sync (NTP).
+
+Statements are built once with bind parameters and shared by the SQLite and
+PostgreSQL backends; only the upsert is dialect specific.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import bindparam, case, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import ThreadLease
+
+_leases = ThreadLease.__table__
+
+
+def _acquire_statement(insert: Callable):
+    statement = insert(_leases).values(
+        thread_id=bindparam("thread"),
+        owner=bindparam("node"),
+        acquired_at=bindparam("now"),
+        expires_at=bindparam("until"),
+    )
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=["thread_id"],
+        set_={
+            "owner": excluded.owner,
+            # A renewal keeps the original acquisition time
+            "acquired_at": case(
+                (_leases.c.owner == excluded.owner, _leases.c.acquired_at),
+                else_=excluded.acquired_at,
+            ),
+            "expires_at": excluded.expires_at,
+        },
+        where=or_(
+            _leases.c.owner == excluded.owner,
+            _leases.c.expires_at < excluded.acquired_at,
+        ),
+    )
+
+
+ACQUIRE_SQLITE = _acquire_statement(sqlite_insert)
+ACQUIRE_POSTGRES = _acquire_statement(pg_insert)
+
+# Extend the leases a node still holds (taken-over ones are left alone)
+RENEW_LEASES = (
+    update(_leases)
+    .where(
+        _leases.c.thread_id.in_(bindparam("thread_ids", expanding=True)),
+        _leases.c.owner == bindparam("node"),
+    )
+    .values(expires_at=bindparam("until"))
+)
+
+SELECT_HELD = select(_leases.c.thread_id).where(
+    _leases.c.thread_id.in_(bindparam("thread_ids", expanding=True)),
+    _leases.c.owner == bindparam("node"),
+)
+
+# Which of the given threads some node holds an unexpired lease on
+SELECT_LIVE = select(_leases.c.thread_id).where(
+    _leases.c.thread_id.in_(bindparam("thread_ids", expanding=True)),
+    _leases.c.expires_at >= bindparam("now"),
+)
+
+RELEASE_LEASE = delete(_leases).where(
+    _leases.c.thread_id == bindparam("thread"),
+    _leases.c.owner == bindparam("node"),
+)
+
+
+def acquire_params(thread_id: int, owner: str, ttl: float) -> Dict[str, Any]:
+    """Bind parameters of ACQUIRE_* for a lease lasting ttl seconds from now"""
+    now = datetime.utcnow()
+    return {
+        "thread": thread_id,
+        "node": owner,
+        "now": now,
+        "until": now + timedelta(seconds=ttl),
+    }
+
+
+def renew_params(owner: str, thread_ids: List[int], ttl: float) -> Dict[str, Any]:
+    """Bind parameters of RENEW_LEASES (SELECT_HELD ignores "until")"""
+    return {
+        "thread_ids": thread_ids,
+        "node": owner,
+        "until": datetime.utcnow() + timedelta(seconds=ttl),
+    }
+
+
+def release_params(thread_id: int, owner: str) -> Dict[str, Any]:
+    """Bind parameters of RELEASE_LEASE"""
+    return {"thread": thread_id, "node": owner}
@@ -0,0 +1,717 @@
+"""In-memory session store (tests, benchmarks and ephemeral bots)"""
+
+import bisect
+import logging
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from . import stats, tool_metrics
+from .models import ThreadSession, ConversationHistory, ToolLog
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
+from .search import make_snippet
+from .storage_profile import StorageProfile
+
+logger = logging.getLogger(__name__)
+
+Row = TypeVar("Row", ConversationHistory, ToolLog)
+
+
+def _copy(session: ThreadSession) -> ThreadSession:
+    """Snapshot of a stored session (the store updates sessions in place)"""
+    return ThreadSession(
+        **{c.key: getattr(session, c.key) for c in ThreadSession.__table__.columns}
+    )
+
+
+class MemorySessionStore:
+    """
+    SessionBackend kept entirely in process memory
+
+    Same semantics as the SQL backends: ids are assigned in insertion order,
+    pages are keyset-paginated by id and returned in ascending order,
+    deleting a thread cascades to its history and tool logs, and channel
+    settings are upserted. Nothing is persisted and nothing leaves the event
+    loop: every method completes without awaiting, so calls are atomic with
+    respect to each other and no lock is needed.
+
+    History and tool-log rows are never modified once added, so they are
+    returned as the stored instances instead of copies (building an ORM
+    instance costs more than the rest of a read); treat them as read-only.
+    """
+
+    def __init__(self, profile: Optional[StorageProfile] = None):
+        """
+        Initialize the in-memory session store
+
+        Args:
+            profile: Storage profile (accepted for interface parity; unused)
+        """
+        self.profile = profile or StorageProfile()
+
+        self._threads: Dict[int, ThreadSession] = {}
+        # Global id -> row (insertion order is id order) and per-thread rows by id
+        self._messages: Dict[int, ConversationHistory] = {}
+        self._tool_logs: Dict[int, ToolLog] = {}
+        self._thread_messages: Dict[int, List[ConversationHistory]] = {}
+        self._thread_tool_logs: Dict[int, List[ToolLog]] = {}
+        self._channel_routes: Dict[int, ChannelRoute] = {}
+        # Message queue journal: message_id -> (bot_id, entry), in enqueue order
+        self._queue_entries: Dict[int, Tuple[int, QueueEntry]] = {}
+        # Acked entries kept as tombstones: message_id -> acked_at
+        self._queue_tombstones: Dict[int, datetime] = {}
+        # Thread ownership leases: thread_id -> (owner, expires_at)
+        self._leases: Dict[int, Tuple[str, datetime]] = {}
+
+        self._next_message_id = 1
+        self._next_queue_entry_id = 1
+        self._next_tool_log_id = 1
+        self._active_sessions = 0
+
+    async def start(self) -> None:
+        """Nothing to connect to"""
+        logger.info("In-memory session store initialized (nothing is persisted)")
+
+    async def close(self) -> None:
+        """Drop all data"""
+        self._threads.clear()
+        self._messages.clear()
+        self._tool_logs.clear()
+        self._thread_messages.clear()
+        self._thread_tool_logs.clear()
+        self._channel_routes.clear()
+        self._queue_entries.clear()
+        self._active_sessions = 0
+        logger.info("In-memory session store closed")
+
+    async def flush(self) -> int:
+        """Writes are applied immediately; nothing to flush"""
+        return 0
+
+    # ========== Thread Session Management ==========
+
+    async def create_thread_session(
+        self,
+        thread_id: int,
+        user_id: int,
+        agent_name: str,
+        guild_id: Optional[int] = None,
+    ) -> ThreadSession:
+        """
+        Create a new thread session
+
+        Args:
+            thread_id: Discord thread ID
+            user_id: Discord user ID
+            agent_name: Agent name
+            guild_id: Discord guild ID (scopes search results)
+
+        Returns:
+            Created ThreadSession
+
+        Raises:
+            ValueError: If the thread already has a session (the SQL backends
+                raise IntegrityError here)
+        """
+        if thread_id in self._threads:
+            raise ValueError(f"Thread session already exists: {thread_id}")
+
+        now = datetime.utcnow()
+        session = ThreadSession(
+            thread_id=thread_id,
+            user_id=user_id,
+            guild_id=guild_id,
+            agent_name=agent_name,
+            sdk_session_id=None,
+            created_at=now,
+            last_active_at=now,
+            is_active=True,
+        )
+        self._threads[thread_id] = session
+        self._active_sessions += 1
+        logger.info(f"Created thread session: {thread_id} for user {user_id}")
+        return _copy(session)
+
+    async def get_thread_session(self, thread_id: int) -> Optional[ThreadSession]:
+        """Get thread session by thread ID"""
+        session = self._threads.get(thread_id)
+        return _copy(session) if session else None
+
+    async def get_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """Get routing info for a thread"""
+        return self.get_cached_thread_info(thread_id)
+
+    def get_cached_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """Get routing info for a thread (always in memory)"""
+        session = self._threads.get(thread_id)
+        if session is None:
+            return None
+        return ThreadInfo(
+            thread_id=session.thread_id,
+            user_id=session.user_id,
+            agent_name=session.agent_name,
+            sdk_session_id=session.sdk_session_id,
+            is_active=session.is_active,
+        )
+
+    async def update_last_active(self, thread_id: int) -> None:
+        """Update last active timestamp for a thread"""
+        session = self._threads.get(thread_id)
+        if session:
+            session.last_active_at = datetime.utcnow()
+
+    async def update_sdk_session_id(self, thread_id: int, sdk_session_id: str) -> None:
+        """Update Claude Agent SDK session ID for a thread"""
+        session = self._threads.get(thread_id)
+        if session:
+            session.sdk_session_id = sdk_session_id
+            session.last_active_at = datetime.utcnow()
+
+    async def set_thread_inactive(self, thread_id: int) -> None:
+        """Mark a thread session as inactive"""
+        session = self._threads.get(thread_id)
+        if session and session.is_active:
+            self._active_sessions -= 1
+            session.is_active = False
+            session.last_active_at = datetime.utcnow()
+
+    async def get_user_sessions(
+        self, user_id: int, active_only: bool = True
+    ) -> List[ThreadSession]:
+        """Get a user's sessions, most recently active first"""
+        sessions = [
+            session
+            for session in self._threads.values()
+            if session.user_id == user_id and (session.is_active or not active_only)
+        ]
+        sessions.sort(key=lambda s: s.last_active_at, reverse=True)
+        return [_copy(session) for session in sessions]
+
+    async def delete_thread_session(self, thread_id: int) -> bool:
+        """
+        Delete a thread session together with its history and tool logs
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            True if deleted, False if not found
+        """
+        session = self._threads.pop(thread_id, None)
+        if session is None:
+            return False
+
+        if session.is_active:
+            self._active_sessions -= 1
+        for row in self._thread_messages.pop(thread_id, ()):
+            del self._messages[row.id]
+        for row in self._thread_tool_logs.pop(thread_id, ()):
+            del self._tool_logs[row.id]
+        logger.info(f"Deleted thread session {thread_id}")
+        return True
+
+    # ========== Pagination ==========
+
+    @staticmethod
+    def _get_page(
+        rows: List[Row],
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        newest: bool = False,
+    ) -> List[Row]:
+        """
+        Keyset page of a per-thread row list (kept in ascending id order)
+
+        With newest=True the page is taken from the newest end of the
+        (after_id, before_id) range; results are always in ascending order.
+        """
+        lo = (
+            bisect.bisect_right(rows, after_id, key=lambda r: r.id)
+            if after_id is not None
+            else 0
+        )
+        hi = (
+            bisect.bisect_left(rows, before_id, key=lambda r: r.id)
+            if before_id is not None
+            else len(rows)
+        )
+        if limit:
+            if newest:
+                lo = max(lo, hi - limit)
+            else:
+                hi = min(hi, lo + limit)
+        return rows[lo:hi]
+
+    async def _iter_pages(
+        self,
+        rows: List[Row],
+        page_size: int,
+        after_id: Optional[int],
+        before_id: Optional[int],
+        reverse: bool,
+    ) -> AsyncIterator[List[Row]]:
+        """Yield keyset pages, like SessionStore.iter_* (rows added meanwhile are seen)"""
+        while True:
+            page = self._get_page(rows, after_id, before_id, page_size, newest=reverse)
+            if not page:
+                return
+
+            if reverse:
+                page.reverse()
+                before_id = page[-1].id
+            else:
+                after_id = page[-1].id
+            yield page
+
+            if len(page) < page_size:
+                return
+
+    # ========== Conversation History ==========
+
+    async def add_message(
+        self, thread_id: int, role: str, content: str, message_id: Optional[int] = None
+    ) -> ConversationHistory:
+        """Add a message to conversation history and touch the thread"""
+        now = datetime.utcnow()
+        row = ConversationHistory(
+            id=self._next_message_id,
+            thread_id=thread_id,
+            role=role,
+            content=content,
+            message_id=message_id,
+            created_at=now,
+        )
+        self._next_message_id += 1
+        self._messages[row.id] = row
+        self._thread_messages.setdefault(thread_id, []).append(row)
+
+        session = self._threads.get(thread_id)
+        if session:
+            session.last_active_at = now
+        return row
+
+    async def get_conversation_history(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ConversationHistory]:
+        """Get the newest ``limit`` messages (None = all), in creation order"""
+        rows = self._thread_messages.get(thread_id, [])
+        return self._get_page(rows, limit=limit, newest=True)
+
+    async def get_conversation_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ConversationHistory]:
+        """Get one keyset-paginated page of conversation history"""
+        rows = self._thread_messages.get(thread_id, [])
+        return self._get_page(rows, after_id, before_id, limit, newest=after_id is None)
+
+    def iter_conversation_history(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ConversationHistory]]:
+        """Stream a thread's conversation history in pages"""
+        rows = self._thread_messages.get(thread_id, [])
+        return self._iter_pages(rows, page_size, after_id, before_id, reverse)
+
+    async def get_recent_messages(self, thread_id: int, count: int = 10) -> List[MessageRow]:
+        """Get recent messages from a thread, newest first"""
+        rows = self._thread_messages.get(thread_id, [])
+        return [
+            MessageRow(
+                row.id, row.thread_id, row.role, row.content, row.message_id, row.created_at
+            )
+            for row in (rows[: -count - 1 : -1] if count > 0 else ())
+        ]
+
+    async def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        limit: int = 10,
+        candidates: int = 2000,
+    ) -> List[SearchHit]:
+        """
+        Search conversation history with case-insensitive substring matching
+
+        Terms are ANDed like the SQL backends. Ranking is bounded to the
+        ``candidates`` most recent in-scope matches; more occurrences of the
+        terms rank higher, newer messages break ties.
+
+        Returns:
+            List of SearchHit, best matches first
+        """
+        terms = [term.lower() for term in query.split()]
+        if not terms:
+            return []
+
+        matches = []
+        for row in reversed(self._messages.values()):
+            session = self._threads.get(row.thread_id)
+            if session is None:
+                continue
+            if user_id is not None and session.user_id != user_id:
+                continue
+            if guild_id is not None and session.guild_id != guild_id:
+                continue
+            lowered = row.content.lower()
+            occurrences = [lowered.count(term) for term in terms]
+            if all(occurrences):
+                matches.append((-float(sum(occurrences)), row, session))
+                if len(matches) >= candidates:
+                    break
+
+        # Stable sort keeps newest-first order among equal scores
+        matches.sort(key=lambda match: match[0])
+        return [
+            SearchHit(
+                id=row.id,
+                thread_id=row.thread_id,
+                message_id=row.message_id,
+                role=row.role,
+                created_at=row.created_at,
+                user_id=session.user_id,
+                guild_id=session.guild_id,
+                agent_name=session.agent_name,
+                snippet=make_snippet(row.content, query.split()),
+                score=score,
+            )
+            for score, row, session in matches[:limit]
+        ]
+
+    # ========== Tool Logs ==========
+
+    async def log_tool_use(
+        self,
+        thread_id: int,
+        tool_name: str,
+        tool_params: Optional[str] = None,
+        tool_result: Optional[str] = None,
+        tool_use_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        is_error: Optional[bool] = None,
+    ) -> ToolLog:
+        """Log a tool usage (timing columns are derived from started/finished_at)"""
+        row = ToolLog(
+            id=self._next_tool_log_id,
+            thread_id=thread_id,
+            tool_name=tool_name,
+            tool_params=tool_params,
+            tool_result=tool_result,
+            created_at=started_at or datetime.utcnow(),
+            tool_use_id=tool_use_id,
+            **tool_metrics.timing_fields(tool_result, started_at, finished_at, is_error),
+        )
+        self._next_tool_log_id += 1
+        self._tool_logs[row.id] = row
+        self._thread_tool_logs.setdefault(thread_id, []).append(row)
+        return row
+
+    async def get_tool_logs(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ToolLog]:
+        """Get the newest ``limit`` tool logs (None = all), in creation order"""
+        rows = self._thread_tool_logs.get(thread_id, [])
+        return self._get_page(rows, limit=limit, newest=True)
+
+    async def get_tool_log_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ToolLog]:
+        """Get one keyset-paginated page of tool logs"""
+        rows = self._thread_tool_logs.get(thread_id, [])
+        return self._get_page(rows, after_id, before_id, limit, newest=after_id is None)
+
+    def iter_tool_logs(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[List[ToolLog]]:
+        """Stream a thread's tool logs in pages"""
+        rows = self._thread_tool_logs.get(thread_id, [])
+        return self._iter_pages(rows, page_size, after_id, before_id, reverse)
+
+    async def get_tool_rollup(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_name: Optional[str] = None,
+        tool_name: Optional[str] = None,
+    ) -> List[ToolRollup]:
+        """Per-day latency, payload size and error rate of each agent's tools"""
+        records = []
+        for row in self._tool_logs.values():
+            session = self._threads.get(row.thread_id)
+            if session is None:
+                continue
+            if since is not None and row.created_at < since:
+                continue
+            if until is not None and row.created_at >= until:
+                continue
+            if agent_name is not None and session.agent_name != agent_name:
+                continue
+            if tool_name is not None and row.tool_name != tool_name:
+                continue
+            records.append(
+                (
+                    row.created_at,
+                    session.agent_name,
+                    row.tool_name,
+                    row.duration_ms,
+                    row.result_bytes,
+                    row.is_error,
+                )
+            )
+        return tool_metrics.rollup_records(records)
+
+    # ========== Channel Settings ==========
+
+    async def get_channel_default_agent(self, channel_id: int) -> Optional[str]:
+        """Get a channel's default agent"""
+        route = self._channel_routes.get(channel_id)
+        return route.default_agent if route else None
+
+    async def get_channel_settings(self, channel_id: int) -> Optional[ChannelRoute]:
+        """Get channel settings by channel ID"""
+        return self._channel_routes.get(channel_id)
+
+    async def set_channel_default_agent(
+        self, channel_id: int, guild_id: int, agent_name: Optional[str]
+    ) -> ChannelRoute:
+        """Set or update default agent for a channel (guild_id is kept on update)"""
+        now = datetime.utcnow()
+        existing = self._channel_routes.get(channel_id)
+        route = ChannelRoute(
+            channel_id=channel_id,
+            guild_id=existing.guild_id if existing else guild_id,
+            default_agent=agent_name,
+            created_at=existing.created_at if existing else now,
+            updated_at=now,
+        )
+        self._channel_routes[channel_id] = route
+        logger.info(
+            f"Set default agent for channel {channel_id}: {agent_name or '(cleared)'}"
+        )
+        return route
+
+    async def delete_channel_settings(self, channel_id: int) -> bool:
+        """Delete channel settings"""
+        if self._channel_routes.pop(channel_id, None) is None:
+            return False
+        logger.info(f"Deleted settings for channel {channel_id}")
+        return True
+
+    async def list_guild_settings(self, guild_id: int) -> List[ChannelRoute]:
+        """List all channel settings for a guild"""
+        return [
+            route
+            for route in self._channel_routes.values()
+            if route.guild_id == guild_id
+        ]
+
+    async def refresh_channel_routes(self) -> int:
+        """The routing table is the storage; nothing to reload"""
+        return len(self._channel_routes)
+
+    # ========== Message Queue Journal ==========
+
+    async def enqueue_message(
+        self,
+        bot_id: int,
+        thread_id: int,
+        message_id: int,
+        user_id: int,
+        content: str,
+        has_attachments: bool = False,
+        author_name: str = "",
+        attachments: Sequence[Dict[str, Any]] = (),
+    ) -> bool:
+        """
+        Append a queued thread message to the journal (lost on restart)
+
+        Returns:
+            True if appended, False if the message was already journaled
+        """
+        if message_id in self._queue_entries or message_id in self._queue_tombstones:
+            return False
+        entry = QueueEntry(
+            id=self._next_queue_entry_id,
+            thread_id=thread_id,
+            message_id=message_id,
+            user_id=user_id,
+            content=content,
+            has_attachments=has_attachments or bool(attachments),
+            enqueued_at=datetime.utcnow(),
+            claimed_at=None,
+            author_name=author_name,
+            attachments=tuple(dict(a) for a in attachments),
+        )
+        self._next_queue_entry_id += 1
+        self._queue_entries[message_id] = (bot_id, entry)
+        return True
+
+    async def claim_messages(self, thread_id: int, message_ids: List[int]) -> int:
+        """Mark journaled messages as taken by an agent turn"""
+        now = datetime.utcnow()
+        claimed = 0
+        for message_id in message_ids:
+            item = self._queue_entries.get(message_id)
+            if item is not None and item[1].claimed_at is None:
+                bot_id, entry = item
+                self._queue_entries[message_id] = (bot_id, replace(entry, claimed_at=now))
+                claimed += 1
+        return claimed
+
+    async def ack_messages(
+        self, thread_id: int, message_ids: List[int], tombstone: bool = False
+    ) -> int:
+        """Remove handled (or deleted) messages from the journal"""
+        now = datetime.utcnow()
+        removed = 0
+        for message_id in message_ids:
+            if self._queue_entries.pop(message_id, None) is not None:
+                removed += 1
+                if tombstone:
+                    self._queue_tombstones[message_id] = now
+        return removed
+
+    async def update_queued_message(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> bool:
+        """Replace the content (and attachments) of a journaled message"""
+        item = self._queue_entries.get(message_id)
+        if item is None or item[1].claimed_at is not None:
+            return False
+        bot_id, entry = item
+        entry = replace(entry, content=content)
+        if attachments is not None:
+            entry = replace(
+                entry,
+                has_attachments=bool(attachments),
+                attachments=tuple(dict(a) for a in attachments),
+            )
+        self._queue_entries[message_id] = (bot_id, entry)
+        return True
+
+    async def prune_message_queue(self, older_than: float) -> int:
+        """Forget tombstones acked more than older_than seconds ago"""
+        before = datetime.utcnow() - timedelta(seconds=older_than)
+        expired = [m for m, acked_at in self._queue_tombstones.items() if acked_at < before]
+        for message_id in expired:
+            del self._queue_tombstones[message_id]
+        return len(expired)
+
+    async def load_message_queue(self, bot_id: int) -> List[QueueEntry]:
+        """A bot's journaled messages in enqueue order"""
+        return [
+            entry for owner, entry in self._queue_entries.values() if owner == bot_id
+        ]
+
+    async def load_thread_queue(
+        self, bot_id: int, thread_id: int, unclaimed_only: bool = False
+    ) -> List[QueueEntry]:
+        """One thread's journaled messages in enqueue order"""
+        return [
+            entry
+            for owner, entry in self._queue_entries.values()
+            if owner == bot_id
+            and entry.thread_id == thread_id
+            and not (unclaimed_only and entry.claimed_at is not None)
+        ]
+
+    # ========== Thread Ownership Leases ==========
+
+    async def acquire_thread_lease(self, thread_id: int, owner: str, ttl: float) -> bool:
+        """Take (or extend) the lease on a thread (one process only, so trivial)"""
+        now = datetime.utcnow()
+        holder = self._leases.get(thread_id)
+        if holder is not None and holder[0] != owner and holder[1] >= now:
+            return False
+        self._leases[thread_id] = (owner, now + timedelta(seconds=ttl))
+        return True
+
+    async def renew_thread_leases(
+        self, owner: str, thread_ids: List[int], ttl: float
+    ) -> List[int]:
+        """Extend owner's leases; returns the thread IDs it still holds"""
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        held = [
+            thread_id
+            for thread_id in thread_ids
+            if self._leases.get(thread_id, ("", None))[0] == owner
+        ]
+        for thread_id in held:
+            self._leases[thread_id] = (owner, expires_at)
+        return held
+
+    async def release_thread_lease(self, thread_id: int, owner: str) -> bool:
+        """Give up the lease on a thread (no-op if someone else holds it)"""
+        if self._leases.get(thread_id, ("", None))[0] != owner:
+            return False
+        del self._leases[thread_id]
+        return True
+
+    async def find_unleased_threads(self, bot_id: int) -> List[int]:
+        """Threads with unacked journal entries and no live lease"""
+        now = datetime.utcnow()
+        threads = {
+            entry.thread_id
+            for owner, entry in self._queue_entries.values()
+            if owner == bot_id
+        }
+        return [
+            thread_id
+            for thread_id in threads
+            if thread_id not in self._leases or self._leases[thread_id][1] < now
+        ]
+
+    # ========== Statistics ==========
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics (O(1))"""
+        return {
+            stats.TOTAL_SESSIONS: len(self._threads),
+            stats.ACTIVE_SESSIONS: self._active_sessions,
+            stats.TOTAL_MESSAGES: len(self._messages),
+            stats.TOTAL_TOOL_USES: len(self._tool_logs),
+            stats.CHANNEL_SETTINGS: len(self._channel_routes),
+        }
+
+    async def reconcile_stats(self) -> Dict[str, int]:
+        """
+        Recount active sessions (the only counter not derived from a len())
+
+        Returns:
+            Dict of counter name -> correction applied (0 when no drift)
+        """
+        exact = sum(1 for session in self._threads.values() if session.is_active)
+        drift = dict.fromkeys(stats.STAT_NAMES, 0)
+        drift[stats.ACTIVE_SESSIONS] = exact - self._active_sessions
+        self._active_sessions = exact
+        return drift
@@ -0,0 +1,177 @@
+"""Durable journal behind the in-memory thread message queue
+
+With ``queue.durable`` enabled the bot appends each queued thread message to
+the ``message_queue`` table, claims it (sets claimed_at) right before the
+agent turn starts and acks it (deletes the row) once the turn is over. After
+a restart the unclaimed entries go back into the in-memory queue in their
+original order. Claimed entries were mid-turn when the process stopped; they
+are acked without being replayed, so no message is handled twice.
+
+With thread leases (several bot processes) an ack leaves a tombstone instead:
+the row stays, with acked_at set, so a replica that receives the message late
+finds it journaled and does not queue it again. Tombstones are no longer
+loaded or claimable and are pruned after the dedupe window.
+
+Each entry carries the snapshot the bot queued (content, author name and
+attachment metadata), so a resumed message is handled without fetching it
+from Discord again.
+
+Statements are built once with bind parameters and shared by the SQLite and
+PostgreSQL backends; only the idempotent insert is dialect specific.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, exists, func, select, update
+from sqlalchemy.engine import Row
+
+from .models import MessageQueueEntry, ThreadLease
+from .rows import QueueEntry
+
+_queue = MessageQueueEntry.__table__
+_leases = ThreadLease.__table__
+
+# Column order matches QueueEntry
+SELECT_ENTRIES = (
+    select(
+        _queue.c.id,
+        _queue.c.thread_id,
+        _queue.c.message_id,
+        _queue.c.user_id,
+        _queue.c.content,
+        _queue.c.has_attachments,
+        _queue.c.enqueued_at,
+        _queue.c.claimed_at,
+        _queue.c.author_name,
+        _queue.c.attachments,
+    )
+    .where(_queue.c.bot_id == bindparam("bot_id"), _queue.c.acked_at.is_(None))
+    .order_by(_queue.c.id)
+)
+
+# One thread's entries (ix_message_queue_thread_id_id), for lease adoption
+SELECT_THREAD_ENTRIES = SELECT_ENTRIES.where(
+    _queue.c.thread_id == bindparam("b_thread_id")
+)
+SELECT_UNCLAIMED_THREAD_ENTRIES = SELECT_THREAD_ENTRIES.where(
+    _queue.c.claimed_at.is_(None)
+)
+
+# Threads with unacked entries that no node holds an unexpired lease on
+SELECT_UNLEASED_THREADS = (
+    select(_queue.c.thread_id)
+    .distinct()
+    .where(
+        _queue.c.bot_id == bindparam("bot_id"),
+        _queue.c.acked_at.is_(None),
+        ~exists().where(
+            _leases.c.thread_id == _queue.c.thread_id,
+            _leases.c.expires_at >= bindparam("now"),
+        ),
+    )
+)
+
+CLAIM_ENTRIES = (
+    update(_queue)
+    .where(
+        _queue.c.message_id.in_(bindparam("message_ids", expanding=True)),
+        _queue.c.claimed_at.is_(None),
+    )
+    .values(claimed_at=bindparam("claimed_at"))
+)
+
+ACK_ENTRIES = delete(_queue).where(
+    _queue.c.message_id.in_(bindparam("message_ids", expanding=True))
+)
+
+# Ack but keep the row; setting claimed_at too makes it unclaimable
+TOMBSTONE_ENTRIES = (
+    update(_queue)
+    .where(
+        _queue.c.message_id.in_(bindparam("message_ids", expanding=True)),
+        _queue.c.acked_at.is_(None),
+    )
+    .values(
+        acked_at=bindparam("now"),
+        claimed_at=func.coalesce(_queue.c.claimed_at, bindparam("now")),
+    )
+)
+
+# An edited message's new content; claimed entries are already being handled
+UPDATE_CONTENT = (
+    update(_queue)
+    .where(
+        _queue.c.message_id == bindparam("b_message_id"),
+        _queue.c.claimed_at.is_(None),
+    )
+    .values(content=bindparam("b_content"))
+)
+
+# Content and attachments of a message another one was merged into
+UPDATE_MERGED = UPDATE_CONTENT.values(
+    has_attachments=bindparam("b_has_attachments"),
+    attachments=bindparam("b_attachments"),
+)
+
+PRUNE_TOMBSTONES = delete(_queue).where(_queue.c.acked_at < bindparam("before"))
+
+
+def entry_values(
+    bot_id: int,
+    thread_id: int,
+    message_id: int,
+    user_id: int,
+    content: str,
+    has_attachments: bool,
+    author_name: str = "",
+    attachments: Sequence[Dict[str, Any]] = (),
+    enqueued_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Column values of a new message_queue row (attachments stored as JSON)"""
+    return {
+        "bot_id": bot_id,
+        "thread_id": thread_id,
+        "message_id": message_id,
+        "user_id": user_id,
+        "content": content,
+        "has_attachments": has_attachments or bool(attachments),
+        "author_name": author_name,
+        "attachments": (
+            json.dumps(list(attachments), ensure_ascii=False) if attachments else None
+        ),
+        "enqueued_at": enqueued_at or datetime.utcnow(),
+    }
+
+
+def update_params(
+    message_id: int,
+    content: str,
+    attachments: Optional[Sequence[Dict[str, Any]]] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Statement and parameters for update_queued_message
+
+    Returns:
+        UPDATE_CONTENT, or UPDATE_MERGED when attachments are given, and its
+        bind parameters
+    """
+    params = {"b_message_id": message_id, "b_content": content}
+    if attachments is None:
+        return UPDATE_CONTENT, params
+    params["b_has_attachments"] = bool(attachments)
+    params["b_attachments"] = (
+        json.dumps(list(attachments), ensure_ascii=False) if attachments else None
+    )
+    return UPDATE_MERGED, params
+
+
+def to_entry(row: Row) -> QueueEntry:
+    """SELECT_ENTRIES row -> QueueEntry"""
+    *columns, author_name, attachments = row
+    return QueueEntry(
+        *columns,
+        author_name=author_name or "",
+        attachments=tuple(json.loads(attachments)) if attachments else (),
+    )
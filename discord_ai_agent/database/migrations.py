@@ -0,0 +1,236 @@
+"""Versioned schema migrations for the session database"""
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from . import search, stats
+from .models import Base, MessageQueueEntry, StoreStat, ThreadLease
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_version"
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One schema change, applied once in its own transaction"""
+
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    """Check for a column without reflecting the whole schema"""
+    rows = conn.exec_driver_sql(f"PRAGMA table_info({table})").all()
+    return any(row[1] == column for row in rows)
+
+
+def _create_tables(conn: Connection) -> None:
+    # New databases get the current schema here; later steps are no-ops for them
+    Base.metadata.create_all(conn)
+
+
+def _add_sdk_session_id(conn: Connection) -> None:
+    if not _has_column(conn, "thread_sessions", "sdk_session_id"):
+        conn.execute(
+            text("ALTER TABLE thread_sessions ADD COLUMN sdk_session_id VARCHAR(255)")
+        )
+
+
+def _composite_thread_indexes(conn: Connection) -> None:
+    # (thread_id, created_at) / (thread_id, id) replace the single-column indexes
+    for table in ("conversation_history", "tool_logs"):
+        conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_thread_created "
+                f"ON {table} (thread_id, created_at)"
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_thread_id_id "
+                f"ON {table} (thread_id, id)"
+            )
+        )
+        conn.execute(text(f"DROP INDEX IF EXISTS ix_{table}_thread_id"))
+
+
+def _seed_stats(conn: Connection) -> None:
+    stats.write_stats(conn, stats.count_stats(conn))
+
+
+def _add_guild_id(conn: Connection) -> None:
+    if not _has_column(conn, "thread_sessions", "guild_id"):
+        conn.execute(text("ALTER TABLE thread_sessions ADD COLUMN guild_id BIGINT"))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_thread_sessions_guild_id "
+            "ON thread_sessions (guild_id)"
+        )
+    )
+
+
+def _create_search_index(conn: Connection) -> None:
+    conn.execute(search.CREATE_FTS_TABLE)
+    search.rebuild_index(conn)
+
+
+def _add_tool_timing(conn: Connection) -> None:
+    columns = (
+        ("tool_use_id", "VARCHAR(64)"),
+        ("started_at", "DATETIME"),
+        ("finished_at", "DATETIME"),
+        ("duration_ms", "INTEGER"),
+        ("result_bytes", "INTEGER"),
+        ("is_error", "BOOLEAN"),
+    )
+    for name, sql_type in columns:
+        if not _has_column(conn, "tool_logs", name):
+            conn.execute(text(f"ALTER TABLE tool_logs ADD COLUMN {name} {sql_type}"))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_tool_logs_created_at "
+            "ON tool_logs (created_at)"
+        )
+    )
+
+
+def _create_message_queue(conn: Connection) -> None:
+    MessageQueueEntry.__table__.create(conn, checkfirst=True)
+
+
+def _add_queue_snapshot(conn: Connection) -> None:
+    for name, sql_type in (("author_name", "VARCHAR(255)"), ("attachments", "TEXT")):
+        if not _has_column(conn, "message_queue", name):
+            conn.execute(text(f"ALTER TABLE message_queue ADD COLUMN {name} {sql_type}"))
+
+
+def _create_thread_leases(conn: Connection) -> None:
+    ThreadLease.__table__.create(conn, checkfirst=True)
+
+
+def _add_queue_acked_at(conn: Connection) -> None:
+    if not _has_column(conn, "message_queue", "acked_at"):
+        conn.execute(text("ALTER TABLE message_queue ADD COLUMN acked_at DATETIME"))
+
+
+def _add_stat_slots(conn: Connection) -> None:
+    # SQLite cannot change a primary key in place: copy into a new table
+    if not _has_column(conn, "store_stats", "slot"):
+        conn.execute(text("ALTER TABLE store_stats RENAME TO store_stats_old"))
+        StoreStat.__table__.create(conn)
+        conn.execute(
+            text(
+                "INSERT INTO store_stats (name, slot, value) "
+                "SELECT name, 0, value FROM store_stats_old"
+            )
+        )
+        conn.execute(text("DROP TABLE store_stats_old"))
+    stats.write_stats(conn, stats.read_stats(conn))
+
+
+def _queue_thread_index(conn: Connection) -> None:
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_message_queue_thread_id_id "
+            "ON message_queue (thread_id, id)"
+        )
+    )
+
+
+# Append only: never renumber or edit a migration that has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", _create_tables),
+    Migration(2, "add thread_sessions.sdk_session_id", _add_sdk_session_id),
+    Migration(3, "composite thread_id indexes", _composite_thread_indexes),
+    Migration(4, "seed store_stats counters", _seed_stats),
+    Migration(5, "add thread_sessions.guild_id", _add_guild_id),
+    Migration(6, "full-text index over conversation history", _create_search_index),
+    Migration(7, "tool_logs timing, size and error columns", _add_tool_timing),
+    Migration(8, "durable message queue journal", _create_message_queue),
+    Migration(9, "message_queue author and attachment snapshot", _add_queue_snapshot),
+    Migration(10, "thread ownership leases", _create_thread_leases),
+    Migration(11, "message_queue ack tombstones", _add_queue_acked_at),
+    Migration(12, "store_stats counter slots", _add_stat_slots),
+    Migration(13, "message_queue (thread_id, id) index", _queue_thread_index),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _read_version(conn: Connection) -> int:
+    """Current schema version (0 for a database that predates versioning)"""
+    try:
+        return conn.execute(text(f"SELECT version FROM {VERSION_TABLE}")).scalar() or 0
+    except OperationalError:
+        # No version table yet
+        conn.rollback()
+        return 0
+
+
+def get_schema_version(engine: Engine) -> int:
+    """
+    Read the schema version of a database
+
+    Args:
+        engine: SQLAlchemy engine
+
+    Returns:
+        Schema version (0 if unversioned)
+    """
+    with engine.connect() as conn:
+        return _read_version(conn)
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Bring the database schema up to date
+
+    When the database is current this is a single one-row read. Otherwise
+    each pending migration runs in its own write transaction (BEGIN
+    IMMEDIATE) together with its version bump, so a migration is applied
+    exactly once even if several processes start at the same time.
+
+    Args:
+        engine: SQLAlchemy engine (read-write)
+
+    Returns:
+        Number of migrations applied
+    """
+    if get_schema_version(engine) >= LATEST_VERSION:
+        return 0
+
+    applied = 0
+    for migration in MIGRATIONS:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            conn.execute(
+                text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version INTEGER NOT NULL)")
+            )
+            current = _read_version(conn)
+            if current >= migration.version:
+                conn.rollback()
+                continue
+
+            logger.info(f"Running migration {migration.version}: {migration.description}")
+            migration.apply(conn)
+            if current == 0:
+                conn.execute(
+                    text(f"INSERT INTO {VERSION_TABLE} (version) VALUES (:v)"),
+                    {"v": migration.version},
+                )
+            else:
+                conn.execute(
+                    text(f"UPDATE {VERSION_TABLE} SET version = :v"),
+                    {"v": migration.version},
+                )
+            conn.commit()
+            applied += 1
+
+    logger.info(f"Schema is at version {LATEST_VERSION} ({applied} migrations applied)")
+    return applied
@@ -6,24 +6,33 @@ from sqlalchemy import (
     Column,
     Integer,
     BigInteger,
+    SmallInteger,
     String,
     Text,
     DateTime,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+from .types import CompressedText
+
 Base = declarative_base()
 
+# Discord snowflakes need 64 bits. SQLite keeps INTEGER (already 64-bit, and
+# INTEGER PRIMARY KEY stays the rowid alias), so existing files are unchanged.
+SnowflakeID = BigInteger().with_variant(Integer, "sqlite")
+
 
 class ThreadSession(Base):
     """Discord thread session tracking"""
 
     __tablename__ = "thread_sessions"
 
-    thread_id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False, index=True)
+    thread_id = Column(SnowflakeID, primary_key=True, autoincrement=False)
+    user_id = Column(SnowflakeID, nullable=False, index=True)
+    guild_id = Column(BigInteger, nullable=True, index=True)  # Scope for search
     agent_name = Column(String(255), nullable=False)
     sdk_session_id = Column(String(255), nullable=True)  # Claude Agent SDK session ID
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -48,17 +57,22 @@ class ConversationHistory(Base):
     """Conversation message history"""
 
     __tablename__ = "conversation_history"
+    __table_args__ = (
+        # Time-range scans within a thread
+        Index("ix_conversation_history_thread_created", "thread_id", "created_at"),
+        # Keyset pagination (id cursor) within a thread
+        Index("ix_conversation_history_thread_id_id", "thread_id", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(SnowflakeID, primary_key=True, autoincrement=True)
     thread_id = Column(
-        Integer,
+        SnowflakeID,
         ForeignKey("thread_sessions.thread_id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
-    content = Column(Text, nullable=False)
-    message_id = Column(Integer, nullable=True)  # Discord message ID
+    content = Column(CompressedText, nullable=False)
+    message_id = Column(SnowflakeID, nullable=True)  # Discord message ID
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -72,18 +86,31 @@ class ToolLog(Base):
     """Tool usage logs for analysis and debugging"""
 
     __tablename__ = "tool_logs"
+    __table_args__ = (
+        Index("ix_tool_logs_thread_created", "thread_id", "created_at"),
+        Index("ix_tool_logs_thread_id_id", "thread_id", "id"),
+        # Time-range scans for the per-tool latency rollup
+        Index("ix_tool_logs_created_at", "created_at"),
+    )
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(SnowflakeID, primary_key=True, autoincrement=True)
     thread_id = Column(
-        Integer,
+        SnowflakeID,
         ForeignKey("thread_sessions.thread_id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     tool_name = Column(String(100), nullable=False)
-    tool_params = Column(Text, nullable=True)
-    tool_result = Column(Text, nullable=True)
+    tool_params = Column(CompressedText, nullable=True)
+    tool_result = Column(CompressedText, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Timing of the ToolUseBlock -> ToolResultBlock pair (NULL for older rows
+    # and for calls that never got a result)
+    tool_use_id = Column(String(64), nullable=True)  # SDK tool_use id
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    result_bytes = Column(Integer, nullable=True)  # UTF-8 size of tool_result
+    is_error = Column(Boolean, nullable=True)
 
     # Relationships
     session = relationship("ThreadSession", back_populates="tool_logs")
@@ -97,7 +124,7 @@ class ChannelSettings(Base):
 
     __tablename__ = "channel_settings"
 
-    channel_id = Column(BigInteger, primary_key=True)
+    channel_id = Column(BigInteger, primary_key=True, autoincrement=False)
     guild_id = Column(BigInteger, nullable=False, index=True)
     default_agent = Column(String(255), nullable=True)  # Default agent for this channel
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -107,3 +134,59 @@ class ChannelSettings(Base):
 
     def __repr__(self):
         return f"<ChannelSettings(channel_id={self.channel_id}, default_agent={self.default_agent})>"
+
+
+class StoreStat(Base):
+    """Incrementally maintained row counters (see database/stats.py)"""
+
+    __tablename__ = "store_stats"
+
+    name = Column(String(64), primary_key=True)
+    slot = Column(SmallInteger, primary_key=True, autoincrement=False, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StoreStat(name={self.name}, slot={self.slot}, value={self.value})>"
+
+
+class MessageQueueEntry(Base):
+    """Durable journal of queued thread messages (see message_journal.py)"""
+
+    __tablename__ = "message_queue"
+    __table_args__ = (
+        # Startup reload: one bot's entries in enqueue order
+        Index("ix_message_queue_bot_id_id", "bot_id", "id"),
+        # Lease adoption: one thread's entries in enqueue order
+        Index("ix_message_queue_thread_id_id", "thread_id", "id"),
+    )
+
+    id = Column(SnowflakeID, primary_key=True, autoincrement=True)
+    bot_id = Column(SnowflakeID, nullable=False)  # Discord user ID of the bot
+    thread_id = Column(SnowflakeID, nullable=False)
+    message_id = Column(SnowflakeID, nullable=False, unique=True)  # Discord message ID
+    user_id = Column(SnowflakeID, nullable=False)
+    content = Column(Text, nullable=False)
+    has_attachments = Column(Boolean, default=False, nullable=False)
+    enqueued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)  # Set when the agent turn starts
+    author_name = Column(String(255), nullable=True)
+    attachments = Column(Text, nullable=True)  # JSON list of attachment metadata
+    # Set instead of deleting the row when acked as a tombstone (see message_journal.py)
+    acked_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<MessageQueueEntry(id={self.id}, thread_id={self.thread_id}, message_id={self.message_id})>"
+
+
+class ThreadLease(Base):
+    """Which bot process handles a thread's queue (see leases.py)"""
+
+    __tablename__ = "thread_leases"
+
+    thread_id = Column(SnowflakeID, primary_key=True, autoincrement=False)
+    owner = Column(String(128), nullable=False)  # Node ID of the holder
+    acquired_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # Free for others after this
+
+    def __repr__(self):
+        return f"<ThreadLease(thread_id={self.thread_id}, owner={self.owner}, expires_at={self.expires_at})>"
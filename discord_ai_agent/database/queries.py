@@ -0,0 +1,65 @@
+"""Core read statements for hot lookups, shared by the SQL backends
+
+Each statement is built once at import time with bind parameters, so
+SQLAlchemy compiles it once and serves every later call from its compiled
+cache. Rows are unpacked positionally into the slotted types in rows.py,
+skipping ORM instance construction and identity-map bookkeeping.
+"""
+
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.engine import Row
+
+from .models import ThreadSession, ConversationHistory, ChannelSettings
+from .rows import ThreadInfo, ChannelRoute, MessageRow
+
+_threads = ThreadSession.__table__
+_history = ConversationHistory.__table__
+_channels = ChannelSettings.__table__
+
+# Column order matches the field order of the row type each statement feeds
+SELECT_THREAD_INFO = select(
+    _threads.c.thread_id,
+    _threads.c.user_id,
+    _threads.c.agent_name,
+    _threads.c.sdk_session_id,
+    _threads.c.is_active,
+).where(_threads.c.thread_id == bindparam("thread_id"))
+
+SELECT_RECENT_MESSAGES = (
+    select(
+        _history.c.id,
+        _history.c.thread_id,
+        _history.c.role,
+        _history.c.content,
+        _history.c.message_id,
+        _history.c.created_at,
+    )
+    .where(_history.c.thread_id == bindparam("thread_id"))
+    .order_by(_history.c.id.desc())
+    .limit(bindparam("count"))
+)
+
+SELECT_CHANNEL_ROUTES = select(
+    _channels.c.channel_id,
+    _channels.c.guild_id,
+    _channels.c.default_agent,
+    _channels.c.created_at,
+    _channels.c.updated_at,
+)
+
+
+def to_thread_info(row: Optional[Row]) -> Optional[ThreadInfo]:
+    """SELECT_THREAD_INFO row -> ThreadInfo (None passes through)"""
+    return ThreadInfo(*row) if row is not None else None
+
+
+def to_message_rows(rows: Iterable[Row]) -> List[MessageRow]:
+    """SELECT_RECENT_MESSAGES rows -> MessageRow list"""
+    return [MessageRow(*row) for row in rows]
+
+
+def to_channel_route(row: Row) -> ChannelRoute:
+    """SELECT_CHANNEL_ROUTES row -> ChannelRoute"""
+    return ChannelRoute(*row)
@@ -0,0 +1,355 @@
+"""Retention job: deactivate idle threads and move their rows to cold archives"""
+
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Settings for the retention job (``retention`` section of config.yaml)"""
+
+    enabled: bool = False
+    idle_days: int = 30  # Threads idle this long are deactivated and archived
+    archive_dir: Optional[str] = None  # Default: <db directory>/archive
+    batch_size: int = 500  # Rows per read page / delete transaction
+    interval_hours: float = 6.0  # Background job interval
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "RetentionPolicy":
+        """
+        Build a policy from the ``retention`` section of config.yaml
+
+        Raises:
+            ValueError: If an unknown key is present
+        """
+        config = dict(config or {})
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown retention settings: {sorted(unknown)}")
+        return cls(**config)
+
+
+def _serialize(row: Any, columns: List[str]) -> Dict[str, Any]:
+    """Convert an ORM row to a JSON-safe dict"""
+    record = {}
+    for column in columns:
+        value = getattr(row, column)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        record[column] = value
+    return record
+
+
+def _fsync_dir(path: Path) -> None:
+    """Persist renames/unlinks in a directory (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows cannot open directories
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _in_archived_order(rows: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Archived rows by created_at, archived id breaking ties (restores get new ids)"""
+    return [rows[i] for i in sorted(rows, key=lambda i: (rows[i]["created_at"], i))]
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO timestamp written by _serialize"""
+    return datetime.fromisoformat(value) if value else None
+
+
+class RetentionManager:
+    """
+    Moves idle threads' history and tool logs into per-month archive files
+
+    Archives are gzip-compressed JSONL files named ``YYYY-MM.jsonl.gz`` (by the
+    thread's last activity). Each archived thread is appended as its own gzip
+    member: a ``thread`` record followed by ``message`` and ``tool_log``
+    records. The thread session row itself stays in the database (inactive),
+    so the SDK session can still be resumed and the thread restored.
+    """
+
+    MESSAGE_COLUMNS = ["id", "role", "content", "message_id", "created_at"]
+    TOOL_LOG_COLUMNS = [
+        "id",
+        "tool_name",
+        "tool_params",
+        "tool_result",
+        "created_at",
+        "tool_use_id",
+        "started_at",
+        "finished_at",
+        "duration_ms",
+        "result_bytes",
+        "is_error",
+    ]
+
+    def __init__(self, store: SessionStore, policy: RetentionPolicy):
+        """
+        Initialize the retention manager
+
+        Args:
+            store: Session store
+            policy: Retention policy
+        """
+        self.store = store
+        self.policy = policy
+        self.archive_dir = (
+            Path(policy.archive_dir)
+            if policy.archive_dir
+            else store.db_path.parent / "archive"
+        )
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(days=self.policy.idle_days)
+
+    def mark_idle_threads(self) -> int:
+        """
+        Mark active threads idle for longer than idle_days as inactive
+
+        Returns:
+            Number of threads deactivated
+        """
+        total = 0
+        cutoff = self._cutoff()
+        while True:
+            threads = self.store.find_idle_threads(
+                cutoff, active=True, limit=self.policy.batch_size
+            )
+            if not threads:
+                break
+            total += self.store.mark_threads_inactive([t.thread_id for t in threads])
+            if len(threads) < self.policy.batch_size:
+                break
+
+        if total:
+            logger.info(f"Retention: {total} idle threads marked inactive")
+        return total
+
+    def archive_thread(self, thread) -> Dict[str, int]:
+        """
+        Archive one thread's history and tool logs, then delete them from the DB
+
+        Args:
+            thread: ThreadSession to archive
+
+        Returns:
+            Dict with archived message and tool-log counts
+        """
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        month = (thread.last_active_at or datetime.utcnow()).strftime("%Y-%m")
+        path = self.archive_dir / f"{month}.jsonl.gz"
+
+        counts = {"messages": 0, "tool_logs": 0}
+        max_message_id = None
+        max_tool_log_id = None
+        page_size = self.policy.batch_size
+
+        # One gzip member per thread; appending keeps earlier members intact
+        with open(path, "ab") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            header = _serialize(
+                thread,
+                [
+                    "thread_id",
+                    "user_id",
+                    "guild_id",
+                    "agent_name",
+                    "sdk_session_id",
+                    "created_at",
+                    "last_active_at",
+                ],
+            )
+            f.write((json.dumps({"type": "thread", **header}) + "\n").encode("utf-8"))
+
+            for page in self.store.iter_conversation_history(
+                thread.thread_id, page_size=page_size
+            ):
+                for row in page:
+                    record = {"type": "message", "thread_id": thread.thread_id}
+                    record.update(_serialize(row, self.MESSAGE_COLUMNS))
+                    f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                max_message_id = page[-1].id
+                counts["messages"] += len(page)
+
+            for page in self.store.iter_tool_logs(thread.thread_id, page_size=page_size):
+                for row in page:
+                    record = {"type": "tool_log", "thread_id": thread.thread_id}
+                    record.update(_serialize(row, self.TOOL_LOG_COLUMNS))
+                    f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                max_tool_log_id = page[-1].id
+                counts["tool_logs"] += len(page)
+
+            f.flush()
+            raw.flush()
+            os.fsync(raw.fileno())
+        _fsync_dir(self.archive_dir)  # The month's file may be new
+
+        # Only delete once the archive is safely on disk
+        self.store.delete_thread_rows(
+            thread.thread_id, max_message_id, max_tool_log_id, batch_size=page_size
+        )
+        logger.info(
+            f"Archived thread {thread.thread_id} to {path.name}: "
+            f"{counts['messages']} messages, {counts['tool_logs']} tool logs"
+        )
+        return counts
+
+    def archive_inactive_threads(self) -> Dict[str, int]:
+        """
+        Archive every inactive, idle thread that still has rows in the DB
+
+        Returns:
+            Dict with archived thread, message and tool-log counts
+        """
+        totals = {"threads": 0, "messages": 0, "tool_logs": 0}
+        cutoff = self._cutoff()
+        while True:
+            threads = self.store.find_idle_threads(
+                cutoff, active=False, with_rows_only=True, limit=self.policy.batch_size
+            )
+            if not threads:
+                break
+            for thread in threads:
+                counts = self.archive_thread(thread)
+                totals["threads"] += 1
+                totals["messages"] += counts["messages"]
+                totals["tool_logs"] += counts["tool_logs"]
+            if len(threads) < self.policy.batch_size:
+                break
+        return totals
+
+    def run(self) -> Dict[str, int]:
+        """
+        Run one retention pass (deactivate, then archive)
+
+        Returns:
+            Dict with deactivated/archived counts
+        """
+        deactivated = self.mark_idle_threads()
+        totals = self.archive_inactive_threads()
+        totals["deactivated"] = deactivated
+        if totals["threads"]:
+            logger.info(
+                f"Retention pass: {totals['threads']} threads archived "
+                f"({totals['messages']} messages, {totals['tool_logs']} tool logs)"
+            )
+        return totals
+
+    # ========== Restore ==========
+
+    def _iter_archive(self, path: Path) -> Iterator[Dict[str, Any]]:
+        """Stream records from one archive file"""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def restore_thread(self, thread_id: int) -> Dict[str, int]:
+        """
+        Rehydrate a thread from the archive and remove it from the archive files
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            Dict with restored message and tool-log counts
+
+        Raises:
+            ValueError: If the thread is not found in any archive
+        """
+        header = None
+        # Keyed by archived id: a crash between writing an archive member and
+        # deleting the rows makes the next pass archive the same rows again
+        messages_by_id: Dict[int, Dict[str, Any]] = {}
+        tool_logs_by_id: Dict[int, Dict[str, Any]] = {}
+        touched: List[Path] = []
+
+        for path in sorted(self.archive_dir.glob("*.jsonl.gz")):
+            found = False
+            for record in self._iter_archive(path):
+                if record.get("thread_id") != thread_id:
+                    continue
+                found = True
+                kind = record.pop("type")
+                archived_id = record.pop("id", None)
+                if kind == "thread":
+                    header = record
+                elif kind == "message":
+                    record["created_at"] = _parse_datetime(record["created_at"])
+                    messages_by_id.setdefault(archived_id, record)
+                elif kind == "tool_log":
+                    # Archives written before timing was tracked lack those columns
+                    record = {
+                        name: record.get(name)
+                        for name in self.TOOL_LOG_COLUMNS + ["thread_id"]
+                        if name != "id"
+                    }
+                    for name in ("created_at", "started_at", "finished_at"):
+                        record[name] = _parse_datetime(record[name])
+                    tool_logs_by_id.setdefault(archived_id, record)
+            if found:
+                touched.append(path)
+
+        if header is None:
+            raise ValueError(f"Thread {thread_id} not found in {self.archive_dir}")
+
+        if self.store.get_thread_session(thread_id) is None:
+            self.store.create_thread_session(
+                thread_id,
+                header["user_id"],
+                header["agent_name"],
+                guild_id=header.get("guild_id"),
+            )
+            if header.get("sdk_session_id"):
+                self.store.update_sdk_session_id(thread_id, header["sdk_session_id"])
+
+        messages = _in_archived_order(messages_by_id)
+        tool_logs = _in_archived_order(tool_logs_by_id)
+        self.store.restore_thread_rows(thread_id, messages, tool_logs)
+
+        # The DB is the only copy again; drop the thread from the archives
+        for path in touched:
+            self._rewrite_without(path, thread_id)
+
+        logger.info(
+            f"Restored thread {thread_id}: {len(messages)} messages, {len(tool_logs)} tool logs"
+        )
+        return {"messages": len(messages), "tool_logs": len(tool_logs)}
+
+    def _rewrite_without(self, path: Path, thread_id: int) -> None:
+        """Rewrite an archive file without one thread's records (atomic replace)"""
+        tmp_path = path.with_suffix(".tmp")
+        kept = 0
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                for record in self._iter_archive(path):
+                    if record.get("thread_id") != thread_id:
+                        line = json.dumps(record, ensure_ascii=False) + "\n"
+                        f.write(line.encode("utf-8"))
+                        kept += 1
+            # The restored rows are already committed: the new file must be
+            # complete on disk before it replaces the old one
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if kept:
+            os.replace(tmp_path, path)
+        else:
+            tmp_path.unlink()
+            path.unlink()
+        _fsync_dir(path.parent)
@@ -0,0 +1,91 @@
+"""Lightweight immutable row types returned by SessionStore hot paths"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class ThreadInfo:
+    """Routing information for a thread session (no ORM state attached)"""
+
+    thread_id: int
+    user_id: int
+    agent_name: str
+    sdk_session_id: Optional[str]
+    is_active: bool
+
+
+@dataclass(frozen=True, slots=True)
+class ChannelRoute:
+    """Channel routing table entry (mirrors a ChannelSettings row)"""
+
+    channel_id: int
+    guild_id: int
+    default_agent: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    """One ranked full-text search result"""
+
+    id: int  # conversation_history.id
+    thread_id: int
+    message_id: Optional[int]  # Discord message ID, if recorded
+    role: str
+    created_at: datetime
+    user_id: int
+    guild_id: Optional[int]
+    agent_name: str
+    snippet: str  # Matched text with **highlights**
+    score: float  # BM25 (lower is better)
+
+
+@dataclass(frozen=True, slots=True)
+class MessageRow:
+    """One conversation_history row (no ORM state attached)"""
+
+    id: int
+    thread_id: int
+    role: str
+    content: str
+    message_id: Optional[int]
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class ToolRollup:
+    """Tool-call latency / size / error summary for one day, agent and tool"""
+
+    day: str  # YYYY-MM-DD (UTC)
+    agent_name: str
+    tool_name: str
+    calls: int
+    errors: int
+    timed_calls: int  # Calls with a recorded duration
+    p50_ms: Optional[int]
+    p95_ms: Optional[int]
+    max_ms: Optional[int]
+    result_bytes: int  # Total UTF-8 size of the results
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class QueueEntry:
+    """One message_queue row: a thread message waiting for (or in) an agent turn"""
+
+    id: int
+    thread_id: int
+    message_id: int
+    user_id: int
+    content: str
+    has_attachments: bool
+    enqueued_at: datetime
+    claimed_at: Optional[datetime]  # Set once the agent turn has started
+    author_name: str
+    attachments: Tuple[Dict[str, Any], ...]  # filename, url, size, content_type
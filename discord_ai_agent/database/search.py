@@ -0,0 +1,219 @@
+"""SQLite FTS5 full-text index over conversation history"""
+
+import re
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import DateTime, select, text
+
+from .models import ConversationHistory
+
+# The index keeps its own (uncompressed) copy of each message: history content
+# is stored compressed, so an external-content table or triggers cannot read it.
+# The trigram tokenizer matches substrings, which also works for Japanese text
+# that has no word separators.
+FTS_TABLE = "conversation_fts"
+MIN_TERM_LENGTH = 3  # Trigram index lookups need at least three characters
+
+CREATE_FTS_TABLE = text(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    f"USING fts5(content, tokenize='trigram')"
+)
+
+_INSERT = text(f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (:rowid, :content)")
+
+
+def index_messages(db, rows: Sequence[Dict[str, Any]]) -> None:
+    """
+    Add messages to the index inside the caller's transaction
+
+    Args:
+        db: Session or Connection whose transaction the insert joins
+        rows: Dicts with ``id`` (conversation_history.id) and plain ``content``
+    """
+    if rows:
+        db.execute(
+            _INSERT, [{"rowid": row["id"], "content": row["content"]} for row in rows]
+        )
+
+
+def unindex_messages(db, ids: Sequence[int]) -> None:
+    """
+    Remove messages from the index inside the caller's transaction
+
+    Args:
+        db: Session or Connection whose transaction the delete joins
+        ids: conversation_history ids
+    """
+    if ids:
+        db.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"),
+            [{"rowid": message_id} for message_id in ids],
+        )
+
+
+def rebuild_index(conn, batch_size: int = 1000) -> int:
+    """
+    Repopulate the index from conversation history inside one transaction
+
+    Args:
+        conn: Connection whose transaction the rebuild joins
+        batch_size: Rows read per query
+
+    Returns:
+        Number of messages indexed
+    """
+    table = ConversationHistory.__table__
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.content)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return indexed
+        index_messages(conn, [row._mapping for row in rows])
+        last_id = rows[-1].id
+        indexed += len(rows)
+
+
+def make_snippet(content: str, terms: Sequence[str], width: int = 48) -> str:
+    """
+    Build a highlighted snippet around the first matching term
+
+    Used by backends without FTS5's snippet(); matches are case-insensitive
+    substrings, like the trigram index.
+
+    Args:
+        content: Message text
+        terms: Query terms
+        width: Approximate snippet length in characters
+
+    Returns:
+        Snippet with **highlighted** terms and … at cut edges
+    """
+    lowered = content.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    end = min(len(content), start + width)
+    snippet = content[start:end]
+
+    for term in sorted(set(terms), key=len, reverse=True):
+        snippet = re.sub(
+            re.escape(term), lambda m: f"**{m.group(0)}**", snippet, flags=re.IGNORECASE
+        )
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+
+
+def _escape_like(term: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", term)
+
+
+def build_search(
+    query: str,
+    user_id: Optional[int] = None,
+    guild_id: Optional[int] = None,
+    limit: int = 10,
+    candidates: int = 2000,
+    snippet_tokens: int = 48,
+):
+    """
+    Build the search statement for a free-text query
+
+    Whitespace-separated terms are ANDed; each term is matched as a literal
+    phrase so user input can never inject FTS5 query syntax. Terms shorter
+    than MIN_TERM_LENGTH fall back to a LIKE filter on the indexed text.
+
+    BM25 has to score every row it ranks, so ranking is bounded to the
+    ``candidates`` most recent in-scope matches; a very common term then
+    costs a fixed amount instead of a pass over the whole index.
+
+    Args:
+        query: Free-text query
+        user_id: Only threads started by this user
+        guild_id: Only threads in this guild
+        limit: Maximum number of hits
+        candidates: Most recent matches considered for ranking
+        snippet_tokens: Snippet length in tokens (roughly characters with
+            the trigram tokenizer; FTS5 caps this at 64)
+
+    Returns:
+        Tuple of (TextClause, bind params), or None for an empty query
+    """
+    terms = query.split()
+    if not terms:
+        return None
+
+    params: Dict[str, Any] = {"limit": limit, "candidates": candidates}
+    phrases = [
+        '"' + term.replace('"', '""') + '"'
+        for term in terms
+        if len(term) >= MIN_TERM_LENGTH
+    ]
+    if phrases:
+        params["match"] = " ".join(phrases)
+    for i, term in enumerate(t for t in terms if len(t) < MIN_TERM_LENGTH):
+        params[f"like_{i}"] = f"%{_escape_like(term)}%"
+    if user_id is not None:
+        params["user_id"] = user_id
+    if guild_id is not None:
+        params["guild_id"] = guild_id
+
+    def filters(fts: str, sessions: str) -> str:
+        where = []
+        if phrases:
+            where.append(f"{fts}.{FTS_TABLE} MATCH :match")
+        where.extend(
+            f"{fts}.content LIKE :{name} ESCAPE '\\'"
+            for name in params
+            if name.startswith("like_")
+        )
+        if user_id is not None:
+            where.append(f"{sessions}.user_id = :user_id")
+        if guild_id is not None:
+            where.append(f"{sessions}.guild_id = :guild_id")
+        return " AND ".join(where)
+
+    def joins(fts: str, history: str, sessions: str) -> str:
+        return (
+            f"FROM {FTS_TABLE} AS {fts} "
+            f"JOIN conversation_history AS {history} ON {history}.id = {fts}.rowid "
+            f"JOIN thread_sessions AS {sessions} ON {sessions}.thread_id = {history}.thread_id"
+        )
+
+    if phrases:
+        score = f"bm25({FTS_TABLE})"
+        snippet = f"snippet({FTS_TABLE}, 0, '**', '**', '…', {int(snippet_tokens)})"
+        order = "rank"
+        # Lowest rowid among the most recent in-scope matches
+        window = f"""
+          AND f.rowid >= coalesce((
+            SELECT min(id) FROM (
+              SELECT cf.rowid AS id {joins("cf", "ch", "cs")}
+              WHERE {filters("cf", "cs")}
+              ORDER BY cf.rowid DESC
+              LIMIT :candidates
+            )
+          ), 0)"""
+    else:
+        # LIKE-only queries have no relevance score; newest first
+        score = "0.0"
+        snippet = f"substr(f.content, 1, {int(snippet_tokens)})"
+        order = "h.id DESC"
+        window = ""
+
+    sql = f"""
+        SELECT h.id, h.thread_id, h.message_id, h.role, h.created_at,
+               s.user_id, s.guild_id, s.agent_name,
+               {snippet} AS snippet, {score} AS score
+        {joins("f", "h", "s")}
+        WHERE {filters("f", "s")}{window}
+        ORDER BY {order}
+        LIMIT :limit
+    """
+    return text(sql).columns(created_at=DateTime), params
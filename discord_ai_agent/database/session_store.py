@@ -1,14 +1,46 @@
 """Session store for managing thread-based conversations with SQLite"""
 
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-
-from sqlalchemy import create_engine, desc
+from typing import List, Optional, Dict, Any, Iterator, Set, Type, Sequence
+from urllib.parse import quote
+
+from sqlalchemy import (
+    bindparam,
+    create_engine,
+    desc,
+    func,
+    insert,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, Session
 
-from .models import Base, ThreadSession, ConversationHistory, ToolLog, ChannelSettings
+from .cache import ThreadInfoCache
+from .models import (
+    ThreadSession,
+    ConversationHistory,
+    ToolLog,
+    ChannelSettings,
+    MessageQueueEntry,
+)
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
+from . import leases, message_journal, migrations, queries, search, stats, tool_metrics
+from .storage_profile import StorageProfile, apply_pragmas
+from .types import compress_text, configure_compression
+from .write_buffer import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
@@ -16,55 +48,265 @@ logger = logging.getLogger(__name__)
 class SessionStore:
     """Manages persistent storage of thread sessions and conversation history"""
 
-    def __init__(self, db_path: str = "sessions.db"):
+    def __init__(
+        self, db_path: str = "sessions.db", profile: Optional[StorageProfile] = None
+    ):
         """
         Initialize the session store
 
         Args:
             db_path: Path to SQLite database file
+            profile: Storage profile (pragmas, pool, write durability).
+                Defaults to StorageProfile(): WAL with immediate commits.
+                In 'batched' durability, up to flush_interval seconds of
+                messages/tool logs can be lost on a crash.
         """
         self.db_path = Path(db_path)
-        self.engine = create_engine(f"sqlite:///{self.db_path}", echo=False)
+        self.profile = profile or StorageProfile()
+        self.engine = create_engine(
+            f"sqlite:///{self.db_path}", echo=False, **self.profile.engine_options()
+        )
+        self.compression = configure_compression(
+            self.engine, self.profile.compression, self.profile.compression_threshold
+        )
+        apply_pragmas(self.engine, self.profile)
         self.SessionLocal = sessionmaker(bind=self.engine)
 
-        # Create tables
-        Base.metadata.create_all(self.engine)
-
-        # Run migrations (add new columns if they don't exist)
-        self._run_migrations()
+        # Create tables / apply pending schema migrations (one read when current)
+        migrations.migrate(self.engine)
 
-        logger.info(f"Session store initialized: {self.db_path}")
+        # Read-only connections for lookups (never take the write lock)
+        if self.profile.read_only_readers:
+            uri = quote(self.db_path.resolve().as_posix())
+            self.read_engine = create_engine(
+                f"sqlite:///file:{uri}?mode=ro&uri=true",
+                echo=False,
+                **self.profile.engine_options(),
+            )
+            apply_pragmas(self.read_engine, self.profile, read_only=True)
+        else:
+            self.read_engine = self.engine
+        self.ReadSessionLocal = sessionmaker(bind=self.read_engine)
+
+        # In-memory channel routing table (channel_id -> default agent)
+        self._routes_lock = threading.Lock()
+        self._channel_routes: Dict[int, ChannelRoute] = {}
+        self._load_channel_routes()
+
+        # Read-through cache for per-message thread lookups
+        self.thread_cache = ThreadInfoCache(
+            max_size=self.profile.thread_cache_size,
+            ttl=self.profile.thread_cache_ttl,
+        )
+
+        # Write-behind buffer for conversation history and tool logs
+        self._write_buffer = WriteBehindBuffer(
+            self.SessionLocal,
+            durability=self.profile.durability,
+            flush_interval=self.profile.flush_interval,
+            max_batch=self.profile.max_batch,
+        )
+
+        logger.info(
+            f"Session store initialized: {self.db_path} "
+            f"(journal={self.profile.journal_mode or 'default'}, "
+            f"durability={self.profile.durability})"
+        )
 
     def _get_session(self) -> Session:
         """Get a new database session"""
         return self.SessionLocal()
 
-    def _run_migrations(self):
-        """Run database migrations to add new columns"""
-        from sqlalchemy import inspect, text
+    def _get_read_session(self) -> Session:
+        """Get a new session on the read-only connection pool"""
+        return self.ReadSessionLocal()
 
-        inspector = inspect(self.engine)
+    def flush(self) -> int:
+        """
+        Write pending messages, tool logs and last-active updates
+
+        Returns:
+            Number of rows written
+        """
+        return self._write_buffer.flush()
+
+    def _flush_for_read(self) -> None:
+        """
+        Flush before a read so it sees buffered writes
+
+        If the flush fails transiently (the database is locked by another
+        process) the rows stay buffered for the next flush; the read goes on
+        and just misses them.
+        """
+        try:
+            self.flush()
+        except OperationalError as e:
+            logger.debug(f"Read without flushing buffered writes: {e}")
+
+    def close(self) -> None:
+        """Flush pending writes and release database connections"""
+        self._write_buffer.close()
+        # Readers go first so the last connection (the writer) can checkpoint the WAL
+        if self.read_engine is not self.engine:
+            self.read_engine.dispose()
+        self.engine.dispose()
+        logger.info(f"Session store closed: {self.db_path}")
+
+    def _get_page(
+        self,
+        model: Type[Any],
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        newest: bool = False,
+    ) -> List[Any]:
+        """
+        Keyset-paginated read of a per-thread table, ordered by id
 
-        # Check if sdk_session_id column exists in thread_sessions
-        columns = [col["name"] for col in inspector.get_columns("thread_sessions")]
+        With newest=True the page is taken from the newest end of the
+        (after_id, before_id) range; results are always in ascending order.
+        """
+        db = self._get_read_session()
+        try:
+            query = db.query(model).filter(model.thread_id == thread_id)
+            if after_id is not None:
+                query = query.filter(model.id > after_id)
+            if before_id is not None:
+                query = query.filter(model.id < before_id)
+
+            if newest and limit:
+                # Newest rows first, then flip back to chronological order
+                rows = query.order_by(desc(model.id)).limit(limit).all()
+                rows.reverse()
+                return rows
+
+            query = query.order_by(model.id)
+            if limit:
+                query = query.limit(limit)
+            return query.all()
+        finally:
+            db.close()
 
-        if "sdk_session_id" not in columns:
-            logger.info(
-                "Running migration: adding sdk_session_id column to thread_sessions"
+    def _iter_pages(
+        self,
+        model: Type[Any],
+        thread_id: int,
+        page_size: int,
+        after_id: Optional[int],
+        before_id: Optional[int],
+        reverse: bool,
+    ) -> Iterator[List[Any]]:
+        """Yield keyset pages; each page uses its own short read session"""
+        self._flush_for_read()
+        while True:
+            page = self._get_page(
+                model, thread_id, after_id, before_id, page_size, newest=reverse
             )
-            with self.engine.connect() as conn:
-                conn.execute(
-                    text(
-                        "ALTER TABLE thread_sessions ADD COLUMN sdk_session_id VARCHAR(255)"
-                    )
+            if not page:
+                return
+
+            if reverse:
+                page.reverse()
+                before_id = page[-1].id
+            else:
+                after_id = page[-1].id
+            yield page
+
+            if len(page) < page_size:
+                return
+
+    def recompress(self, batch_size: int = 500, vacuum: bool = False) -> Dict[str, int]:
+        """
+        Compress existing plain-text rows in place (one-shot migration)
+
+        Walks conversation_history and tool_logs by id in bounded batches,
+        each in its own short transaction, and rewrites text values above the
+        compression threshold.
+
+        Args:
+            batch_size: Rows per transaction
+            vacuum: Run VACUUM afterwards to return freed pages to the OS
+
+        Returns:
+            Dict with rows rewritten and payload bytes before/after
+        """
+        self.flush()
+        stats = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+        targets = (
+            (ConversationHistory.__table__, ("content",)),
+            (ToolLog.__table__, ("tool_params", "tool_result")),
+        )
+
+        for table, columns in targets:
+            for column in columns:
+                col = table.c[column]
+                stmt = (
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values({column: bindparam("b_value", type_=col.type)})
                 )
-                conn.commit()
-            logger.info("Migration completed: sdk_session_id column added")
+                last_id = 0
+                while True:
+                    with self.engine.begin() as conn:
+                        rows = conn.execute(
+                            select(table.c.id, col)
+                            .where(table.c.id > last_id)
+                            .where(func.typeof(col) == "text")
+                            .order_by(table.c.id)
+                            .limit(batch_size)
+                        ).all()
+                        if not rows:
+                            break
+                        last_id = rows[-1].id
+
+                        changed = []
+                        for row_id, value in rows:
+                            stored = compress_text(value, self.compression)
+                            if isinstance(stored, bytes):
+                                changed.append({"b_id": row_id, "b_value": value})
+                                stats["bytes_before"] += len(value.encode("utf-8"))
+                                stats["bytes_after"] += len(stored)
+                        if changed:
+                            conn.execute(stmt, changed)
+                            stats["rows"] += len(changed)
+
+            logger.info(f"Recompressed {table.name}: {stats['rows']} rows so far")
+
+        if vacuum:
+            with self.engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as conn:
+                conn.exec_driver_sql("VACUUM")
+                if self.profile.journal_mode and self.profile.journal_mode.upper() == "WAL":
+                    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        return stats
+
+    def rebuild_search_index(self, batch_size: int = 1000) -> int:
+        """
+        Rebuild the full-text index from conversation history
+
+        Args:
+            batch_size: Rows read per query
+
+        Returns:
+            Number of messages indexed
+        """
+        self.flush()
+        with self.engine.begin() as conn:
+            indexed = search.rebuild_index(conn, batch_size)
+        logger.info(f"Search index rebuilt: {indexed} messages")
+        return indexed
 
     # ========== Thread Session Management ==========
 
     def create_thread_session(
-        self, thread_id: int, user_id: int, agent_name: str
+        self,
+        thread_id: int,
+        user_id: int,
+        agent_name: str,
+        guild_id: Optional[int] = None,
     ) -> ThreadSession:
         """
         Create a new thread session
@@ -73,6 +315,7 @@ class SessionStore:
             thread_id: Discord thread ID
             user_id: Discord user ID
             agent_name: Agent name
+            guild_id: Discord guild ID (scopes search results)
 
         Returns:
             Created ThreadSession
@@ -80,11 +323,16 @@ class SessionStore:
         db = self._get_session()
         try:
             session = ThreadSession(
-                thread_id=thread_id, user_id=user_id, agent_name=agent_name
+                thread_id=thread_id,
+                user_id=user_id,
+                agent_name=agent_name,
+                guild_id=guild_id,
             )
             db.add(session)
+            stats.bump_stats(db, {stats.TOTAL_SESSIONS: 1, stats.ACTIVE_SESSIONS: 1})
             db.commit()
             db.refresh(session)
+            self.thread_cache.put(self._to_thread_info(session))
             logger.info(f"Created thread session: {thread_id} for user {user_id}")
             return session
         finally:
@@ -100,7 +348,7 @@ class SessionStore:
         Returns:
             ThreadSession if exists, None otherwise
         """
-        db = self._get_session()
+        db = self._get_read_session()
         try:
             return (
                 db.query(ThreadSession)
@@ -110,6 +358,53 @@ class SessionStore:
         finally:
             db.close()
 
+    @staticmethod
+    def _to_thread_info(session: ThreadSession) -> ThreadInfo:
+        """Convert a ThreadSession row to a cacheable ThreadInfo"""
+        return ThreadInfo(
+            thread_id=session.thread_id,
+            user_id=session.user_id,
+            agent_name=session.agent_name,
+            sdk_session_id=session.sdk_session_id,
+            is_active=session.is_active,
+        )
+
+    def get_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """
+        Get routing info for a thread, served from the cache when possible
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            ThreadInfo if the thread session exists, None otherwise
+        """
+        info = self.thread_cache.get(thread_id)
+        if info is not None:
+            return info
+
+        # Core read straight into ThreadInfo (no ORM instance on the miss path)
+        with self.read_engine.connect() as conn:
+            row = conn.execute(
+                queries.SELECT_THREAD_INFO, {"thread_id": thread_id}
+            ).first()
+        info = queries.to_thread_info(row)
+        if info is not None:
+            self.thread_cache.put(info)
+        return info
+
+    def get_cached_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """
+        Get routing info for a thread from the cache only (never touches the DB)
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            Cached ThreadInfo, or None on a cache miss
+        """
+        return self.thread_cache.get(thread_id)
+
     def update_last_active(self, thread_id: int) -> None:
         """
         Update last active timestamp for a thread
@@ -148,6 +443,7 @@ class SessionStore:
             if session:
                 session.sdk_session_id = sdk_session_id
                 db.commit()
+                self.thread_cache.update(thread_id, sdk_session_id=sdk_session_id)
                 logger.info(
                     f"Updated SDK session ID for thread {thread_id}: {sdk_session_id}"
                 )
@@ -169,8 +465,11 @@ class SessionStore:
                 .first()
             )
             if session:
+                if session.is_active:
+                    stats.bump_stats(db, {stats.ACTIVE_SESSIONS: -1})
                 session.is_active = False
                 db.commit()
+                self.thread_cache.update(thread_id, is_active=False)
                 logger.info(f"Thread session {thread_id} marked as inactive")
         finally:
             db.close()
@@ -188,7 +487,8 @@ class SessionStore:
         Returns:
             List of ThreadSession objects
         """
-        db = self._get_session()
+        self._flush_for_read()  # Ordering depends on buffered last-active updates
+        db = self._get_read_session()
         try:
             query = db.query(ThreadSession).filter(ThreadSession.user_id == user_id)
             if active_only:
@@ -197,6 +497,54 @@ class SessionStore:
         finally:
             db.close()
 
+    def delete_thread_session(self, thread_id: int) -> bool:
+        """
+        Delete a thread session together with its history and tool logs
+
+        The cascade is done explicitly in one transaction (SQLite does not
+        enforce the ON DELETE CASCADE foreign keys unless asked to).
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            True if deleted, False if not found
+        """
+        self.flush()
+        history = ConversationHistory.__table__
+        tool_logs = ToolLog.__table__
+        sessions = ThreadSession.__table__
+
+        with self.engine.begin() as conn:
+            was_active = conn.execute(
+                select(sessions.c.is_active).where(sessions.c.thread_id == thread_id)
+            ).scalar()
+            if was_active is None:
+                return False
+
+            message_ids = conn.execute(
+                select(history.c.id).where(history.c.thread_id == thread_id)
+            ).scalars().all()
+            search.unindex_messages(conn, message_ids)
+            conn.execute(history.delete().where(history.c.thread_id == thread_id))
+            deleted_tool_logs = conn.execute(
+                tool_logs.delete().where(tool_logs.c.thread_id == thread_id)
+            ).rowcount
+            conn.execute(sessions.delete().where(sessions.c.thread_id == thread_id))
+            stats.bump_stats(
+                conn,
+                {
+                    stats.TOTAL_SESSIONS: -1,
+                    stats.ACTIVE_SESSIONS: -1 if was_active else 0,
+                    stats.TOTAL_MESSAGES: -len(message_ids),
+                    stats.TOTAL_TOOL_USES: -deleted_tool_logs,
+                },
+            )
+
+        self.thread_cache.invalidate(thread_id)
+        logger.info(f"Deleted thread session {thread_id}")
+        return True
+
     # ========== Conversation History ==========
 
     def add_message(
@@ -212,23 +560,19 @@ class SessionStore:
             message_id: Discord message ID (optional)
 
         Returns:
-            Created ConversationHistory
+            Created ConversationHistory (``id`` is unset until the row is
+            flushed when the store runs in batched mode)
         """
-        db = self._get_session()
-        try:
-            message = ConversationHistory(
-                thread_id=thread_id, role=role, content=content, message_id=message_id
-            )
-            db.add(message)
-            db.commit()
-            db.refresh(message)
-
-            # Update last active
-            self.update_last_active(thread_id)
-
-            return message
-        finally:
-            db.close()
+        row = {
+            "thread_id": thread_id,
+            "role": role,
+            "content": content,
+            "message_id": message_id,
+            "created_at": datetime.utcnow(),
+        }
+        # Also updates the thread's last-active timestamp in the same commit
+        self._write_buffer.add_message(row)
+        return ConversationHistory(**row)
 
     def get_conversation_history(
         self, thread_id: int, limit: Optional[int] = None
@@ -238,29 +582,74 @@ class SessionStore:
 
         Args:
             thread_id: Discord thread ID
-            limit: Maximum number of messages to retrieve (None = all)
+            limit: Maximum number of messages to retrieve (None = all).
+                The newest ``limit`` messages are returned.
 
         Returns:
             List of ConversationHistory objects, ordered by creation time
         """
-        db = self._get_session()
-        try:
-            query = (
-                db.query(ConversationHistory)
-                .filter(ConversationHistory.thread_id == thread_id)
-                .order_by(ConversationHistory.created_at)
-            )
+        self._flush_for_read()
+        return self._get_page(ConversationHistory, thread_id, limit=limit, newest=True)
 
-            if limit:
-                query = query.limit(limit)
+    def get_conversation_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ConversationHistory]:
+        """
+        Get one keyset-paginated page of conversation history
 
-            return query.all()
-        finally:
-            db.close()
+        Args:
+            thread_id: Discord thread ID
+            after_id: Return messages with id greater than this cursor
+            before_id: Return messages with id less than this cursor
+            limit: Page size. Without after_id, the newest messages before
+                the cursor are returned.
 
-    def get_recent_messages(
-        self, thread_id: int, count: int = 10
-    ) -> List[ConversationHistory]:
+        Returns:
+            List of ConversationHistory objects, ordered by creation time
+        """
+        self._flush_for_read()
+        return self._get_page(
+            ConversationHistory,
+            thread_id,
+            after_id,
+            before_id,
+            limit,
+            newest=after_id is None,
+        )
+
+    def iter_conversation_history(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[List[ConversationHistory]]:
+        """
+        Stream a thread's conversation history in pages
+
+        Only one page is held in memory at a time and no read transaction is
+        kept open between pages.
+
+        Args:
+            thread_id: Discord thread ID
+            page_size: Messages per page
+            after_id: Start after this message id
+            before_id: Stop before this message id
+            reverse: Walk from newest to oldest instead
+
+        Yields:
+            Lists of ConversationHistory objects
+        """
+        return self._iter_pages(
+            ConversationHistory, thread_id, page_size, after_id, before_id, reverse
+        )
+
+    def get_recent_messages(self, thread_id: int, count: int = 10) -> List[MessageRow]:
         """
         Get recent messages from a thread
 
@@ -269,19 +658,43 @@ class SessionStore:
             count: Number of recent messages to retrieve
 
         Returns:
-            List of recent ConversationHistory objects
+            List of recent MessageRow, newest first
         """
-        db = self._get_session()
-        try:
-            return (
-                db.query(ConversationHistory)
-                .filter(ConversationHistory.thread_id == thread_id)
-                .order_by(desc(ConversationHistory.created_at))
-                .limit(count)
-                .all()
+        self._flush_for_read()
+        with self.read_engine.connect() as conn:
+            rows = conn.execute(
+                queries.SELECT_RECENT_MESSAGES, {"thread_id": thread_id, "count": count}
             )
-        finally:
-            db.close()
+            return queries.to_message_rows(rows)
+
+    def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[SearchHit]:
+        """
+        Full-text search over conversation history, best matches first
+
+        Args:
+            query: Free-text query (whitespace-separated terms are ANDed)
+            user_id: Only threads started by this user
+            guild_id: Only threads in this guild
+            limit: Maximum number of hits
+
+        Returns:
+            List of SearchHit ranked by BM25, with highlighted snippets
+        """
+        built = search.build_search(query, user_id=user_id, guild_id=guild_id, limit=limit)
+        if built is None:
+            return []
+
+        self._flush_for_read()  # Buffered messages are indexed when they are written
+        statement, params = built
+        with self.read_engine.connect() as conn:
+            rows = conn.execute(statement, params).all()
+        return [SearchHit(**row._mapping) for row in rows]
 
     # ========== Tool Logs ==========
 
@@ -291,6 +704,10 @@ class SessionStore:
         tool_name: str,
         tool_params: Optional[str] = None,
         tool_result: Optional[str] = None,
+        tool_use_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        is_error: Optional[bool] = None,
     ) -> ToolLog:
         """
         Log a tool usage
@@ -300,24 +717,26 @@ class SessionStore:
             tool_name: Name of the tool used
             tool_params: Tool parameters (JSON string)
             tool_result: Tool result
+            tool_use_id: SDK tool_use id pairing the call with its result
+            started_at: When the call was issued (UTC); also used as created_at
+            finished_at: When the result arrived (UTC)
+            is_error: Whether the tool reported an error
 
         Returns:
-            Created ToolLog
+            Created ToolLog (``id`` is unset until the row is flushed when the
+            store runs in batched mode)
         """
-        db = self._get_session()
-        try:
-            log = ToolLog(
-                thread_id=thread_id,
-                tool_name=tool_name,
-                tool_params=tool_params,
-                tool_result=tool_result,
-            )
-            db.add(log)
-            db.commit()
-            db.refresh(log)
-            return log
-        finally:
-            db.close()
+        row = {
+            "thread_id": thread_id,
+            "tool_name": tool_name,
+            "tool_params": tool_params,
+            "tool_result": tool_result,
+            "created_at": started_at or datetime.utcnow(),
+            "tool_use_id": tool_use_id,
+            **tool_metrics.timing_fields(tool_result, started_at, finished_at, is_error),
+        }
+        self._write_buffer.add_tool_log(row)
+        return ToolLog(**row)
 
     def get_tool_logs(
         self, thread_id: int, limit: Optional[int] = None
@@ -327,51 +746,160 @@ class SessionStore:
 
         Args:
             thread_id: Discord thread ID
-            limit: Maximum number of logs to retrieve
+            limit: Maximum number of logs to retrieve (the newest are returned)
 
         Returns:
-            List of ToolLog objects
+            List of ToolLog objects, ordered by creation time
         """
-        db = self._get_session()
-        try:
-            query = (
-                db.query(ToolLog)
-                .filter(ToolLog.thread_id == thread_id)
-                .order_by(ToolLog.created_at)
-            )
+        self._flush_for_read()
+        return self._get_page(ToolLog, thread_id, limit=limit, newest=True)
 
-            if limit:
-                query = query.limit(limit)
+    def get_tool_log_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ToolLog]:
+        """
+        Get one keyset-paginated page of tool logs
 
-            return query.all()
-        finally:
-            db.close()
+        Args:
+            thread_id: Discord thread ID
+            after_id: Return logs with id greater than this cursor
+            before_id: Return logs with id less than this cursor
+            limit: Page size. Without after_id, the newest logs before the
+                cursor are returned.
+
+        Returns:
+            List of ToolLog objects, ordered by creation time
+        """
+        self._flush_for_read()
+        return self._get_page(
+            ToolLog, thread_id, after_id, before_id, limit, newest=after_id is None
+        )
+
+    def iter_tool_logs(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[List[ToolLog]]:
+        """
+        Stream a thread's tool logs in pages
+
+        Args:
+            thread_id: Discord thread ID
+            page_size: Logs per page
+            after_id: Start after this log id
+            before_id: Stop before this log id
+            reverse: Walk from newest to oldest instead
+
+        Yields:
+            Lists of ToolLog objects
+        """
+        return self._iter_pages(
+            ToolLog, thread_id, page_size, after_id, before_id, reverse
+        )
+
+    def get_tool_rollup(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_name: Optional[str] = None,
+        tool_name: Optional[str] = None,
+    ) -> List[ToolRollup]:
+        """
+        Per-day latency, payload size and error rate of each agent's tools
+
+        Args:
+            since: Tool calls logged at or after (UTC)
+            until: Tool calls logged before (UTC)
+            agent_name: Only this agent's threads
+            tool_name: Only this tool
+
+        Returns:
+            List of ToolRollup (p50/p95 by nearest rank), ordered by day,
+            agent and tool
+        """
+        self._flush_for_read()
+        statement = tool_metrics.build_rollup(since, until, agent_name, tool_name)
+        with self.read_engine.connect() as conn:
+            return [tool_metrics.to_rollup(row) for row in conn.execute(statement)]
 
     # ========== Channel Settings ==========
 
-    def get_channel_settings(self, channel_id: int) -> Optional[ChannelSettings]:
+    def _load_channel_routes(self) -> int:
+        """
+        Load the channel routing table (channel_id -> default agent) from the DB
+
+        Returns:
+            Number of channels loaded
+        """
+        with self._routes_lock:
+            with self.read_engine.connect() as conn:
+                routes = {
+                    route.channel_id: route
+                    for route in map(
+                        queries.to_channel_route,
+                        conn.execute(queries.SELECT_CHANNEL_ROUTES),
+                    )
+                }
+            self._channel_routes = routes
+        return len(routes)
+
+    def refresh_channel_routes(self) -> int:
+        """
+        Reload the channel routing table to pick up other processes' changes
+
+        Returns:
+            Number of channels loaded
+        """
+        count = self._load_channel_routes()
+        logger.debug(f"Channel routing table refreshed: {count} channels")
+        return count
+
+    @staticmethod
+    def _to_channel_route(settings: ChannelSettings) -> ChannelRoute:
+        """Convert a ChannelSettings row to a routing table entry"""
+        return ChannelRoute(
+            channel_id=settings.channel_id,
+            guild_id=settings.guild_id,
+            default_agent=settings.default_agent,
+            created_at=settings.created_at,
+            updated_at=settings.updated_at,
+        )
+
+    def get_channel_default_agent(self, channel_id: int) -> Optional[str]:
+        """
+        Get a channel's default agent from the in-memory routing table
+
+        Args:
+            channel_id: Discord channel ID
+
+        Returns:
+            Agent name, or None if the channel has no default
         """
-        Get channel settings by channel ID
+        route = self._channel_routes.get(channel_id)
+        return route.default_agent if route else None
+
+    def get_channel_settings(self, channel_id: int) -> Optional[ChannelRoute]:
+        """
+        Get channel settings by channel ID (from the routing table)
 
         Args:
             channel_id: Discord channel ID
 
         Returns:
-            ChannelSettings if exists, None otherwise
+            ChannelRoute if exists, None otherwise
         """
-        db = self._get_session()
-        try:
-            return (
-                db.query(ChannelSettings)
-                .filter(ChannelSettings.channel_id == channel_id)
-                .first()
-            )
-        finally:
-            db.close()
+        return self._channel_routes.get(channel_id)
 
     def set_channel_default_agent(
         self, channel_id: int, guild_id: int, agent_name: Optional[str]
-    ) -> ChannelSettings:
+    ) -> ChannelRoute:
         """
         Set or update default agent for a channel
 
@@ -381,37 +909,41 @@ class SessionStore:
             agent_name: Agent name (None to clear)
 
         Returns:
-            Updated or created ChannelSettings
+            Updated or created ChannelRoute
         """
-        db = self._get_session()
-        try:
-            settings = (
-                db.query(ChannelSettings)
-                .filter(ChannelSettings.channel_id == channel_id)
-                .first()
-            )
-
-            if settings:
-                # Update existing settings
-                settings.default_agent = agent_name
-                settings.updated_at = datetime.utcnow()
-            else:
-                # Create new settings
-                settings = ChannelSettings(
-                    channel_id=channel_id,
-                    guild_id=guild_id,
-                    default_agent=agent_name,
+        with self._routes_lock:
+            db = self._get_session()
+            try:
+                settings = (
+                    db.query(ChannelSettings)
+                    .filter(ChannelSettings.channel_id == channel_id)
+                    .first()
                 )
-                db.add(settings)
 
-            db.commit()
-            db.refresh(settings)
-            logger.info(
-                f"Set default agent for channel {channel_id}: {agent_name or '(cleared)'}"
-            )
-            return settings
-        finally:
-            db.close()
+                if settings:
+                    # Update existing settings
+                    settings.default_agent = agent_name
+                    settings.updated_at = datetime.utcnow()
+                else:
+                    # Create new settings
+                    settings = ChannelSettings(
+                        channel_id=channel_id,
+                        guild_id=guild_id,
+                        default_agent=agent_name,
+                    )
+                    db.add(settings)
+                    stats.bump_stats(db, {stats.CHANNEL_SETTINGS: 1})
+
+                db.commit()
+                db.refresh(settings)
+                route = self._to_channel_route(settings)
+                self._channel_routes[channel_id] = route
+                logger.info(
+                    f"Set default agent for channel {channel_id}: {agent_name or '(cleared)'}"
+                )
+                return route
+            finally:
+                db.close()
 
     def delete_channel_settings(self, channel_id: int) -> bool:
         """
@@ -423,68 +955,629 @@ class SessionStore:
         Returns:
             True if deleted, False if not found
         """
-        db = self._get_session()
+        with self._routes_lock:
+            db = self._get_session()
+            try:
+                settings = (
+                    db.query(ChannelSettings)
+                    .filter(ChannelSettings.channel_id == channel_id)
+                    .first()
+                )
+
+                if settings:
+                    db.delete(settings)
+                    stats.bump_stats(db, {stats.CHANNEL_SETTINGS: -1})
+                    db.commit()
+                    self._channel_routes.pop(channel_id, None)
+                    logger.info(f"Deleted settings for channel {channel_id}")
+                    return True
+                return False
+            finally:
+                db.close()
+
+    def list_guild_settings(self, guild_id: int) -> List[ChannelRoute]:
+        """
+        List all channel settings for a guild (from the routing table)
+
+        Args:
+            guild_id: Discord guild ID
+
+        Returns:
+            List of ChannelRoute for the guild
+        """
+        return [
+            route
+            for route in self._channel_routes.values()
+            if route.guild_id == guild_id
+        ]
+
+    # ========== Retention ==========
+
+    def find_idle_threads(
+        self,
+        idle_before: datetime,
+        active: Optional[bool] = None,
+        with_rows_only: bool = False,
+        limit: int = 500,
+    ) -> List[ThreadSession]:
+        """
+        Find threads whose last activity is older than a cutoff
+
+        Args:
+            idle_before: Last-active cutoff
+            active: Filter on is_active (None = both)
+            with_rows_only: Only threads that still have history or tool logs
+            limit: Maximum number of threads to return
+
+        Returns:
+            List of ThreadSession objects, oldest activity first
+        """
+        self._flush_for_read()
+        db = self._get_read_session()
         try:
-            settings = (
-                db.query(ChannelSettings)
-                .filter(ChannelSettings.channel_id == channel_id)
-                .first()
+            query = db.query(ThreadSession).filter(
+                ThreadSession.last_active_at < idle_before
             )
+            if active is not None:
+                query = query.filter(ThreadSession.is_active == active)
+            if with_rows_only:
+                has_messages = (
+                    select(ConversationHistory.id)
+                    .where(ConversationHistory.thread_id == ThreadSession.thread_id)
+                    .exists()
+                )
+                has_tool_logs = (
+                    select(ToolLog.id)
+                    .where(ToolLog.thread_id == ThreadSession.thread_id)
+                    .exists()
+                )
+                query = query.filter(has_messages | has_tool_logs)
+            return query.order_by(ThreadSession.last_active_at).limit(limit).all()
+        finally:
+            db.close()
 
-            if settings:
-                db.delete(settings)
-                db.commit()
-                logger.info(f"Deleted settings for channel {channel_id}")
-                return True
-            return False
+    def mark_threads_inactive(self, thread_ids: List[int]) -> int:
+        """
+        Mark several thread sessions as inactive in one transaction
+
+        Args:
+            thread_ids: Discord thread IDs
+
+        Returns:
+            Number of threads updated
+        """
+        if not thread_ids:
+            return 0
+
+        db = self._get_session()
+        try:
+            updated = (
+                db.query(ThreadSession)
+                .filter(ThreadSession.thread_id.in_(thread_ids))
+                .filter(ThreadSession.is_active == True)
+                .update(
+                    # Keep last_active_at (the column has onupdate) so the
+                    # threads still qualify for archiving
+                    {
+                        ThreadSession.is_active: False,
+                        ThreadSession.last_active_at: ThreadSession.last_active_at,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            stats.bump_stats(db, {stats.ACTIVE_SESSIONS: -updated})
+            db.commit()
         finally:
             db.close()
 
-    def list_guild_settings(self, guild_id: int) -> List[ChannelSettings]:
+        for thread_id in thread_ids:
+            self.thread_cache.update(thread_id, is_active=False)
+        return updated
+
+    def delete_thread_rows(
+        self,
+        thread_id: int,
+        max_message_id: Optional[int],
+        max_tool_log_id: Optional[int],
+        batch_size: int = 500,
+    ) -> Dict[str, int]:
         """
-        List all channel settings for a guild
+        Delete a thread's history and tool logs up to the given ids
+
+        Rows are deleted in bounded batches, each in its own short transaction,
+        so the write lock is never held for long. Rows added after the cursor
+        ids (e.g. while archiving) are kept.
 
         Args:
-            guild_id: Discord guild ID
+            thread_id: Discord thread ID
+            max_message_id: Delete conversation rows with id <= this (None = none)
+            max_tool_log_id: Delete tool-log rows with id <= this (None = none)
+            batch_size: Rows per transaction
 
         Returns:
-            List of ChannelSettings for the guild
+            Dict with deleted message and tool-log counts
         """
+        self.flush()
+        deleted = {"messages": 0, "tool_logs": 0}
+        targets = (
+            ("messages", ConversationHistory.__table__, max_message_id,
+             stats.TOTAL_MESSAGES),
+            ("tool_logs", ToolLog.__table__, max_tool_log_id, stats.TOTAL_TOOL_USES),
+        )
+
+        for key, table, max_id, counter in targets:
+            if max_id is None:
+                continue
+            batch = (
+                select(table.c.id)
+                .where(table.c.thread_id == thread_id)
+                .where(table.c.id <= max_id)
+                .limit(batch_size)
+            )
+            while True:
+                with self.engine.begin() as conn:
+                    ids = conn.execute(batch).scalars().all()
+                    if not ids:
+                        break
+                    conn.execute(table.delete().where(table.c.id.in_(ids)))
+                    if table is ConversationHistory.__table__:
+                        search.unindex_messages(conn, ids)
+                    stats.bump_stats(conn, {counter: -len(ids)})
+                deleted[key] += len(ids)
+
+        return deleted
+
+    def restore_thread_rows(
+        self,
+        thread_id: int,
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Re-insert archived history and tool logs and reactivate the thread
+
+        Args:
+            thread_id: Discord thread ID
+            messages: ConversationHistory column values (without id)
+            tool_logs: ToolLog column values (without id)
+        """
+        self.flush()
         db = self._get_session()
         try:
-            return (
-                db.query(ChannelSettings)
-                .filter(ChannelSettings.guild_id == guild_id)
-                .all()
+            if messages:
+                ids = db.execute(
+                    insert(ConversationHistory).returning(
+                        ConversationHistory.id, sort_by_parameter_order=True
+                    ),
+                    messages,
+                ).scalars()
+                search.index_messages(
+                    db,
+                    [
+                        {"id": message_id, "content": row["content"]}
+                        for message_id, row in zip(ids, messages)
+                    ],
+                )
+            if tool_logs:
+                db.execute(insert(ToolLog), tool_logs)
+            reactivated = (
+                db.query(ThreadSession)
+                .filter(ThreadSession.thread_id == thread_id)
+                .filter(ThreadSession.is_active == False)
+                .update({ThreadSession.is_active: True}, synchronize_session=False)
+            )
+            stats.bump_stats(
+                db,
+                {
+                    stats.TOTAL_MESSAGES: len(messages),
+                    stats.TOTAL_TOOL_USES: len(tool_logs),
+                    stats.ACTIVE_SESSIONS: reactivated,
+                },
             )
+            db.commit()
         finally:
             db.close()
 
+        self.thread_cache.update(thread_id, is_active=True)
+
+    # ========== Bulk Import ==========
+
+    def existing_thread_ids(self, thread_ids: List[int]) -> Set[int]:
+        """
+        Find which of the given thread ids already have a session
+
+        Args:
+            thread_ids: Discord thread IDs
+
+        Returns:
+            Subset of thread_ids present in the database
+        """
+        if not thread_ids:
+            return set()
+        sessions = ThreadSession.__table__
+        with self.read_engine.connect() as conn:
+            return set(
+                conn.execute(
+                    select(sessions.c.thread_id).where(
+                        sessions.c.thread_id.in_(thread_ids)
+                    )
+                ).scalars()
+            )
+
+    def import_rows(
+        self,
+        threads: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+    ) -> None:
+        """
+        Insert one batch of exported rows in a single transaction
+
+        Messages and tool logs get new ids (in the given order) and messages
+        are added to the search index; counters are bumped in the same
+        transaction.
+
+        Args:
+            threads: ThreadSession column values (thread ids must be new)
+            messages: ConversationHistory column values (without id)
+            tool_logs: ToolLog column values (without id)
+        """
+        self.flush()
+        with self.engine.begin() as conn:
+            if threads:
+                conn.execute(insert(ThreadSession), threads)
+            if messages:
+                ids = conn.execute(
+                    insert(ConversationHistory).returning(
+                        ConversationHistory.id, sort_by_parameter_order=True
+                    ),
+                    messages,
+                ).scalars()
+                search.index_messages(
+                    conn,
+                    [
+                        {"id": message_id, "content": row["content"]}
+                        for message_id, row in zip(ids, messages)
+                    ],
+                )
+            if tool_logs:
+                conn.execute(insert(ToolLog), tool_logs)
+            stats.bump_stats(
+                conn,
+                {
+                    stats.TOTAL_SESSIONS: len(threads),
+                    stats.ACTIVE_SESSIONS: sum(1 for t in threads if t["is_active"]),
+                    stats.TOTAL_MESSAGES: len(messages),
+                    stats.TOTAL_TOOL_USES: len(tool_logs),
+                },
+            )
+
+    # ========== Message Queue Journal ==========
+
+    def enqueue_message(
+        self,
+        bot_id: int,
+        thread_id: int,
+        message_id: int,
+        user_id: int,
+        content: str,
+        has_attachments: bool = False,
+        author_name: str = "",
+        attachments: Sequence[Dict[str, Any]] = (),
+    ) -> bool:
+        """
+        Append a queued thread message to the durable journal
+
+        Written straight through (not via the write-behind buffer) so the
+        entry survives a crash right after the message was accepted.
+
+        Args:
+            bot_id: Discord user ID of the bot that owns the thread
+            thread_id: Discord thread ID
+            message_id: Discord message ID
+            user_id: Author's Discord user ID
+            content: Message content
+            has_attachments: Whether the message has attachments
+            author_name: Author's display name
+            attachments: Attachment metadata dicts (filename, url, size,
+                content_type)
+
+        Returns:
+            True if appended, False if the message was already journaled
+        """
+        statement = sqlite_insert(MessageQueueEntry).on_conflict_do_nothing(
+            index_elements=["message_id"]
+        )
+        values = message_journal.entry_values(
+            bot_id,
+            thread_id,
+            message_id,
+            user_id,
+            content,
+            has_attachments,
+            author_name,
+            attachments,
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(statement, values).rowcount > 0
+
+    def claim_messages(self, thread_id: int, message_ids: List[int]) -> int:
+        """
+        Mark journaled messages as taken by an agent turn
+
+        Args:
+            thread_id: Discord thread ID
+            message_ids: Discord message IDs about to be handled
+
+        Returns:
+            Number of entries claimed (already claimed ones are skipped)
+        """
+        if not message_ids:
+            return 0
+        with self.engine.begin() as conn:
+            return conn.execute(
+                message_journal.CLAIM_ENTRIES,
+                {"message_ids": message_ids, "claimed_at": datetime.utcnow()},
+            ).rowcount
+
+    def ack_messages(
+        self, thread_id: int, message_ids: List[int], tombstone: bool = False
+    ) -> int:
+        """
+        Remove handled (or deleted) messages from the journal
+
+        Args:
+            thread_id: Discord thread ID
+            message_ids: Discord message IDs
+            tombstone: Keep the rows as acked, so enqueue_message still
+                rejects the messages until prune_message_queue removes them
+
+        Returns:
+            Number of entries removed
+        """
+        if not message_ids:
+            return 0
+        with self.engine.begin() as conn:
+            if tombstone:
+                return conn.execute(
+                    message_journal.TOMBSTONE_ENTRIES,
+                    {"message_ids": message_ids, "now": datetime.utcnow()},
+                ).rowcount
+            return conn.execute(
+                message_journal.ACK_ENTRIES, {"message_ids": message_ids}
+            ).rowcount
+
+    def update_queued_message(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        Replace the content of a journaled message that was edited (or that
+        another message was merged into)
+
+        Args:
+            thread_id: Discord thread ID
+            message_id: Discord message ID
+            content: New message content
+            attachments: New attachment metadata dicts (None: keep them)
+
+        Returns:
+            True if an unclaimed entry was updated
+        """
+        statement, params = message_journal.update_params(
+            message_id, content, attachments
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(statement, params).rowcount > 0
+
+    def prune_message_queue(self, older_than: float) -> int:
+        """
+        Delete journal tombstones acked more than older_than seconds ago
+
+        Args:
+            older_than: Age in seconds
+
+        Returns:
+            Number of tombstones deleted
+        """
+        before = datetime.utcnow() - timedelta(seconds=older_than)
+        with self.engine.begin() as conn:
+            return conn.execute(
+                message_journal.PRUNE_TOMBSTONES, {"before": before}
+            ).rowcount
+
+    def load_message_queue(self, bot_id: int) -> List[QueueEntry]:
+        """
+        Load a bot's journaled messages (for resuming after a restart)
+
+        Args:
+            bot_id: Discord user ID of the bot
+
+        Returns:
+            List of QueueEntry in enqueue order
+        """
+        with self.read_engine.connect() as conn:
+            return [
+                message_journal.to_entry(row)
+                for row in conn.execute(
+                    message_journal.SELECT_ENTRIES, {"bot_id": bot_id}
+                )
+            ]
+
+    def load_thread_queue(
+        self, bot_id: int, thread_id: int, unclaimed_only: bool = False
+    ) -> List[QueueEntry]:
+        """
+        Load one thread's journaled messages (for adopting a leased thread)
+
+        Args:
+            bot_id: Discord user ID of the bot
+            thread_id: Discord thread ID
+            unclaimed_only: Skip entries an agent turn has already claimed
+
+        Returns:
+            List of QueueEntry in enqueue order
+        """
+        statement = (
+            message_journal.SELECT_UNCLAIMED_THREAD_ENTRIES
+            if unclaimed_only
+            else message_journal.SELECT_THREAD_ENTRIES
+        )
+        with self.read_engine.connect() as conn:
+            return [
+                message_journal.to_entry(row)
+                for row in conn.execute(
+                    statement, {"bot_id": bot_id, "b_thread_id": thread_id}
+                )
+            ]
+
+    # ========== Thread Ownership Leases ==========
+
+    def acquire_thread_lease(self, thread_id: int, owner: str, ttl: float) -> bool:
+        """
+        Take (or extend) the lease on a thread's queue
+
+        Succeeds if the thread has no lease, the lease is already owner's or
+        it has expired.
+
+        Args:
+            thread_id: Discord thread ID
+            owner: Node ID of the caller
+            ttl: Seconds the lease lasts without renewal
+
+        Returns:
+            True if owner holds the lease now
+        """
+        with self.engine.begin() as conn:
+            return (
+                conn.execute(
+                    leases.ACQUIRE_SQLITE, leases.acquire_params(thread_id, owner, ttl)
+                ).rowcount
+                > 0
+            )
+
+    def renew_thread_leases(
+        self, owner: str, thread_ids: List[int], ttl: float
+    ) -> List[int]:
+        """
+        Extend the leases owner holds by ttl seconds from now
+
+        Args:
+            owner: Node ID of the caller
+            thread_ids: Threads owner believes it holds
+            ttl: Seconds the leases last without renewal
+
+        Returns:
+            Thread IDs whose lease owner still holds (the others were taken
+            over after expiring)
+        """
+        if not thread_ids:
+            return []
+        params = leases.renew_params(owner, thread_ids, ttl)
+        with self.engine.begin() as conn:
+            conn.execute(leases.RENEW_LEASES, params)
+            return list(conn.execute(leases.SELECT_HELD, params).scalars())
+
+    def release_thread_lease(self, thread_id: int, owner: str) -> bool:
+        """
+        Give up the lease on a thread (no-op if someone else holds it)
+
+        Returns:
+            True if owner's lease was removed
+        """
+        with self.engine.begin() as conn:
+            return (
+                conn.execute(
+                    leases.RELEASE_LEASE, leases.release_params(thread_id, owner)
+                ).rowcount
+                > 0
+            )
+
+    def find_unleased_threads(self, bot_id: int) -> List[int]:
+        """
+        Threads with unacked journal entries that no node holds a live lease on
+
+        Args:
+            bot_id: Discord user ID of the bot
+
+        Returns:
+            Thread IDs another node may adopt
+        """
+        with self.engine.connect() as conn:
+            return list(
+                conn.execute(
+                    message_journal.SELECT_UNLEASED_THREADS,
+                    {"bot_id": bot_id, "now": datetime.utcnow()},
+                ).scalars()
+            )
+
+    def leased_threads(self, thread_ids: List[int]) -> List[int]:
+        """
+        Which of thread_ids some node holds an unexpired lease on
+
+        Used by ShardedSessionStore, whose leases live in the first shard
+        while journal entries are spread over all of them.
+
+        Args:
+            thread_ids: Discord thread IDs
+
+        Returns:
+            The leased thread IDs
+        """
+        if not thread_ids:
+            return []
+        with self.engine.connect() as conn:
+            return list(
+                conn.execute(
+                    leases.SELECT_LIVE,
+                    {"thread_ids": thread_ids, "now": datetime.utcnow()},
+                ).scalars()
+            )
+
     # ========== Statistics ==========
 
     def get_stats(self) -> Dict[str, Any]:
         """
         Get database statistics
 
+        Served from the incrementally maintained counters (O(1)); see
+        reconcile_stats for correcting drift.
+
         Returns:
             Dictionary with statistics
         """
-        db = self._get_session()
+        self._flush_for_read()
+        db = self._get_read_session()
         try:
-            total_sessions = db.query(ThreadSession).count()
-            active_sessions = (
-                db.query(ThreadSession).filter(ThreadSession.is_active == True).count()
-            )
-            total_messages = db.query(ConversationHistory).count()
-            total_tools = db.query(ToolLog).count()
-            total_channel_settings = db.query(ChannelSettings).count()
-
-            return {
-                "total_sessions": total_sessions,
-                "active_sessions": active_sessions,
-                "total_messages": total_messages,
-                "total_tool_uses": total_tools,
-                "channel_settings": total_channel_settings,
-            }
+            return stats.read_stats(db)
         finally:
             db.close()
+
+    def reconcile_stats(self) -> Dict[str, int]:
+        """
+        Recount every table and overwrite the stats counters
+
+        Runs in a single write transaction (BEGIN IMMEDIATE) so no write can
+        land between the recount and the overwrite. The COUNT(*) scans hold
+        the write lock while they run, so call this periodically rather than
+        per request.
+
+        Returns:
+            Dict of counter name -> correction applied (0 when no drift)
+        """
+        self.flush()
+        with self.engine.connect() as conn:
+            # pysqlite runs SELECTs outside a transaction; take the lock explicitly
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            current = stats.read_stats(conn)
+            exact = stats.count_stats(conn)
+            stats.write_stats(conn, exact)
+            conn.commit()
+
+        drift = {name: exact[name] - current[name] for name in stats.STAT_NAMES}
+        if any(drift.values()):
+            logger.info(f"Stats counters reconciled: {drift}")
+        return drift
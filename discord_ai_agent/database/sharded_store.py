@@ -0,0 +1,854 @@
+"""Per-guild sharding of the SQLite session database across several files"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import select, union
+
+from . import tool_metrics
+from .cache import MissCache
+from .models import ThreadSession, ConversationHistory, ToolLog, ChannelSettings
+from .rows import (
+    ThreadInfo,
+    ChannelRoute,
+    MessageRow,
+    SearchHit,
+    ToolRollup,
+    QueueEntry,
+)
+from .session_store import SessionStore
+from .storage_profile import StorageProfile
+
+logger = logging.getLogger(__name__)
+
+SHARD_MAP_FILE = "shard_map.json"
+
+# Seconds a thread found in no shard is routed to shard 0 without probing
+# again. Short, because another process may create the thread meanwhile.
+THREAD_MISS_TTL = 10.0
+
+
+@dataclass
+class ShardMap:
+    """
+    Which shard holds each guild
+
+    Guilds are placed by a stable hash of the guild id unless pinned to a
+    shard; pins are how guilds are rebalanced and how existing guilds keep
+    their place when shards are added. Threads without a guild (DMs) live
+    in shard 0.
+    """
+
+    count: int
+    guilds: Dict[int, int] = field(default_factory=dict)  # Pinned guild -> shard
+
+    def shard_for_guild(self, guild_id: Optional[int]) -> int:
+        if guild_id is None:
+            return 0
+        pinned = self.guilds.get(guild_id)
+        if pinned is not None:
+            return pinned
+        # crc32 rather than hash(): placement must not change between processes
+        return zlib.crc32(guild_id.to_bytes(8, "little", signed=True)) % self.count
+
+    @classmethod
+    def load(cls, path: Path) -> "ShardMap":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            count=data["count"],
+            guilds={int(guild): shard for guild, shard in data.get("guilds", {}).items()},
+        )
+
+    def save(self, path: Path) -> None:
+        """Write the map atomically (a crash leaves the old or the new map)"""
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"count": self.count, "guilds": {str(g): s for g, s in self.guilds.items()}},
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+
+
+class ShardedSessionStore:
+    """
+    SessionStore surface over one SQLite file per shard
+
+    SQLite allows one writer per database file, so one guild's busy threads
+    delay every other guild's commits. Sharding by guild gives each shard
+    its own write lock, write-behind buffer and WAL; wrapped in
+    AsyncSessionStore, every shard gets its own single-writer executor, so
+    writes to different shards commit in parallel.
+
+    Threads are routed by the guild they were created in (and remembered);
+    a thread this process has not seen is looked up in every shard, and a
+    thread found in none is not looked up again for THREAD_MISS_TTL. Channel
+    settings live in their guild's shard. Stats, searches, user listings and
+    tool rollups are fanned out to every shard and merged.
+
+    Shard placement is recorded in ``shard_map.json`` next to the shard
+    files. Rebalance (move_guild / set_shard_count) while the bot is stopped:
+    running processes only read the map at startup.
+    """
+
+    def __init__(
+        self,
+        shard_dir: str,
+        shard_count: Optional[int] = None,
+        profile: Optional[StorageProfile] = None,
+    ):
+        """
+        Initialize the sharded session store
+
+        Args:
+            shard_dir: Directory holding shard-NN.db files and shard_map.json
+            shard_count: Number of shards. Creates the map for a new
+                directory; a larger value than the map's adds shards (existing
+                guilds stay where they are). None = use the existing map.
+            profile: Storage profile applied to every shard
+
+        Raises:
+            ValueError: If there is no shard map and no shard_count
+        """
+        self.shard_dir = Path(shard_dir)
+        self.profile = profile or StorageProfile()
+        self.map_path = self.shard_dir / SHARD_MAP_FILE
+        # RetentionManager puts its default archive directory next to db_path
+        self.db_path = self.map_path
+
+        if self.map_path.exists():
+            self.shard_map = ShardMap.load(self.map_path)
+        elif shard_count:
+            self.shard_dir.mkdir(parents=True, exist_ok=True)
+            self.shard_map = ShardMap(count=shard_count)
+            self.shard_map.save(self.map_path)
+        else:
+            raise ValueError(f"Shard map not found: {self.map_path}")
+
+        self.shards: List[SessionStore] = [
+            self._open_shard(index) for index in range(self.shard_map.count)
+        ]
+
+        # thread_id -> shard index (threads never move while the bot runs)
+        self._thread_shards: Dict[int, int] = {}
+        self._thread_misses = MissCache(
+            max_size=self.profile.thread_cache_size, ttl=THREAD_MISS_TTL
+        )
+        self._map_lock = threading.Lock()
+
+        if shard_count and shard_count > self.shard_map.count:
+            self.set_shard_count(shard_count)
+        elif shard_count and shard_count < self.shard_map.count:
+            logger.warning(
+                f"Configured shards={shard_count} is below the shard map's "
+                f"{self.shard_map.count}; keeping {self.shard_map.count} "
+                f"(move guilds off the extra shards to shrink)"
+            )
+        logger.info(
+            f"Sharded session store initialized: {self.shard_dir} "
+            f"({self.shard_map.count} shards, {len(self.shard_map.guilds)} pinned guilds)"
+        )
+
+    def _open_shard(self, index: int) -> SessionStore:
+        return SessionStore(
+            str(self.shard_dir / f"shard-{index:02d}.db"), profile=self.profile
+        )
+
+    # ========== Routing ==========
+
+    def _shard_for_guild(self, guild_id: Optional[int]) -> SessionStore:
+        return self.shards[self.shard_map.shard_for_guild(guild_id)]
+
+    def _remember_thread(self, thread_id: int, index: int) -> None:
+        self._thread_shards[thread_id] = index
+        self._thread_misses.discard(thread_id)
+
+    def _find_thread(self, thread_id: int) -> Optional[int]:
+        """Shard index holding a thread (None if no shard has it)"""
+        index = self._thread_shards.get(thread_id)
+        if index is not None or thread_id in self._thread_misses:
+            return index
+        for index, shard in enumerate(self.shards):
+            if shard.get_thread_info(thread_id) is not None:
+                self._thread_shards[thread_id] = index
+                return index
+        self._thread_misses.add(thread_id)
+        return None
+
+    def cached_shard_index(self, thread_id: int) -> Optional[int]:
+        """
+        Shard index for a thread's calls, if known without a query
+
+        Returns:
+            The shard index (0 for a thread recently found in no shard), or
+            None if shard_index_for_thread has to look it up
+        """
+        index = self._thread_shards.get(thread_id)
+        if index is None and thread_id in self._thread_misses:
+            return 0
+        return index
+
+    def shard_index_for_thread(self, thread_id: int) -> int:
+        """
+        Shard index for a thread's calls (may query every shard)
+
+        Rows for a thread without a session go to shard 0, where threads
+        without a guild live.
+        """
+        index = self._find_thread(thread_id)
+        return index if index is not None else 0
+
+    def _shard_for_thread(self, thread_id: int) -> SessionStore:
+        """Shard holding a thread (shard 0 for a thread without a session)"""
+        return self.shards[self.shard_index_for_thread(thread_id)]
+
+    def _shard_for_channel(self, channel_id: int) -> Optional[SessionStore]:
+        for shard in self.shards:
+            if shard.get_channel_settings(channel_id) is not None:
+                return shard
+        return None
+
+    # ========== Lifecycle ==========
+
+    def flush(self) -> int:
+        """Flush every shard's buffered writes"""
+        return sum(shard.flush() for shard in self.shards)
+
+    def close(self) -> None:
+        """Flush pending writes and close every shard"""
+        for shard in self.shards:
+            shard.close()
+        logger.info(f"Sharded session store closed: {self.shard_dir}")
+
+    def recompress(self, batch_size: int = 500, vacuum: bool = False) -> Dict[str, int]:
+        """Run SessionStore.recompress on every shard and add up the results"""
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for name, value in shard.recompress(batch_size, vacuum).items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def rebuild_search_index(self, batch_size: int = 1000) -> int:
+        """Rebuild every shard's search index"""
+        return sum(shard.rebuild_search_index(batch_size) for shard in self.shards)
+
+    # ========== Thread Session Management ==========
+
+    def create_thread_session(
+        self,
+        thread_id: int,
+        user_id: int,
+        agent_name: str,
+        guild_id: Optional[int] = None,
+    ) -> ThreadSession:
+        """Create a thread session in its guild's shard"""
+        index = self.shard_map.shard_for_guild(guild_id)
+        session = self.shards[index].create_thread_session(
+            thread_id, user_id, agent_name, guild_id
+        )
+        self._remember_thread(thread_id, index)
+        return session
+
+    def get_thread_session(self, thread_id: int) -> Optional[ThreadSession]:
+        """Routed version of SessionStore.get_thread_session"""
+        index = self._find_thread(thread_id)
+        return self.shards[index].get_thread_session(thread_id) if index is not None else None
+
+    def get_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """Routed version of SessionStore.get_thread_info"""
+        index = self._find_thread(thread_id)
+        return self.shards[index].get_thread_info(thread_id) if index is not None else None
+
+    def get_cached_thread_info(self, thread_id: int) -> Optional[ThreadInfo]:
+        """Cached thread info, if the thread's shard is already known"""
+        index = self._thread_shards.get(thread_id)
+        if index is None:
+            return None
+        return self.shards[index].get_cached_thread_info(thread_id)
+
+    def update_last_active(self, thread_id: int) -> None:
+        """Routed version of SessionStore.update_last_active"""
+        self._shard_for_thread(thread_id).update_last_active(thread_id)
+
+    def update_sdk_session_id(self, thread_id: int, sdk_session_id: str) -> None:
+        """Routed version of SessionStore.update_sdk_session_id"""
+        self._shard_for_thread(thread_id).update_sdk_session_id(thread_id, sdk_session_id)
+
+    def set_thread_inactive(self, thread_id: int) -> None:
+        """Routed version of SessionStore.set_thread_inactive"""
+        self._shard_for_thread(thread_id).set_thread_inactive(thread_id)
+
+    def get_user_sessions(
+        self, user_id: int, active_only: bool = True
+    ) -> List[ThreadSession]:
+        """A user's sessions from every shard, most recently active first"""
+        sessions = [
+            session
+            for shard in self.shards
+            for session in shard.get_user_sessions(user_id, active_only)
+        ]
+        sessions.sort(key=lambda s: s.last_active_at, reverse=True)
+        return sessions
+
+    def delete_thread_session(self, thread_id: int) -> bool:
+        """Routed version of SessionStore.delete_thread_session"""
+        index = self._find_thread(thread_id)
+        if index is None:
+            return False
+        self._thread_shards.pop(thread_id, None)
+        return self.shards[index].delete_thread_session(thread_id)
+
+    # ========== Conversation History ==========
+
+    def add_message(
+        self, thread_id: int, role: str, content: str, message_id: Optional[int] = None
+    ) -> ConversationHistory:
+        """Routed version of SessionStore.add_message"""
+        return self._shard_for_thread(thread_id).add_message(
+            thread_id, role, content, message_id
+        )
+
+    def get_conversation_history(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ConversationHistory]:
+        """Routed version of SessionStore.get_conversation_history"""
+        return self._shard_for_thread(thread_id).get_conversation_history(thread_id, limit)
+
+    def get_conversation_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ConversationHistory]:
+        """Routed version of SessionStore.get_conversation_page"""
+        return self._shard_for_thread(thread_id).get_conversation_page(
+            thread_id, after_id, before_id, limit
+        )
+
+    def iter_conversation_history(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[List[ConversationHistory]]:
+        """Routed version of SessionStore.iter_conversation_history"""
+        return self._shard_for_thread(thread_id).iter_conversation_history(
+            thread_id, page_size, after_id, before_id, reverse
+        )
+
+    def get_recent_messages(self, thread_id: int, count: int = 10) -> List[MessageRow]:
+        """Routed version of SessionStore.get_recent_messages"""
+        return self._shard_for_thread(thread_id).get_recent_messages(thread_id, count)
+
+    def search_messages(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[SearchHit]:
+        """
+        Full-text search across shards, best matches first
+
+        A guild filter searches only that guild's shard. Otherwise each shard
+        returns its best ``limit`` hits and the lists are merged by score
+        (BM25 is computed per shard, so scores are comparable but not
+        identical to a single-database search).
+        """
+        shards = [self._shard_for_guild(guild_id)] if guild_id is not None else self.shards
+        hits = [
+            hit
+            for shard in shards
+            for hit in shard.search_messages(query, user_id, guild_id, limit)
+        ]
+        hits.sort(key=lambda hit: hit.score)
+        return hits[:limit]
+
+    # ========== Tool Logs ==========
+
+    def log_tool_use(
+        self,
+        thread_id: int,
+        tool_name: str,
+        tool_params: Optional[str] = None,
+        tool_result: Optional[str] = None,
+        tool_use_id: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        finished_at: Optional[datetime] = None,
+        is_error: Optional[bool] = None,
+    ) -> ToolLog:
+        """Routed version of SessionStore.log_tool_use"""
+        return self._shard_for_thread(thread_id).log_tool_use(
+            thread_id,
+            tool_name,
+            tool_params,
+            tool_result,
+            tool_use_id,
+            started_at,
+            finished_at,
+            is_error,
+        )
+
+    def get_tool_logs(
+        self, thread_id: int, limit: Optional[int] = None
+    ) -> List[ToolLog]:
+        """Routed version of SessionStore.get_tool_logs"""
+        return self._shard_for_thread(thread_id).get_tool_logs(thread_id, limit)
+
+    def get_tool_log_page(
+        self,
+        thread_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[ToolLog]:
+        """Routed version of SessionStore.get_tool_log_page"""
+        return self._shard_for_thread(thread_id).get_tool_log_page(
+            thread_id, after_id, before_id, limit
+        )
+
+    def iter_tool_logs(
+        self,
+        thread_id: int,
+        page_size: int = 500,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        reverse: bool = False,
+    ) -> Iterator[List[ToolLog]]:
+        """Routed version of SessionStore.iter_tool_logs"""
+        return self._shard_for_thread(thread_id).iter_tool_logs(
+            thread_id, page_size, after_id, before_id, reverse
+        )
+
+    def get_tool_rollup(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        agent_name: Optional[str] = None,
+        tool_name: Optional[str] = None,
+    ) -> List[ToolRollup]:
+        """
+        Tool rollup across shards
+
+        Percentiles cannot be merged from per-shard summaries, so the raw
+        per-call records are read from every shard and summarized together.
+        """
+        statement = tool_metrics.select_tool_calls(since, until, agent_name, tool_name)
+        records = []
+        for shard in self.shards:
+            shard.flush()
+            with shard.read_engine.connect() as conn:
+                records.extend(conn.execute(statement).all())
+        return tool_metrics.rollup_records(records)
+
+    # ========== Channel Settings ==========
+
+    def refresh_channel_routes(self) -> int:
+        """Reload every shard's channel routing table"""
+        return sum(shard.refresh_channel_routes() for shard in self.shards)
+
+    def get_channel_default_agent(self, channel_id: int) -> Optional[str]:
+        """Default agent for a channel (in-memory lookups only)"""
+        route = self.get_channel_settings(channel_id)
+        return route.default_agent if route else None
+
+    def get_channel_settings(self, channel_id: int) -> Optional[ChannelRoute]:
+        """Channel settings from whichever shard's routing table has them"""
+        for shard in self.shards:
+            route = shard.get_channel_settings(channel_id)
+            if route is not None:
+                return route
+        return None
+
+    def set_channel_default_agent(
+        self, channel_id: int, guild_id: int, agent_name: Optional[str]
+    ) -> ChannelRoute:
+        """Set a channel's default agent in its guild's shard"""
+        return self._shard_for_guild(guild_id).set_channel_default_agent(
+            channel_id, guild_id, agent_name
+        )
+
+    def delete_channel_settings(self, channel_id: int) -> bool:
+        """Routed version of SessionStore.delete_channel_settings"""
+        shard = self._shard_for_channel(channel_id)
+        return shard.delete_channel_settings(channel_id) if shard else False
+
+    def list_guild_settings(self, guild_id: int) -> List[ChannelRoute]:
+        """Routed version of SessionStore.list_guild_settings (in-memory)"""
+        return self._shard_for_guild(guild_id).list_guild_settings(guild_id)
+
+    # ========== Retention ==========
+
+    def find_idle_threads(
+        self,
+        idle_before: datetime,
+        active: Optional[bool] = None,
+        with_rows_only: bool = False,
+        limit: int = 500,
+    ) -> List[ThreadSession]:
+        """Idle threads from every shard, oldest activity first"""
+        threads = []
+        for index, shard in enumerate(self.shards):
+            for session in shard.find_idle_threads(
+                idle_before, active, with_rows_only, limit
+            ):
+                self._thread_shards[session.thread_id] = index
+                threads.append(session)
+        threads.sort(key=lambda s: s.last_active_at)
+        return threads[:limit]
+
+    def mark_threads_inactive(self, thread_ids: List[int]) -> int:
+        """Mark threads inactive, one transaction per shard"""
+        by_shard: Dict[int, List[int]] = {}
+        for thread_id in thread_ids:
+            index = self._find_thread(thread_id)
+            if index is not None:
+                by_shard.setdefault(index, []).append(thread_id)
+        return sum(
+            self.shards[index].mark_threads_inactive(ids) for index, ids in by_shard.items()
+        )
+
+    def delete_thread_rows(
+        self,
+        thread_id: int,
+        max_message_id: Optional[int],
+        max_tool_log_id: Optional[int],
+        batch_size: int = 500,
+    ) -> Dict[str, int]:
+        """Routed version of SessionStore.delete_thread_rows"""
+        return self._shard_for_thread(thread_id).delete_thread_rows(
+            thread_id, max_message_id, max_tool_log_id, batch_size
+        )
+
+    def restore_thread_rows(
+        self,
+        thread_id: int,
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+    ) -> None:
+        """Routed version of SessionStore.restore_thread_rows"""
+        self._shard_for_thread(thread_id).restore_thread_rows(thread_id, messages, tool_logs)
+
+    # ========== Bulk Import ==========
+
+    def existing_thread_ids(self, thread_ids: List[int]) -> Set[int]:
+        """Which of the given threads exist in any shard"""
+        found: Set[int] = set()
+        for shard in self.shards:
+            found |= shard.existing_thread_ids(thread_ids)
+        return found
+
+    def import_rows(
+        self,
+        threads: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+    ) -> None:
+        """Split one import batch by shard (one transaction per shard)"""
+        batches: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+
+        def batch(index: int) -> Dict[str, List[Dict[str, Any]]]:
+            return batches.setdefault(index, {"threads": [], "messages": [], "tool_logs": []})
+
+        for row in threads:
+            index = self.shard_map.shard_for_guild(row.get("guild_id"))
+            self._remember_thread(row["thread_id"], index)
+            batch(index)["threads"].append(row)
+        for kind, rows in (("messages", messages), ("tool_logs", tool_logs)):
+            for row in rows:
+                index = self._find_thread(row["thread_id"])
+                batch(index if index is not None else 0)[kind].append(row)
+
+        for index, rows in batches.items():
+            self.shards[index].import_rows(rows["threads"], rows["messages"], rows["tool_logs"])
+
+    # ========== Rebalancing ==========
+
+    def _guild_thread_ids(self, shard: SessionStore, guild_id: int) -> List[int]:
+        sessions = ThreadSession.__table__
+        shard.flush()
+        with shard.read_engine.connect() as conn:
+            return list(
+                conn.execute(
+                    select(sessions.c.thread_id).where(sessions.c.guild_id == guild_id)
+                ).scalars()
+            )
+
+    def _purge_guild(self, shard: SessionStore, guild_id: int) -> int:
+        """Delete a guild's threads and channel settings from one shard"""
+        thread_ids = self._guild_thread_ids(shard, guild_id)
+        for thread_id in thread_ids:
+            shard.delete_thread_session(thread_id)
+        for route in shard.list_guild_settings(guild_id):
+            shard.delete_channel_settings(route.channel_id)
+        return len(thread_ids)
+
+    def move_guild(self, guild_id: int, target: int, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Move one guild's threads, history, tool logs and channel settings
+
+        The copy is made first and the shard map is switched afterwards, so
+        an interrupted move leaves the source authoritative; running the move
+        again discards the partial copy and starts over. Copied messages and
+        tool logs get new ids in the target shard.
+
+        Args:
+            guild_id: Discord guild ID
+            target: Destination shard index
+            batch_size: Rows per transaction
+
+        Returns:
+            Dict with copied counts and rows removed from other shards
+
+        Raises:
+            ValueError: If the target shard does not exist
+        """
+        from .transfer import ExportFilter, copy_transcripts
+
+        if not 0 <= target < self.shard_map.count:
+            raise ValueError(f"Shard {target} does not exist (0-{self.shard_map.count - 1})")
+
+        counts = {"threads": 0, "messages": 0, "tool_logs": 0, "channels": 0, "purged_threads": 0}
+        source_index = self.shard_map.shard_for_guild(guild_id)
+        if source_index != target:
+            source, destination = self.shards[source_index], self.shards[target]
+            # Leftovers in the target can only come from an interrupted move
+            self._purge_guild(destination, guild_id)
+            source.flush()
+            copied = copy_transcripts(
+                source, destination, ExportFilter(guild_id=guild_id), batch_size
+            )
+            for name in ("threads", "messages", "tool_logs"):
+                counts[name] = copied[name]
+            for route in source.list_guild_settings(guild_id):
+                destination.set_channel_default_agent(
+                    route.channel_id, guild_id, route.default_agent
+                )
+                counts["channels"] += 1
+
+            with self._map_lock:
+                self.shard_map.guilds[guild_id] = target
+                self.shard_map.save(self.map_path)
+
+        # The target is now authoritative; drop the guild everywhere else
+        for index, shard in enumerate(self.shards):
+            if index != target:
+                counts["purged_threads"] += self._purge_guild(shard, guild_id)
+        self._thread_shards.clear()
+
+        logger.info(f"Moved guild {guild_id} from shard {source_index} to {target}: {counts}")
+        return counts
+
+    def set_shard_count(self, count: int) -> int:
+        """
+        Grow the number of shards
+
+        Every guild already stored is pinned to its current shard so nothing
+        has to move; new guilds are hashed over the larger count. Use
+        move_guild afterwards to spread existing guilds.
+
+        Args:
+            count: New shard count
+
+        Returns:
+            Number of guilds pinned
+
+        Raises:
+            ValueError: If count would remove shards
+        """
+        if count < self.shard_map.count:
+            raise ValueError("Shards cannot be removed; move their guilds elsewhere instead")
+        if count == self.shard_map.count:
+            return 0
+
+        sessions, channels = ThreadSession.__table__, ChannelSettings.__table__
+        guilds_stmt = union(
+            select(sessions.c.guild_id).where(sessions.c.guild_id.is_not(None)),
+            select(channels.c.guild_id),
+        )
+        pinned = 0
+        with self._map_lock:
+            for index, shard in enumerate(self.shards):
+                shard.flush()
+                with shard.read_engine.connect() as conn:
+                    for guild_id in conn.execute(guilds_stmt).scalars():
+                        if guild_id not in self.shard_map.guilds:
+                            self.shard_map.guilds[guild_id] = index
+                            pinned += 1
+            self.shard_map.count = count
+            self.shard_map.save(self.map_path)
+        self.shards.extend(
+            self._open_shard(index) for index in range(len(self.shards), count)
+        )
+        logger.info(f"Shard count raised to {count} ({pinned} guilds pinned in place)")
+        return pinned
+
+    # ========== Message Queue Journal ==========
+
+    def enqueue_message(
+        self,
+        bot_id: int,
+        thread_id: int,
+        message_id: int,
+        user_id: int,
+        content: str,
+        has_attachments: bool = False,
+        author_name: str = "",
+        attachments: Sequence[Dict[str, Any]] = (),
+    ) -> bool:
+        """Routed version of SessionStore.enqueue_message"""
+        return self._shard_for_thread(thread_id).enqueue_message(
+            bot_id,
+            thread_id,
+            message_id,
+            user_id,
+            content,
+            has_attachments,
+            author_name,
+            attachments,
+        )
+
+    def _journal_update(
+        self, method: str, thread_id: int, message_ids: List[int], *args: Any
+    ) -> int:
+        # Entries stay where they were journaled; if the guild has been moved
+        # since, they are found in one of the other shards
+        routed = self._shard_for_thread(thread_id)
+        count = getattr(routed, method)(thread_id, message_ids, *args)
+        if count < len(message_ids):
+            for shard in self.shards:
+                if shard is not routed:
+                    count += getattr(shard, method)(thread_id, message_ids, *args)
+        return count
+
+    def claim_messages(self, thread_id: int, message_ids: List[int]) -> int:
+        """Routed version of SessionStore.claim_messages"""
+        return self._journal_update("claim_messages", thread_id, message_ids)
+
+    def ack_messages(
+        self, thread_id: int, message_ids: List[int], tombstone: bool = False
+    ) -> int:
+        """Routed version of SessionStore.ack_messages"""
+        return self._journal_update("ack_messages", thread_id, message_ids, tombstone)
+
+    def update_queued_message(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> bool:
+        """Routed version of SessionStore.update_queued_message"""
+        routed = self._shard_for_thread(thread_id)
+        if routed.update_queued_message(thread_id, message_id, content, attachments):
+            return True
+        # Journaled before the guild was moved (see _journal_update)
+        return any(
+            shard.update_queued_message(thread_id, message_id, content, attachments)
+            for shard in self.shards
+            if shard is not routed
+        )
+
+    def prune_message_queue(self, older_than: float) -> int:
+        """Prune tombstones in every shard"""
+        return sum(shard.prune_message_queue(older_than) for shard in self.shards)
+
+    def load_message_queue(self, bot_id: int) -> List[QueueEntry]:
+        """Every shard's entries for a bot, in enqueue order"""
+        entries = [
+            entry for shard in self.shards for entry in shard.load_message_queue(bot_id)
+        ]
+        # Ids are per shard; a thread's entries are all in one shard, so
+        # ordering by enqueue time keeps each thread's order
+        entries.sort(key=lambda entry: (entry.enqueued_at, entry.id))
+        return entries
+
+    def load_thread_queue(
+        self, bot_id: int, thread_id: int, unclaimed_only: bool = False
+    ) -> List[QueueEntry]:
+        """SessionStore.load_thread_queue over every shard (one index lookup each)"""
+        # Entries stay in the shard they were journaled in (see _journal_update)
+        entries = [
+            entry
+            for shard in self.shards
+            for entry in shard.load_thread_queue(bot_id, thread_id, unclaimed_only)
+        ]
+        entries.sort(key=lambda entry: (entry.enqueued_at, entry.id))
+        return entries
+
+    # Leases all live in the first shard: ownership must not depend on
+    # where the thread's guild is routed (or whether it is moved meanwhile)
+
+    def acquire_thread_lease(self, thread_id: int, owner: str, ttl: float) -> bool:
+        """SessionStore.acquire_thread_lease on the first shard"""
+        return self.shards[0].acquire_thread_lease(thread_id, owner, ttl)
+
+    def renew_thread_leases(
+        self, owner: str, thread_ids: List[int], ttl: float
+    ) -> List[int]:
+        """SessionStore.renew_thread_leases on the first shard"""
+        return self.shards[0].renew_thread_leases(owner, thread_ids, ttl)
+
+    def find_unleased_threads(self, bot_id: int) -> List[int]:
+        """Journaled threads in any shard without a live lease in the first shard"""
+        unleased = set(self.shards[0].find_unleased_threads(bot_id))
+        # The other shards have no leases, so their query returns every thread
+        # with unacked entries; check those against the first shard's leases
+        others = {
+            thread_id
+            for shard in self.shards[1:]
+            for thread_id in shard.find_unleased_threads(bot_id)
+        }
+        unleased |= others.difference(self.shards[0].leased_threads(list(others)))
+        return list(unleased)
+
+    def release_thread_lease(self, thread_id: int, owner: str) -> bool:
+        """SessionStore.release_thread_lease on the first shard"""
+        return self.shards[0].release_thread_lease(thread_id, owner)
+
+    # ========== Statistics ==========
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters summed over every shard"""
+        totals: Dict[str, Any] = {}
+        for shard in self.shards:
+            for name, value in shard.get_stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def get_shard_stats(self) -> List[Dict[str, Any]]:
+        """Per-shard counters, pinned guild counts and file sizes"""
+        result = []
+        for index, shard in enumerate(self.shards):
+            result.append(
+                {
+                    "shard": index,
+                    "path": str(shard.db_path),
+                    "bytes": shard.db_path.stat().st_size if shard.db_path.exists() else 0,
+                    "pinned_guilds": sum(
+                        1 for s in self.shard_map.guilds.values() if s == index
+                    ),
+                    **shard.get_stats(),
+                }
+            )
+        return result
+
+    def reconcile_stats(self) -> Dict[str, int]:
+        """Reconcile every shard's counters; returns the summed corrections"""
+        totals: Dict[str, int] = {}
+        for shard in self.shards:
+            for name, value in shard.reconcile_stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
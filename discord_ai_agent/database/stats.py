@@ -0,0 +1,132 @@
+"""Incrementally maintained counters backing SessionStore.get_stats"""
+
+import random
+from typing import Dict
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import StoreStat, ThreadSession, ConversationHistory, ToolLog, ChannelSettings
+
+# Counter names, in get_stats() order
+TOTAL_SESSIONS = "total_sessions"
+ACTIVE_SESSIONS = "active_sessions"
+TOTAL_MESSAGES = "total_messages"
+TOTAL_TOOL_USES = "total_tool_uses"
+CHANNEL_SETTINGS = "channel_settings"
+STAT_NAMES = (
+    TOTAL_SESSIONS,
+    ACTIVE_SESSIONS,
+    TOTAL_MESSAGES,
+    TOTAL_TOOL_USES,
+    CHANNEL_SETTINGS,
+)
+
+# Rows per counter, summed on read. SQLite has a single writer and always
+# bumps slot 0; PostgreSQL writers bump a random slot, so concurrent writers
+# on different replicas rarely wait on the same row lock.
+STAT_SLOTS = 16
+
+_stats = StoreStat.__table__
+
+
+def random_slot() -> int:
+    """Pick the counter slot a PostgreSQL writer bumps"""
+    return random.randrange(STAT_SLOTS)
+
+
+def bump_stats(db, deltas: Dict[str, int], slot: int = 0) -> None:
+    """
+    Add deltas to the counters inside the caller's transaction
+
+    Args:
+        db: Session or Connection whose transaction the update joins
+        deltas: Counter name -> delta (zero deltas are skipped)
+        slot: Counter slot to update (0 <= slot < STAT_SLOTS)
+    """
+    params = [
+        {"b_name": name, "b_slot": slot, "b_delta": delta}
+        for name, delta in deltas.items()
+        if delta
+    ]
+    if not params:
+        return
+    db.execute(
+        update(_stats)
+        .where(_stats.c.name == bindparam("b_name"))
+        .where(_stats.c.slot == bindparam("b_slot"))
+        .values(value=_stats.c.value + bindparam("b_delta")),
+        params,
+    )
+
+
+def _count(db, model, *criteria) -> int:
+    """SELECT COUNT(*) FROM model [WHERE criteria]"""
+    stmt = select(func.count()).select_from(model)
+    if criteria:
+        stmt = stmt.where(*criteria)
+    return db.execute(stmt).scalar_one()
+
+
+def count_stats(db) -> Dict[str, int]:
+    """
+    Recount every counter with COUNT(*) queries (full scans)
+
+    Args:
+        db: Session or Connection
+
+    Returns:
+        Counter name -> exact value
+    """
+    return {
+        TOTAL_SESSIONS: _count(db, ThreadSession),
+        ACTIVE_SESSIONS: _count(db, ThreadSession, ThreadSession.is_active == True),
+        TOTAL_MESSAGES: _count(db, ConversationHistory),
+        TOTAL_TOOL_USES: _count(db, ToolLog),
+        CHANNEL_SETTINGS: _count(db, ChannelSettings),
+    }
+
+
+def read_stats(db) -> Dict[str, int]:
+    """
+    Read the counters (sums of a few rows per counter)
+
+    Args:
+        db: Session or Connection
+
+    Returns:
+        Counter name -> value (missing counters read as 0)
+    """
+    values = dict(
+        db.execute(
+            select(_stats.c.name, func.sum(_stats.c.value)).group_by(_stats.c.name)
+        ).all()
+    )
+    # SUM(BIGINT) is NUMERIC on PostgreSQL
+    return {name: int(values.get(name, 0)) for name in STAT_NAMES}
+
+
+def write_stats(db, values: Dict[str, int]) -> None:
+    """
+    Overwrite the counters with exact values (insert missing rows)
+
+    Slot 0 gets the value and every other slot 0, so bumps always find
+    their row.
+
+    Args:
+        db: Connection whose transaction the write joins (SQLite or PostgreSQL)
+        values: Counter name -> value
+    """
+    dialect = postgresql if db.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(_stats)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[_stats.c.name, _stats.c.slot],
+            set_={"value": stmt.excluded.value},
+        ),
+        [
+            {"name": name, "slot": slot, "value": value if slot == 0 else 0}
+            for name, value in values.items()
+            for slot in range(STAT_SLOTS)
+        ],
+    )
@@ -0,0 +1,148 @@
+"""SQLite storage profiles (journal mode, pragmas, pool and write durability)"""
+
+import logging
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """
+    Tuning knobs for the SQLite session database
+
+    ``None``/``0`` for a pragma leaves the SQLite default untouched.
+    """
+
+    url: Optional[str] = None  # Backend URL (postgresql+asyncpg://...); None = SQLite file
+    journal_mode: Optional[str] = "WAL"
+    synchronous: Optional[str] = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_size_mb: int = 256
+    cache_size_mb: int = 64
+    pool_size: int = 5
+    max_overflow: int = 10
+    read_only_readers: bool = True  # Separate read-only connections for lookups
+    executor_workers: int = 1  # AsyncSessionStore threads (shared; each shard also gets one)
+    durability: str = "immediate"  # 'immediate' or 'batched' (see WriteBehindBuffer)
+    flush_interval: float = 1.0
+    max_batch: int = 200
+    thread_cache_size: int = 10000  # Cached thread lookups (0 disables the cache)
+    thread_cache_ttl: float = 300.0  # Staleness bound for other processes' writes
+    channel_routes_refresh: float = 60.0  # Seconds between routing table reloads
+    stats_reconcile_interval: float = 3600.0  # Seconds between stats recounts (0 = never)
+    compression: str = "zlib"  # Large text columns: 'none', 'zlib' or 'zstd'
+    compression_threshold: int = 512  # Bytes before a value is compressed
+    shards: int = 0  # SQLite files to spread guilds over (0 = single database)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "StorageProfile":
+        """
+        Build a profile from the ``storage`` section of config.yaml
+
+        Args:
+            config: Dict with an optional ``profile`` name plus field overrides
+
+        Returns:
+            StorageProfile
+
+        Raises:
+            ValueError: If the profile name or an override key is unknown
+        """
+        config = dict(config or {})
+        name = config.pop("profile", "performance")
+        if name not in PROFILES:
+            raise ValueError(
+                f"Unknown storage profile: {name} (expected one of {list(PROFILES)})"
+            )
+
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown storage settings: {sorted(unknown)}")
+
+        return replace(PROFILES[name], **config)
+
+    def pragmas(self, read_only: bool = False) -> Dict[str, Any]:
+        """
+        PRAGMA statements applied to each new connection
+
+        Args:
+            read_only: Skip pragmas that need write access (journal_mode)
+
+        Returns:
+            Ordered dict of pragma name -> value
+        """
+        pragmas: Dict[str, Any] = {}
+        if self.journal_mode and not read_only:
+            pragmas["journal_mode"] = self.journal_mode
+        if self.synchronous:
+            pragmas["synchronous"] = self.synchronous
+        if self.busy_timeout_ms:
+            pragmas["busy_timeout"] = self.busy_timeout_ms
+        if self.mmap_size_mb:
+            pragmas["mmap_size"] = self.mmap_size_mb * 1024 * 1024
+        if self.cache_size_mb:
+            # Negative cache_size is in KiB rather than pages
+            pragmas["cache_size"] = -self.cache_size_mb * 1024
+        if self.journal_mode:
+            pragmas["temp_store"] = "MEMORY"
+        return pragmas
+
+    def engine_options(self) -> Dict[str, Any]:
+        """Keyword arguments for sqlalchemy.create_engine"""
+        options: Dict[str, Any] = {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "connect_args": {"check_same_thread": False},
+        }
+        if self.busy_timeout_ms:
+            options["connect_args"]["timeout"] = self.busy_timeout_ms / 1000
+        return options
+
+
+# Named profiles selectable via ``storage.profile`` in config.yaml
+PROFILES: Dict[str, StorageProfile] = {
+    # Pre-profile behaviour: rollback journal, synchronous=FULL, no busy timeout
+    "legacy": StorageProfile(
+        journal_mode=None,
+        synchronous=None,
+        busy_timeout_ms=0,
+        mmap_size_mb=0,
+        cache_size_mb=0,
+        read_only_readers=False,
+    ),
+    # WAL + synchronous=NORMAL, commit on every write (durability="batched" is opt-in)
+    "performance": StorageProfile(executor_workers=4),
+    # WAL with fsync on every commit and no write buffering
+    "durable": StorageProfile(synchronous="FULL"),
+}
+
+
+def apply_pragmas(engine: Engine, profile: StorageProfile, read_only: bool = False):
+    """
+    Register a connect hook that applies the profile's pragmas
+
+    Args:
+        engine: SQLAlchemy engine
+        profile: Storage profile
+        read_only: Engine opens the database read-only
+    """
+    pragmas = profile.pragmas(read_only=read_only)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    logger.debug(f"SQLite pragmas ({'read-only' if read_only else 'read-write'}): {pragmas}")
@@ -0,0 +1,237 @@
+"""Per-tool latency, payload size and error-rate tracking for tool logs
+
+Tool calls are logged once their ToolResultBlock arrives, with the start/end
+timestamps of the ToolUseBlock -> ToolResultBlock pair. The rollup groups
+those rows per day (UTC), agent and tool and reports nearest-rank
+percentiles of the call duration. It is a single Core statement using window
+functions, so the same query serves SQLite and PostgreSQL.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.engine import Row
+
+from .models import ThreadSession, ToolLog
+from .rows import ToolRollup
+
+_tool_logs = ToolLog.__table__
+_threads = ThreadSession.__table__
+
+
+def timing_fields(
+    tool_result: Optional[str],
+    started_at: Optional[datetime],
+    finished_at: Optional[datetime],
+    is_error: Optional[bool],
+) -> Dict[str, Any]:
+    """
+    Timing columns of a tool_logs row
+
+    Args:
+        tool_result: Tool result text
+        started_at: When the ToolUseBlock was seen (UTC)
+        finished_at: When the ToolResultBlock was seen (UTC)
+        is_error: ToolResultBlock.is_error
+
+    Returns:
+        Dict with started_at, finished_at, duration_ms, result_bytes, is_error
+    """
+    duration_ms = None
+    if started_at is not None and finished_at is not None:
+        duration_ms = max(0, round((finished_at - started_at).total_seconds() * 1000))
+    return {
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "duration_ms": duration_ms,
+        "result_bytes": (
+            len(tool_result.encode("utf-8")) if tool_result is not None else None
+        ),
+        "is_error": is_error,
+    }
+
+
+def _percentile(ranked, percent: int):
+    # Nearest rank: the smallest duration whose rank is >= ceil(p * n / 100)
+    threshold = (ranked.c.timed_calls * percent + 99) // 100
+    return func.min(case((ranked.c.rn >= threshold, ranked.c.duration_ms)))
+
+
+def _filtered(
+    stmt: Select,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    agent_name: Optional[str],
+    tool_name: Optional[str],
+) -> Select:
+    stmt = stmt.select_from(
+        _tool_logs.join(_threads, _threads.c.thread_id == _tool_logs.c.thread_id)
+    )
+    if since is not None:
+        stmt = stmt.where(_tool_logs.c.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(_tool_logs.c.created_at < until)
+    if agent_name is not None:
+        stmt = stmt.where(_threads.c.agent_name == agent_name)
+    if tool_name is not None:
+        stmt = stmt.where(_tool_logs.c.tool_name == tool_name)
+    return stmt
+
+
+def select_tool_calls(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    agent_name: Optional[str] = None,
+    tool_name: Optional[str] = None,
+) -> Select:
+    """
+    Raw per-call records for rollup_records (for merging several databases)
+
+    Args:
+        since: Tool calls logged at or after (UTC)
+        until: Tool calls logged before (UTC)
+        agent_name: Only this agent's threads
+        tool_name: Only this tool
+
+    Returns:
+        Select yielding (created_at, agent_name, tool_name, duration_ms,
+        result_bytes, is_error) rows
+    """
+    return _filtered(
+        select(
+            _tool_logs.c.created_at,
+            _threads.c.agent_name,
+            _tool_logs.c.tool_name,
+            _tool_logs.c.duration_ms,
+            _tool_logs.c.result_bytes,
+            _tool_logs.c.is_error,
+        ),
+        since,
+        until,
+        agent_name,
+        tool_name,
+    )
+
+
+def build_rollup(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    agent_name: Optional[str] = None,
+    tool_name: Optional[str] = None,
+) -> Select:
+    """
+    Build the per-day/agent/tool rollup statement
+
+    Args:
+        since: Tool calls logged at or after (UTC)
+        until: Tool calls logged before (UTC)
+        agent_name: Only this agent's threads
+        tool_name: Only this tool
+
+    Returns:
+        Select yielding rows for to_rollup, ordered by day, agent, tool
+    """
+    day = func.date(_tool_logs.c.created_at)
+    group = (day, _threads.c.agent_name, _tool_logs.c.tool_name)
+    ranked = select(
+        day.label("day"),
+        _threads.c.agent_name,
+        _tool_logs.c.tool_name,
+        _tool_logs.c.duration_ms,
+        _tool_logs.c.result_bytes,
+        case((_tool_logs.c.is_error.is_(True), 1), else_=0).label("error"),
+        # Untimed calls sort last so ranks 1..timed_calls are the durations
+        func.row_number()
+        .over(
+            partition_by=group,
+            order_by=(_tool_logs.c.duration_ms.is_(None), _tool_logs.c.duration_ms),
+        )
+        .label("rn"),
+        func.count(_tool_logs.c.duration_ms).over(partition_by=group).label("timed_calls"),
+    )
+    ranked = _filtered(ranked, since, until, agent_name, tool_name).subquery()
+
+    keys = (ranked.c.day, ranked.c.agent_name, ranked.c.tool_name)
+    return (
+        select(
+            *keys,
+            func.count().label("calls"),
+            func.sum(ranked.c.error).label("errors"),
+            func.count(ranked.c.duration_ms).label("timed_calls"),
+            _percentile(ranked, 50).label("p50_ms"),
+            _percentile(ranked, 95).label("p95_ms"),
+            func.max(ranked.c.duration_ms).label("max_ms"),
+            func.coalesce(func.sum(ranked.c.result_bytes), 0).label("result_bytes"),
+        )
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+
+
+def to_rollup(row: Row) -> ToolRollup:
+    """build_rollup row -> ToolRollup (PostgreSQL returns date objects)"""
+    day, agent_name, tool_name, calls, errors, timed, p50, p95, max_ms, size = row
+    return ToolRollup(
+        day=day if isinstance(day, str) else day.isoformat(),
+        agent_name=agent_name,
+        tool_name=tool_name,
+        calls=calls,
+        errors=int(errors or 0),
+        timed_calls=timed,
+        p50_ms=p50,
+        p95_ms=p95,
+        max_ms=max_ms,
+        result_bytes=int(size),
+    )
+
+
+def _nearest_rank(durations: Sequence[int], percent: int) -> Optional[int]:
+    if not durations:
+        return None
+    return durations[max(1, (len(durations) * percent + 99) // 100) - 1]
+
+
+def rollup_records(
+    records: Iterable[Tuple[datetime, str, str, Optional[int], Optional[int], Optional[bool]]]
+) -> List[ToolRollup]:
+    """
+    Same rollup as build_rollup, over in-memory records
+
+    Args:
+        records: (created_at, agent_name, tool_name, duration_ms,
+            result_bytes, is_error) tuples
+
+    Returns:
+        List of ToolRollup ordered by day, agent, tool
+    """
+    groups: Dict[Tuple[str, str, str], List[Any]] = defaultdict(lambda: [0, 0, [], 0])
+    for created_at, agent_name, tool_name, duration_ms, result_bytes, is_error in records:
+        group = groups[(created_at.date().isoformat(), agent_name, tool_name)]
+        group[0] += 1
+        group[1] += 1 if is_error else 0
+        if duration_ms is not None:
+            group[2].append(duration_ms)
+        group[3] += result_bytes or 0
+
+    rollups = []
+    for (day, agent_name, tool_name), (calls, errors, durations, size) in sorted(
+        groups.items()
+    ):
+        durations.sort()
+        rollups.append(
+            ToolRollup(
+                day=day,
+                agent_name=agent_name,
+                tool_name=tool_name,
+                calls=calls,
+                errors=errors,
+                timed_calls=len(durations),
+                p50_ms=_nearest_rank(durations, 50),
+                p95_ms=_nearest_rank(durations, 95),
+                max_ms=durations[-1] if durations else None,
+                result_bytes=size,
+            )
+        )
+    return rollups
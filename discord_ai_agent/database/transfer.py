@@ -0,0 +1,360 @@
+"""Streaming export/import of threads, conversation history and tool logs"""
+
+import gzip
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import Table, select
+
+from .models import ThreadSession, ConversationHistory, ToolLog
+from .session_store import SessionStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional dependency
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+
+THREAD_COLUMNS = [
+    "thread_id",
+    "user_id",
+    "guild_id",
+    "agent_name",
+    "sdk_session_id",
+    "created_at",
+    "last_active_at",
+    "is_active",
+]
+MESSAGE_COLUMNS = ["id", "thread_id", "role", "content", "message_id", "created_at"]
+TOOL_LOG_COLUMNS = [
+    "id",
+    "thread_id",
+    "tool_name",
+    "tool_params",
+    "tool_result",
+    "created_at",
+    "tool_use_id",
+    "started_at",
+    "finished_at",
+    "duration_ms",
+    "result_bytes",
+    "is_error",
+]
+
+# (record type, table, columns, parquet file) in export order: threads come
+# first so an import knows every thread before it sees the thread's rows
+_KINDS = (
+    ("thread", ThreadSession.__table__, THREAD_COLUMNS, "threads.parquet"),
+    ("message", ConversationHistory.__table__, MESSAGE_COLUMNS, "messages.parquet"),
+    ("tool_log", ToolLog.__table__, TOOL_LOG_COLUMNS, "tool_logs.parquet"),
+)
+_DATETIME_COLUMNS = {"created_at", "last_active_at", "started_at", "finished_at"}
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Which rows to export (None = no restriction)"""
+
+    since: Optional[datetime] = None  # Rows created at or after (UTC)
+    until: Optional[datetime] = None  # Rows created before (UTC)
+    guild_id: Optional[int] = None
+    agent_name: Optional[str] = None
+
+
+def _iter_batches(
+    store: SessionStore,
+    kind: str,
+    table: Table,
+    columns: List[str],
+    filters: ExportFilter,
+    batch_size: int,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Keyset-paginated read of one table
+
+    Each batch runs in its own short read transaction, so the export never
+    pins a WAL snapshot (or blocks checkpoints) while the bot is writing.
+    """
+    sessions = ThreadSession.__table__
+    key = sessions.c.thread_id if kind == "thread" else table.c.id
+    stmt = select(*(table.c[name] for name in columns))
+
+    if kind == "thread":
+        # Threads with any activity inside the time range
+        if filters.since is not None:
+            stmt = stmt.where(sessions.c.last_active_at >= filters.since)
+        if filters.until is not None:
+            stmt = stmt.where(sessions.c.created_at < filters.until)
+    else:
+        if filters.guild_id is not None or filters.agent_name is not None:
+            stmt = stmt.join(sessions, sessions.c.thread_id == table.c.thread_id)
+        if filters.since is not None:
+            stmt = stmt.where(table.c.created_at >= filters.since)
+        if filters.until is not None:
+            stmt = stmt.where(table.c.created_at < filters.until)
+    if filters.guild_id is not None:
+        stmt = stmt.where(sessions.c.guild_id == filters.guild_id)
+    if filters.agent_name is not None:
+        stmt = stmt.where(sessions.c.agent_name == filters.agent_name)
+    stmt = stmt.order_by(key).limit(batch_size)
+
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(key > last)
+        with store.read_engine.connect() as conn:
+            rows = [dict(row) for row in conn.execute(page).mappings()]
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][key.name]
+        if len(rows) < batch_size:
+            return
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise ValueError("Parquet support requires the 'pyarrow' package")
+
+
+def _parquet_schema(table: Table, columns: List[str]) -> "pyarrow.Schema":
+    """Arrow schema for exported columns (64-bit ids, microsecond timestamps)"""
+    fields = []
+    for name in columns:
+        python_type = table.c[name].type.python_type
+        if python_type is int:
+            arrow_type = pyarrow.int64()
+        elif python_type is bool:
+            arrow_type = pyarrow.bool_()
+        elif python_type is datetime:
+            arrow_type = pyarrow.timestamp("us")
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(name, arrow_type, nullable=table.c[name].nullable))
+    return pyarrow.schema(fields)
+
+
+def export_transcripts(
+    store: SessionStore,
+    output: str,
+    fmt: str = "jsonl",
+    filters: Optional[ExportFilter] = None,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Stream threads, messages and tool logs to JSONL or Parquet
+
+    Memory use is bounded by batch_size rows. JSONL goes to a single file
+    (gzip-compressed if the name ends in .gz) with one ``{"type": ...}``
+    record per line; Parquet goes to a directory holding threads.parquet,
+    messages.parquet and tool_logs.parquet (one row group per batch).
+
+    Args:
+        store: Session store to read from
+        output: Output file (jsonl) or directory (parquet)
+        fmt: 'jsonl' or 'parquet'
+        filters: Time range / guild / agent restriction
+        batch_size: Rows per read transaction
+
+    Returns:
+        Dict with exported thread, message and tool-log counts
+
+    Raises:
+        ValueError: If the format is unknown or pyarrow is missing
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {EXPORT_FORMATS})")
+    if fmt == "parquet":
+        _require_pyarrow()
+    filters = filters or ExportFilter()
+    counts = {"threads": 0, "messages": 0, "tool_logs": 0}
+    output_path = Path(output)
+
+    if fmt == "jsonl":
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        opener = gzip.open if output_path.suffix == ".gz" else open
+        with opener(output_path, "wt", encoding="utf-8") as f:
+            for kind, table, columns, _ in _KINDS:
+                for rows in _iter_batches(store, kind, table, columns, filters, batch_size):
+                    for row in rows:
+                        for name in _DATETIME_COLUMNS & row.keys():
+                            if row[name] is not None:
+                                row[name] = row[name].isoformat()
+                        f.write(json.dumps({"type": kind, **row}, ensure_ascii=False) + "\n")
+                    counts[kind + "s"] += len(rows)
+    else:
+        output_path.mkdir(parents=True, exist_ok=True)
+        for kind, table, columns, filename in _KINDS:
+            schema = _parquet_schema(table, columns)
+            with pyarrow.parquet.ParquetWriter(
+                output_path / filename, schema, compression="zstd"
+            ) as writer:
+                for rows in _iter_batches(store, kind, table, columns, filters, batch_size):
+                    writer.write_table(pyarrow.Table.from_pylist(rows, schema=schema))
+                    counts[kind + "s"] += len(rows)
+
+    logger.info(
+        f"Exported {counts['threads']} threads, {counts['messages']} messages, "
+        f"{counts['tool_logs']} tool logs to {output_path}"
+    )
+    return counts
+
+
+class _Importer:
+    """Batches imported records into SessionStore.import_rows transactions"""
+
+    def __init__(self, store: SessionStore, batch_size: int):
+        self.store = store
+        self.batch_size = batch_size
+        self.threads: List[Dict[str, Any]] = []
+        self.messages: List[Dict[str, Any]] = []
+        self.tool_logs: List[Dict[str, Any]] = []
+        # Threads created by this import; rows of any other thread are skipped
+        # so re-running an import never duplicates history
+        self.accepted: Set[int] = set()
+        self.counts = {
+            "threads": 0,
+            "messages": 0,
+            "tool_logs": 0,
+            "skipped_threads": 0,
+            "skipped_rows": 0,
+        }
+
+    def add(self, kind: str, record: Dict[str, Any]) -> None:
+        for name in _DATETIME_COLUMNS & record.keys():
+            if isinstance(record[name], str):
+                record[name] = datetime.fromisoformat(record[name])
+
+        if kind == "thread":
+            record.setdefault("is_active", True)
+            self.threads.append({name: record.get(name) for name in THREAD_COLUMNS})
+        else:
+            if self.threads:
+                self.flush()  # Resolve which threads are new first
+            if record["thread_id"] not in self.accepted:
+                self.counts["skipped_rows"] += 1
+                return
+            columns = MESSAGE_COLUMNS if kind == "message" else TOOL_LOG_COLUMNS
+            row = {name: record.get(name) for name in columns if name != "id"}
+            (self.messages if kind == "message" else self.tool_logs).append(row)
+
+        if len(self.threads) + len(self.messages) + len(self.tool_logs) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        threads = self.threads
+        if threads:
+            existing = self.store.existing_thread_ids([t["thread_id"] for t in threads])
+            threads = [t for t in threads if t["thread_id"] not in existing]
+            self.counts["skipped_threads"] += len(self.threads) - len(threads)
+            self.accepted.update(t["thread_id"] for t in threads)
+
+        self.store.import_rows(threads, self.messages, self.tool_logs)
+        self.counts["threads"] += len(threads)
+        self.counts["messages"] += len(self.messages)
+        self.counts["tool_logs"] += len(self.tool_logs)
+        self.threads, self.messages, self.tool_logs = [], [], []
+
+
+def copy_transcripts(
+    source: SessionStore,
+    target: SessionStore,
+    filters: Optional[ExportFilter] = None,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Copy threads, messages and tool logs between stores without a file
+
+    Same semantics as export_transcripts followed by import_transcripts
+    (threads already in the target are skipped with their rows; copied
+    rows get new ids).
+
+    Args:
+        source: Store to read from
+        target: Store to write to
+        filters: Time range / guild / agent restriction
+        batch_size: Rows per read and write transaction
+
+    Returns:
+        Dict with copied and skipped counts
+    """
+    filters = filters or ExportFilter()
+    importer = _Importer(target, batch_size)
+    for kind, table, columns, _ in _KINDS:
+        for rows in _iter_batches(source, kind, table, columns, filters, batch_size):
+            for row in rows:
+                importer.add(kind, row)
+    importer.flush()
+    return importer.counts
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def import_transcripts(
+    store: SessionStore,
+    source: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Load an export produced by export_transcripts into a store
+
+    Intended for a fresh store. Threads that already exist are skipped
+    together with their messages and tool logs; imported messages and tool
+    logs get new ids in their original order and are added to the search
+    index.
+
+    Args:
+        store: Session store to write to
+        source: Export file (jsonl) or directory (parquet)
+        fmt: 'jsonl' or 'parquet' (default: parquet for a directory)
+        batch_size: Rows per write transaction
+
+    Returns:
+        Dict with imported and skipped counts
+
+    Raises:
+        FileNotFoundError: If the source does not exist
+        ValueError: If the format is unknown or pyarrow is missing
+    """
+    source_path = Path(source)
+    if not source_path.exists():
+        raise FileNotFoundError(f"Export not found: {source}")
+    fmt = fmt or ("parquet" if source_path.is_dir() else "jsonl")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {EXPORT_FORMATS})")
+
+    importer = _Importer(store, batch_size)
+    if fmt == "jsonl":
+        for record in _iter_jsonl(source_path):
+            importer.add(record.pop("type"), record)
+    else:
+        _require_pyarrow()
+        for kind, _, _, filename in _KINDS:
+            path = source_path / filename
+            if not path.exists():
+                continue
+            for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size):
+                for record in batch.to_pylist():
+                    importer.add(kind, record)
+    importer.flush()
+
+    counts = importer.counts
+    logger.info(
+        f"Imported {counts['threads']} threads, {counts['messages']} messages, "
+        f"{counts['tool_logs']} tool logs from {source_path}"
+    )
+    return counts
@@ -0,0 +1,173 @@
+"""Custom column types"""
+
+import zlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import LargeBinary, Text
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+# Magic prefixes identifying compressed payloads. Values without a prefix are
+# plain text, so rows written before compression existed still read back.
+MAGIC_ZLIB = b"\x00zl1"
+MAGIC_ZSTD = b"\x00zs1"
+
+COMPRESSION_ALGORITHMS = ("none", "zlib", "zstd")
+
+
+@dataclass(frozen=True)
+class CompressionSettings:
+    """Settings used when writing CompressedText values through one engine"""
+
+    algorithm: str = "zlib"  # 'none', 'zlib' or 'zstd'
+    threshold: int = 512  # Minimum UTF-8 size in bytes before compressing
+    level: int = 6
+
+    @classmethod
+    def create(
+        cls, algorithm: str = "zlib", threshold: int = 512, level: Optional[int] = None
+    ) -> "CompressionSettings":
+        """
+        Validate and build settings
+
+        Args:
+            algorithm: 'none', 'zlib' or 'zstd' (requires the zstandard package)
+            threshold: Minimum UTF-8 size in bytes before compressing
+            level: Compression level (default: 6 for zlib, 3 for zstd)
+
+        Raises:
+            ValueError: If the algorithm is unknown or unavailable
+        """
+        if algorithm not in COMPRESSION_ALGORITHMS:
+            raise ValueError(
+                f"Unknown compression algorithm: {algorithm} (expected one of {COMPRESSION_ALGORITHMS})"
+            )
+        if algorithm == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        if level is None:
+            level = 3 if algorithm == "zstd" else 6
+        return cls(algorithm=algorithm, threshold=threshold, level=level)
+
+
+DEFAULT_COMPRESSION = CompressionSettings()
+
+# Attribute of an engine's dialect holding its CompressionSettings. Every
+# engine has its own dialect instance, so stores with different profiles in
+# one process (shards, the migration CLI) each write with their own settings.
+_DIALECT_ATTR = "compression_settings"
+
+
+def configure_compression(
+    engine: Any, algorithm: str = "zlib", threshold: int = 512, level: Optional[int] = None
+) -> CompressionSettings:
+    """
+    Configure how CompressedText columns are written through an engine
+
+    Reads always understand every supported format regardless of these settings.
+
+    Args:
+        engine: Engine (or AsyncEngine) the settings apply to
+        algorithm: 'none', 'zlib' or 'zstd' (requires the zstandard package)
+        threshold: Minimum UTF-8 size in bytes before compressing
+        level: Compression level (default: 6 for zlib, 3 for zstd)
+
+    Returns:
+        The settings now attached to the engine
+
+    Raises:
+        ValueError: If the algorithm is unknown or unavailable
+    """
+    settings = CompressionSettings.create(algorithm, threshold, level)
+    setattr(engine.dialect, _DIALECT_ATTR, settings)
+    return settings
+
+
+def compress_text(value: str, settings: CompressionSettings = DEFAULT_COMPRESSION) -> Any:
+    """
+    Encode a string for storage, compressing it if it is large enough
+
+    Args:
+        value: Text to store
+        settings: Compression settings of the target engine
+
+    Returns:
+        Compressed bytes with a magic prefix, or the original string
+    """
+    if settings.algorithm == "none":
+        return value
+
+    data = value.encode("utf-8")
+    if len(data) < settings.threshold:
+        return value
+
+    if settings.algorithm == "zstd":
+        compressed = MAGIC_ZSTD + zstandard.ZstdCompressor(
+            level=settings.level
+        ).compress(data)
+    else:
+        compressed = MAGIC_ZLIB + zlib.compress(data, settings.level)
+
+    # Incompressible data is cheaper to keep as text
+    return compressed if len(compressed) < len(data) else value
+
+
+def decompress_text(value: Any) -> Optional[str]:
+    """
+    Decode a stored value written by compress_text (or legacy plain text)
+
+    Raises:
+        ValueError: If the value is zstd-compressed but zstandard is missing
+    """
+    if value is None or isinstance(value, str):
+        return value
+
+    data = bytes(value)
+    if data.startswith(MAGIC_ZLIB):
+        return zlib.decompress(data[len(MAGIC_ZLIB) :]).decode("utf-8")
+    if data.startswith(MAGIC_ZSTD):
+        if zstandard is None:
+            raise ValueError("zstd-compressed value found but 'zstandard' is missing")
+        return (
+            zstandard.ZstdDecompressor()
+            .decompress(data[len(MAGIC_ZSTD) :])
+            .decode("utf-8")
+        )
+    return data.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column that transparently compresses large values
+
+    On SQLite the column stays TEXT: small values are stored as text and
+    compressed values as BLOBs (SQLite columns are dynamically typed), so
+    existing databases need no schema change. Other databases use a binary
+    column. Writes use the CompressionSettings configured on the engine
+    (configure_compression), or the defaults.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        stored = compress_text(
+            value, getattr(dialect, _DIALECT_ATTR, DEFAULT_COMPRESSION)
+        )
+        if isinstance(stored, str) and dialect.name != "sqlite":
+            return stored.encode("utf-8")
+        return stored
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
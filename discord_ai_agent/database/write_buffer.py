@@ -0,0 +1,294 @@
+"""Write-behind buffer that group-commits conversation and tool-log inserts"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from .models import ThreadSession, ConversationHistory, ToolLog
+from . import search, stats
+
+logger = logging.getLogger(__name__)
+
+# Durability modes
+DURABILITY_IMMEDIATE = "immediate"  # Commit every write before returning
+DURABILITY_BATCHED = "batched"  # Group-commit on an interval or size threshold
+DURABILITY_MODES = (DURABILITY_IMMEDIATE, DURABILITY_BATCHED)
+
+# Errors caused by the rows themselves; retrying the same batch cannot succeed
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class WriteBehindBuffer:
+    """
+    Buffers ConversationHistory/ToolLog rows and last-active updates
+
+    Pending rows are written in a single transaction (one fsync) when the
+    buffer is flushed. In batched mode a background thread flushes every
+    ``flush_interval`` seconds, or earlier once ``max_batch`` rows are pending;
+    while the database stays locked it backs off up to ``max_backoff``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        durability: str = DURABILITY_IMMEDIATE,
+        flush_interval: float = 0.5,
+        max_batch: int = 200,
+        max_backoff: float = 30.0,
+    ):
+        """
+        Initialize the write buffer
+
+        Args:
+            session_factory: Callable returning a new database session
+            durability: 'immediate' (flush on every write) or 'batched'
+            flush_interval: Seconds between background flushes (batched mode)
+            max_batch: Pending row count that triggers an early flush
+            max_backoff: Longest wait between background flushes while they
+                keep failing transiently (batched mode)
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(
+                f"Unknown durability mode: {durability} (expected one of {DURABILITY_MODES})"
+            )
+
+        self._session_factory = session_factory
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_backoff = max_backoff
+        self._failures = 0  # Transient flush failures in a row
+        self.dropped = 0  # Rows that violated a constraint and were given up on
+
+        self._lock = threading.Lock()  # Guards the pending lists
+        self._flush_lock = threading.Lock()  # Serializes flushes
+        self._messages: List[Dict[str, Any]] = []
+        self._tool_logs: List[Dict[str, Any]] = []
+        self._touched: Dict[int, datetime] = {}  # thread_id -> last_active_at
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if durability == DURABILITY_BATCHED:
+            self._thread = threading.Thread(
+                target=self._run, name="session-store-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """Background flush loop (batched mode)"""
+        while not self._stop.is_set():
+            self._wake.wait(self._retry_delay())
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}", exc_info=True)
+
+    def _retry_delay(self) -> float:
+        """Seconds until the next background flush (doubles per failure in a row)"""
+        if not self._failures:
+            return self.flush_interval
+        return min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+
+    def _enqueued(self):
+        """Flush according to the durability mode after enqueueing a write"""
+        if self.durability == DURABILITY_IMMEDIATE:
+            self.flush()
+        elif self.pending() >= self.max_batch and not self._failures:
+            self._wake.set()  # While backing off, the next retry writes them
+
+    def add_message(self, row: Dict[str, Any]) -> None:
+        """
+        Queue a ConversationHistory insert and a last-active update
+
+        Args:
+            row: Column values for ConversationHistory
+        """
+        with self._lock:
+            self._messages.append(row)
+            self._touched[row["thread_id"]] = row["created_at"]
+        self._enqueued()
+
+    def add_tool_log(self, row: Dict[str, Any]) -> None:
+        """
+        Queue a ToolLog insert
+
+        Args:
+            row: Column values for ToolLog
+        """
+        with self._lock:
+            self._tool_logs.append(row)
+        self._enqueued()
+
+    def pending(self) -> int:
+        """Number of rows waiting to be written"""
+        with self._lock:
+            return len(self._messages) + len(self._tool_logs) + len(self._touched)
+
+    def flush(self) -> int:
+        """
+        Write all pending rows in one transaction
+
+        A transient failure (OperationalError, e.g. a locked database) puts
+        the rows back in front of the buffer and re-raises, so the next flush
+        retries them in order; rows are never dropped for it, however long
+        it lasts. If a row violates a constraint (IntegrityError, DataError)
+        the batch is written row by row instead and only the offending rows
+        are dropped with an error log, so one bad row cannot hold back the
+        rest.
+
+        Returns:
+            Number of rows written
+
+        Raises:
+            OperationalError: If the batch failed transiently and will be retried
+        """
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, []
+                tool_logs, self._tool_logs = self._tool_logs, []
+                touched, self._touched = self._touched, {}
+
+            if not (messages or tool_logs or touched):
+                return 0
+
+            try:
+                self._write(messages, tool_logs, touched)
+            except ROW_ERRORS as e:
+                logger.error(f"Write-behind flush failed, writing the batch row by row: {e}")
+                return self._write_each(messages, tool_logs, touched)
+            except Exception:
+                # OperationalError (locked, disk full, ...) or anything unexpected
+                self._failures += 1
+                self._requeue(messages, tool_logs, touched)
+                raise
+
+            self._failures = 0
+            written = len(messages) + len(tool_logs) + len(touched)
+            logger.debug(
+                f"Write-behind flush: {len(messages)} messages, "
+                f"{len(tool_logs)} tool logs, {len(touched)} last-active updates"
+            )
+            return written
+
+    def _requeue(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+        touched: Dict[int, datetime],
+    ) -> None:
+        """Put rows back in front of the buffer so the next flush retries them in order"""
+        with self._lock:
+            self._messages[:0] = messages
+            self._tool_logs[:0] = tool_logs
+            for thread_id, active_at in touched.items():
+                self._touched.setdefault(thread_id, active_at)
+
+    def _write(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+        touched: Dict[int, datetime],
+    ) -> None:
+        """Insert/update the given rows in one transaction (rolled back on error)"""
+        db = self._session_factory()
+        try:
+            if messages:
+                ids = db.execute(
+                    insert(ConversationHistory).returning(
+                        ConversationHistory.id, sort_by_parameter_order=True
+                    ),
+                    messages,
+                ).scalars()
+                search.index_messages(
+                    db,
+                    [
+                        {"id": message_id, "content": row["content"]}
+                        for message_id, row in zip(ids, messages)
+                    ],
+                )
+            if tool_logs:
+                db.execute(insert(ToolLog), tool_logs)
+            if touched:
+                # Core executemany: threads deleted meanwhile are skipped silently
+                sessions = ThreadSession.__table__
+                db.execute(
+                    update(sessions)
+                    .where(sessions.c.thread_id == bindparam("b_thread_id"))
+                    .values(last_active_at=bindparam("b_last_active_at")),
+                    [
+                        {"b_thread_id": thread_id, "b_last_active_at": active_at}
+                        for thread_id, active_at in touched.items()
+                    ],
+                )
+            stats.bump_stats(
+                db,
+                {
+                    stats.TOTAL_MESSAGES: len(messages),
+                    stats.TOTAL_TOOL_USES: len(tool_logs),
+                },
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_each(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_logs: List[Dict[str, Any]],
+        touched: Dict[int, datetime],
+    ) -> int:
+        """
+        Write a failed batch one row per transaction, dropping rows that
+        violate a constraint
+
+        Returns:
+            Number of rows written
+
+        Raises:
+            OperationalError: If a write failed transiently (or any other
+                non-row error); the rows not written yet are put back for the
+                next flush
+        """
+        written = 0
+        rows = [("message", [row], [], {}) for row in messages]
+        rows += [("tool log", [], [row], {}) for row in tool_logs]
+        if touched:
+            rows.append(("last-active update", [], [], touched))
+        for index, (kind, row_messages, row_tool_logs, row_touched) in enumerate(rows):
+            try:
+                self._write(row_messages, row_tool_logs, row_touched)
+            except ROW_ERRORS as e:
+                self.dropped += 1
+                row = (row_messages or row_tool_logs or [row_touched])[0]
+                logger.error(f"Dropped {kind} that cannot be written: {row!r} ({e})")
+                continue
+            except Exception:
+                self._failures += 1
+                rest = rows[index:]
+                self._requeue(
+                    [m for _, ms, _, _ in rest for m in ms],
+                    [t for _, _, ts, _ in rest for t in ts],
+                    {k: v for _, _, _, tt in rest for k, v in tt.items()},
+                )
+                raise
+            written += len(row_messages) + len(row_tool_logs) + len(row_touched)
+        self._failures = 0
+        return written
+
+    def close(self) -> None:
+        """Stop the background flusher and write out everything pending"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
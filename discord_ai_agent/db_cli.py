@@ -0,0 +1,453 @@
+"""
+Discord AI Agent - Database Maintenance Commands
+
+Subcommands of the discord-ai-agent CLI that operate on the session database
+without starting a bot.
+"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from .app_config import load_config_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "./agents/shared_sessions.db"
+DEFAULT_SHARD_DIR = "./agents/shards"
+
+
+def open_store(db_path: str, create: bool = False):
+    """
+    Open the session store with the storage profile from config.yaml
+
+    Args:
+        db_path: Path to the SQLite database file
+        create: Create the database if it does not exist
+
+    Returns:
+        SessionStore
+    """
+    from .database import SessionStore, StorageProfile
+
+    if create:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    elif not Path(db_path).exists():
+        raise FileNotFoundError(f"Database not found: {db_path}")
+
+    profile = StorageProfile.from_config(load_config_section("storage"))
+    return SessionStore(db_path, profile=profile)
+
+
+def open_sharded_store(shard_dir: str, shards: Optional[int] = None):
+    """
+    Open a sharded session store with the storage profile from config.yaml
+
+    Args:
+        shard_dir: Directory holding the shard files and shard_map.json
+        shards: Shard count for a new directory (default: storage.shards)
+
+    Returns:
+        ShardedSessionStore
+    """
+    from .database import ShardedSessionStore, StorageProfile
+
+    profile = StorageProfile.from_config(load_config_section("storage"))
+    return ShardedSessionStore(shard_dir, shards or profile.shards or None, profile=profile)
+
+
+def cmd_compress_db(args: argparse.Namespace) -> int:
+    """Compress existing plain-text history and tool-log rows"""
+    db_path = Path(args.db)
+    size_before = db_path.stat().st_size if db_path.exists() else 0
+
+    store = open_store(args.db)
+    try:
+        stats = store.recompress(batch_size=args.batch_size, vacuum=args.vacuum)
+    finally:
+        store.close()
+
+    size_after = db_path.stat().st_size
+    print(f"✅ Compressed {stats['rows']} values")
+    print(f"   Payload: {stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes")
+    print(f"   DB file: {size_before:,} -> {size_after:,} bytes")
+    if not args.vacuum:
+        print("   (run with --vacuum to return freed pages to the OS)")
+    return 0
+
+
+def open_retention(args: argparse.Namespace):
+    """
+    Open the store and a RetentionManager with CLI overrides applied
+
+    Args:
+        args: Parsed arguments (db, archive_dir, idle_days, batch_size)
+
+    Returns:
+        Tuple of (SessionStore, RetentionManager)
+    """
+    from dataclasses import replace
+
+    from .database import RetentionManager, RetentionPolicy
+
+    policy = RetentionPolicy.from_config(load_config_section("retention"))
+    overrides = {
+        "archive_dir": args.archive_dir,
+        "idle_days": getattr(args, "idle_days", None),
+        "batch_size": args.batch_size,
+    }
+    policy = replace(policy, **{k: v for k, v in overrides.items() if v is not None})
+
+    store = open_store(args.db)
+    return store, RetentionManager(store, policy)
+
+
+def cmd_archive(args: argparse.Namespace) -> int:
+    """Deactivate idle threads and move their rows to the archive"""
+    store, retention = open_retention(args)
+    try:
+        stats = retention.run()
+    finally:
+        store.close()
+
+    print(f"✅ Deactivated {stats['deactivated']} idle threads")
+    print(
+        f"   Archived {stats['threads']} threads "
+        f"({stats['messages']} messages, {stats['tool_logs']} tool logs) "
+        f"to {retention.archive_dir}"
+    )
+    return 0
+
+
+def cmd_restore_thread(args: argparse.Namespace) -> int:
+    """Restore an archived thread into the database"""
+    store, retention = open_retention(args)
+    try:
+        stats = retention.restore_thread(args.thread_id)
+    finally:
+        store.close()
+
+    print(
+        f"✅ Restored thread {args.thread_id}: "
+        f"{stats['messages']} messages, {stats['tool_logs']} tool logs"
+    )
+    return 0
+
+
+def parse_datetime(value: str) -> datetime:
+    """argparse type for --since/--until (ISO 8601 date or datetime, UTC)"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {value!r} (use YYYY-MM-DD[THH:MM])")
+    if parsed.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """Export threads, messages and tool logs for analysis"""
+    from .database.transfer import ExportFilter, export_transcripts
+
+    filters = ExportFilter(
+        since=args.since, until=args.until, guild_id=args.guild, agent_name=args.agent
+    )
+    store = open_store(args.db)
+    try:
+        counts = export_transcripts(
+            store, args.output, args.format, filters, batch_size=args.batch_size
+        )
+    finally:
+        store.close()
+
+    print(
+        f"✅ Exported {counts['threads']} threads, {counts['messages']} messages, "
+        f"{counts['tool_logs']} tool logs to {args.output}"
+    )
+    return 0
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    """Import an export into a (fresh) database"""
+    from .database.transfer import import_transcripts
+
+    store = open_store(args.db, create=True)
+    try:
+        counts = import_transcripts(
+            store, args.input, args.format, batch_size=args.batch_size
+        )
+    finally:
+        store.close()
+
+    print(
+        f"✅ Imported {counts['threads']} threads, {counts['messages']} messages, "
+        f"{counts['tool_logs']} tool logs into {args.db}"
+    )
+    if counts["skipped_threads"]:
+        print(
+            f"   Skipped {counts['skipped_threads']} threads already in the database "
+            f"({counts['skipped_rows']} rows)"
+        )
+    return 0
+
+
+def cmd_tool_stats(args: argparse.Namespace) -> int:
+    """Print per-day tool latency, payload size and error rate"""
+    store = open_store(args.db)
+    try:
+        rollups = store.get_tool_rollup(
+            since=args.since, until=args.until, agent_name=args.agent, tool_name=args.tool
+        )
+    finally:
+        store.close()
+
+    if not rollups:
+        print("No tool calls in range")
+        return 0
+
+    def ms(value: Optional[int]) -> str:
+        return "-" if value is None else f"{value:,}"
+
+    print(
+        f"{'day':<11} {'agent':<16} {'tool':<28} {'calls':>6} {'err%':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'KB':>9}"
+    )
+    for r in rollups:
+        print(
+            f"{r.day:<11} {r.agent_name[:16]:<16} {r.tool_name[:28]:<28} {r.calls:>6} "
+            f"{r.error_rate * 100:>5.1f}% {ms(r.p50_ms):>8} {ms(r.p95_ms):>8} "
+            f"{ms(r.max_ms):>8} {r.result_bytes / 1024:>9.1f}"
+        )
+    return 0
+
+
+def cmd_shard_status(args: argparse.Namespace) -> int:
+    """Print per-shard counters and sizes"""
+    store = open_sharded_store(args.dir)
+    try:
+        rows = store.get_shard_stats()
+    finally:
+        store.close()
+
+    print(
+        f"{'shard':>5} {'sessions':>9} {'active':>7} {'messages':>10} "
+        f"{'tool uses':>10} {'channels':>9} {'pinned':>7} {'MB':>8}"
+    )
+    for row in rows:
+        print(
+            f"{row['shard']:>5} {row['total_sessions']:>9,} {row['active_sessions']:>7,} "
+            f"{row['total_messages']:>10,} {row['total_tool_uses']:>10,} "
+            f"{row['channel_settings']:>9,} {row['pinned_guilds']:>7} "
+            f"{row['bytes'] / 1024 / 1024:>8.1f}"
+        )
+    return 0
+
+
+def cmd_shard_move(args: argparse.Namespace) -> int:
+    """Move a guild to another shard (stop the bot first)"""
+    store = open_sharded_store(args.dir)
+    try:
+        counts = store.move_guild(args.guild_id, args.shard, batch_size=args.batch_size)
+    finally:
+        store.close()
+
+    print(
+        f"✅ Guild {args.guild_id} -> shard {args.shard}: {counts['threads']} threads, "
+        f"{counts['messages']} messages, {counts['tool_logs']} tool logs, "
+        f"{counts['channels']} channel settings"
+    )
+    return 0
+
+
+def cmd_shard_import(args: argparse.Namespace) -> int:
+    """Copy a single-file database into the shards"""
+    from .database import queries
+    from .database.transfer import copy_transcripts
+
+    source = open_store(args.db)
+    target = open_sharded_store(args.dir, args.shards)
+    try:
+        counts = copy_transcripts(source, target, batch_size=args.batch_size)
+        with source.read_engine.connect() as conn:
+            routes = conn.execute(queries.SELECT_CHANNEL_ROUTES).all()
+        for row in routes:
+            route = queries.to_channel_route(row)
+            target.set_channel_default_agent(
+                route.channel_id, route.guild_id, route.default_agent
+            )
+        channels = len(routes)
+    finally:
+        target.close()
+        source.close()
+
+    print(
+        f"✅ Copied {counts['threads']} threads, {counts['messages']} messages, "
+        f"{counts['tool_logs']} tool logs, {channels} channel settings into {args.dir}"
+    )
+    if counts["skipped_threads"]:
+        print(f"   Skipped {counts['skipped_threads']} threads already in the shards")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for database maintenance commands"""
+    parser = argparse.ArgumentParser(
+        prog="discord-ai-agent",
+        description="Discord AI Agent - database maintenance commands",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compress = subparsers.add_parser(
+        "compress-db", help="Compress existing conversation/tool-log rows in place"
+    )
+    compress.add_argument(
+        "--db", default=DEFAULT_DB_PATH, help=f"Database path (default: {DEFAULT_DB_PATH})"
+    )
+    compress.add_argument(
+        "--batch-size", type=int, default=500, help="Rows per transaction"
+    )
+    compress.add_argument(
+        "--vacuum", action="store_true", help="Run VACUUM afterwards to shrink the file"
+    )
+    compress.set_defaults(func=cmd_compress_db)
+
+    archive = subparsers.add_parser(
+        "archive", help="Archive idle threads' history and tool logs"
+    )
+    restore = subparsers.add_parser(
+        "restore-thread", help="Restore an archived thread into the database"
+    )
+    restore.add_argument("thread_id", type=int, help="Discord thread ID")
+    archive.add_argument(
+        "--idle-days", type=int, help="Override retention.idle_days from config.yaml"
+    )
+    for sub in (archive, restore):
+        sub.add_argument(
+            "--db", default=DEFAULT_DB_PATH, help=f"Database path (default: {DEFAULT_DB_PATH})"
+        )
+        sub.add_argument(
+            "--archive-dir", help="Archive directory (default: <db directory>/archive)"
+        )
+        sub.add_argument("--batch-size", type=int, help="Rows per transaction")
+    archive.set_defaults(func=cmd_archive)
+    restore.set_defaults(func=cmd_restore_thread)
+
+    export = subparsers.add_parser(
+        "export", help="Export threads, messages and tool logs (JSONL or Parquet)"
+    )
+    export.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Output file for jsonl (.gz to compress) or directory for parquet",
+    )
+    export.add_argument("--since", type=parse_datetime, help="Rows created at or after (UTC)")
+    export.add_argument("--until", type=parse_datetime, help="Rows created before (UTC)")
+    export.add_argument("--guild", type=int, help="Only threads in this guild")
+    export.add_argument("--agent", help="Only threads handled by this agent")
+
+    import_ = subparsers.add_parser(
+        "import", help="Import an export into a fresh database"
+    )
+    import_.add_argument("input", help="Export file (jsonl) or directory (parquet)")
+
+    for sub in (export, import_):
+        sub.add_argument(
+            "--db", default=DEFAULT_DB_PATH, help=f"Database path (default: {DEFAULT_DB_PATH})"
+        )
+        sub.add_argument(
+            "--format",
+            choices=["jsonl", "parquet"],
+            default="jsonl" if sub is export else None,
+            help="jsonl (default for export) or parquet (requires pyarrow)",
+        )
+        sub.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per transaction"
+        )
+    export.set_defaults(func=cmd_export)
+    import_.set_defaults(func=cmd_import)
+
+    tool_stats = subparsers.add_parser(
+        "tool-stats", help="Per-day tool latency (p50/p95), result size and error rate"
+    )
+    tool_stats.add_argument(
+        "--db", default=DEFAULT_DB_PATH, help=f"Database path (default: {DEFAULT_DB_PATH})"
+    )
+    tool_stats.add_argument(
+        "--since", type=parse_datetime, help="Tool calls at or after (UTC)"
+    )
+    tool_stats.add_argument("--until", type=parse_datetime, help="Tool calls before (UTC)")
+    tool_stats.add_argument("--agent", help="Only this agent's threads")
+    tool_stats.add_argument("--tool", help="Only this tool")
+    tool_stats.set_defaults(func=cmd_tool_stats)
+
+    shard_status = subparsers.add_parser(
+        "shard-status", help="Per-shard row counts and file sizes (storage.shards)"
+    )
+    shard_move = subparsers.add_parser(
+        "shard-move", help="Move a guild's data to another shard (stop the bot first)"
+    )
+    shard_move.add_argument("guild_id", type=int, help="Discord guild ID")
+    shard_move.add_argument("shard", type=int, help="Destination shard index")
+    shard_import = subparsers.add_parser(
+        "shard-import", help="Copy a single-file database into the shards"
+    )
+    shard_import.add_argument(
+        "--db", default=DEFAULT_DB_PATH, help=f"Source database (default: {DEFAULT_DB_PATH})"
+    )
+    shard_import.add_argument(
+        "--shards", type=int, help="Shard count for a new directory (default: storage.shards)"
+    )
+    for sub in (shard_status, shard_move, shard_import):
+        sub.add_argument(
+            "--dir",
+            default=DEFAULT_SHARD_DIR,
+            help=f"Shard directory (default: {DEFAULT_SHARD_DIR})",
+        )
+    for sub in (shard_move, shard_import):
+        sub.add_argument(
+            "--batch-size", type=int, default=1000, help="Rows per transaction"
+        )
+    shard_status.set_defaults(func=cmd_shard_status)
+    shard_move.set_defaults(func=cmd_shard_move)
+    shard_import.set_defaults(func=cmd_shard_import)
+
+    return parser
+
+
+# Subcommand names dispatched here from cli.main
+COMMANDS = {
+    "compress-db",
+    "archive",
+    "restore-thread",
+    "export",
+    "import",
+    "tool-stats",
+    "shard-status",
+    "shard-move",
+    "shard-import",
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run a database maintenance command
+
+    Args:
+        argv: Command line arguments (default: sys.argv[1:])
+
+    Returns:
+        Process exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    try:
+        return args.func(args)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
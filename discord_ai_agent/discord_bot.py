@@ -7,10 +7,12 @@ Discord bot implementation using Claude Agent SDK with multiple specialized agen
 import asyncio
 import logging
 import os
+import re
 import sys
+import time
 import yaml
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence
 
 import aiohttp
 
@@ -30,9 +32,28 @@ import discord
 from discord.ext import commands
 
 from .claude_cli_finder import find_claude_cli
-from .database import SessionStore
-from .message_queue import ThreadMessageQueue
+from .database import (
+    AsyncSessionStore,
+    QueueEntry,
+    StorageProfile,
+    RetentionPolicy,
+    RetentionManager,
+    SessionBackend,
+    open_backend,
+)
+from .app_config import load_config_section
+from .cancellation import RunningTurn, TurnRegistry
+from .message_queue import (
+    AttachmentSnapshot,
+    EnqueueResult,
+    QueuedMessage,
+    QueueSettings,
+    ThreadMessageQueue,
+)
+from .ownership import LeaseSettings, ThreadOwnership
+from .scheduler import AgentScheduler, SchedulerFull, SchedulerSettings
 from dotenv import load_dotenv
+from dataclasses import asdict
 from datetime import datetime
 
 # Agent SDK
@@ -59,6 +80,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# キュー上限で処理しなかった旨をスレッドに通知する最短間隔（秒）
+SHED_NOTICE_INTERVAL = 60.0
+
 
 # ターミナル用のカラーコード（ANSI）
 class Colors:
@@ -79,7 +103,11 @@ class DiscordAIBot(commands.Bot):
     """Discord AI Agent Bot - Agent SDK Integration"""
 
     def __init__(
-        self, agents_dir: str = "./agents", intents: Optional[discord.Intents] = None
+        self,
+        agents_dir: str = "./agents",
+        intents: Optional[discord.Intents] = None,
+        session_store: Optional[SessionBackend] = None,
+        scheduler: Optional[AgentScheduler] = None,
     ):
         """
         Initialize Discord AI Bot
@@ -87,6 +115,12 @@ class DiscordAIBot(commands.Bot):
         Args:
             agents_dir: Path to directory containing all agents (default: ./agents)
             intents: Discord intents (optional, uses defaults if not provided)
+            session_store: Session storage backend (optional; e.g.
+                MemorySessionStore() for tests and benchmarks). Defaults to the
+                backend selected by SESSION_DB_URL / storage.url.
+            scheduler: Agent concurrency scheduler (optional; pass one
+                instance to several bots in a process to share the limit).
+                Defaults to one built from the scheduler section of config.yaml.
         """
         # Setup intents
         if intents is None:
@@ -112,16 +146,69 @@ class DiscordAIBot(commands.Bot):
             logger.error(f"Failed to initialize agent registry: {e}")
             raise
 
-        # セッション管理（SQLiteベース）
-        # Use a shared database for all agents
+        # セッション管理
+        # 既定は全エージェント共有のSQLite（DBアクセスは専用スレッドで実行）
+        # 複数レプリカで共有する場合は SESSION_DB_URL / storage.url に PostgreSQL のURLを指定
+        # memory:// または session_store 引数でディスクを使わないインメモリ実装も選択可能
+        # 性能プロファイル（WAL・PRAGMA・書き込みバッファ）は config.yaml の storage で設定
         db_path = Path(agents_dir) / "shared_sessions.db"
-        self.session_store = SessionStore(str(db_path))
-        logger.info(f"セッションDB: {db_path}")
+        self.storage_profile = StorageProfile.from_config(
+            load_config_section("storage")
+        )
+        if session_store is not None:
+            self.session_store = session_store
+            logger.info(f"セッションDB: {type(session_store).__name__}（引数で指定）")
+        else:
+            db_url = os.getenv("SESSION_DB_URL") or self.storage_profile.url
+            self.session_store = open_backend(
+                db_url, str(db_path), self.storage_profile
+            )
+            logger.info(f"セッションDB: {self._describe_db_url(db_url) or db_path}")
+
+        # 保持ポリシー（アイドルスレッドの非アクティブ化とアーカイブ）
+        self.retention_policy = RetentionPolicy.from_config(
+            load_config_section("retention")
+        )
+        # アーカイブはSQLiteバックエンドのみ対応（PostgreSQL・インメモリでは無効）
+        self.retention = (
+            RetentionManager(self.session_store.store, self.retention_policy)
+            if isinstance(self.session_store, AsyncSessionStore)
+            else None
+        )
 
         # メッセージキュー（スレッド単位）
-        self.message_queue = ThreadMessageQueue()
+        # queue.coalesce で同じユーザーの連投を1回のAgent実行にまとめる
+        self.message_queue = ThreadMessageQueue(
+            QueueSettings.from_config(load_config_section("queue"))
+        )
+        # キューイング中マーク（⏳）を付けたメッセージID と、リアクション更新タスク
+        self._hourglass_marked: set[int] = set()
+        self._reaction_tasks: set[asyncio.Task] = set()
+        # キュー上限で処理しなかったことをスレッドに通知した時刻（連続通知の抑制）
+        self._shed_notices: dict[int, float] = {}
         logger.info("メッセージキューシステム初期化完了")
 
+        # 複数ノード運用: 同じDBを共有するBotプロセス間でスレッドの担当をリースで決める
+        # （メッセージの受け渡しは永続キュー経由のため queue.durable が必要）
+        lease_settings = LeaseSettings.from_config(load_config_section("leases"))
+        self.ownership: Optional[ThreadOwnership] = None
+        if lease_settings.enabled:
+            if not self.message_queue.settings.durable:
+                raise ValueError("leases.enabled requires queue.durable")
+            self.ownership = ThreadOwnership(self.session_store, lease_settings)
+            logger.info(f"スレッドリース有効: node_id={self.ownership.node_id}")
+
+        # Agent実行のスケジューラ（同時実行数の上限・ギルド/ユーザー単位の枠・公平な順番待ち）
+        self.scheduler = scheduler or AgentScheduler(
+            SchedulerSettings.from_config(load_config_section("scheduler"))
+        )
+        logger.info(
+            f"Agent同時実行数の上限: {self.scheduler.settings.max_concurrent}"
+        )
+
+        # 実行中のAgent（スレッド単位）: /cancel やトリガーメッセージの削除で中断する
+        self.turns = TurnRegistry()
+
         # 旧セッション管理（後方互換性のため残す）
         # Note: TTLを無効化（セッションは永久保持）
         self.session_manager = DiscordSessionManager(
@@ -129,11 +216,8 @@ class DiscordAIBot(commands.Bot):
             cleanup_interval=86400,  # クリーンアップは1日1回のみ
         )
 
-        # レート制限
-        self.rate_limiter = RateLimiter(
-            per_minute=10,
-            per_hour=100,
-        )
+        # レート制限（config.yaml の rate_limit）
+        self.rate_limiter = RateLimiter.from_config(load_config_section("rate_limit"))
 
         # Claude CLI パス（自動検知）
         self.claude_cli_path = find_claude_cli()
@@ -149,6 +233,98 @@ class DiscordAIBot(commands.Bot):
         # Note: Claude Code CLIを使用するため、Anthropic APIキーは不要
         self.env_vars = {}
 
+        # バックグラウンドタスク（setup_hookで起動、close時にキャンセル）
+        self._background_tasks: list[asyncio.Task] = []
+
+    @staticmethod
+    def _describe_db_url(url: Optional[str]) -> Optional[str]:
+        """ログ表示用にDB URLのパスワードを伏せる"""
+        if not url:
+            return None
+        return re.sub(r"://([^:/@]+):[^@]*@", r"://\1:***@", url)
+
+    async def setup_hook(self):
+        """ログイン前の初期化（DB接続・バックグラウンドタスクの起動）"""
+        # スキーマのマイグレーションとルーティングテーブルの読み込み
+        await self.session_store.start()
+
+        # 永続キューの未処理メッセージを復元（Gateway接続前なので新着より先に並ぶ）
+        # 複数ノード運用時は他ノードが処理中のメッセージもあるため、
+        # 担当のいないスレッドだけを定期的に引き取る
+        if self.ownership is not None:
+            self._start_periodic_task(
+                "thread-leases",
+                self.ownership.settings.heartbeat,
+                self.run_lease_heartbeat,
+            )
+        elif self.message_queue.settings.durable:
+            await self.restore_message_queue()
+
+        # チャンネル設定のルーティングテーブルを定期的に再読み込み（他プロセスの変更を反映）
+        self._start_periodic_task(
+            "channel-routes-refresh",
+            self.storage_profile.channel_routes_refresh,
+            self.session_store.refresh_channel_routes,
+        )
+
+        # 統計カウンタのずれを定期的に補正（全件COUNTで再計算）
+        self._start_periodic_task(
+            "stats-reconcile",
+            self.storage_profile.stats_reconcile_interval,
+            self.session_store.reconcile_stats,
+        )
+
+        # しばらくリクエストのないユーザーのレート制限データを削除
+        self._start_periodic_task(
+            "rate-limit-cleanup",
+            self.rate_limiter.cleanup_interval,
+            self.cleanup_rate_limits,
+        )
+
+        # アイドルスレッドのアーカイブ（有効時のみ）。大量の読み書きを伴うため別スレッドで実行
+        if self.retention_policy.enabled and self.retention is None:
+            logger.warning("retention はSQLiteバックエンドでのみ利用できます（無効化しました）")
+        elif self.retention_policy.enabled:
+            self._start_periodic_task(
+                "retention",
+                self.retention_policy.interval_hours * 3600,
+                self.run_retention,
+            )
+
+    async def cleanup_rate_limits(self) -> int:
+        """レート制限データの掃除（1回分）"""
+        removed = self.rate_limiter.cleanup()
+        if removed:
+            logger.info(f"レート制限データを削除: {removed}ユーザー")
+        return removed
+
+    async def run_retention(self) -> dict:
+        """保持ポリシーを1回実行（アイドルスレッドの非アクティブ化・アーカイブ）"""
+        return await asyncio.to_thread(self.retention.run)
+
+    def _start_periodic_task(self, name: str, interval: float, func) -> None:
+        """
+        一定間隔でコルーチン関数を実行するタスクを起動
+
+        Args:
+            name: タスク名（ログ用）
+            interval: 実行間隔（秒）。0以下の場合は起動しない
+            func: 引数なしのコルーチン関数
+        """
+        if interval <= 0:
+            return
+
+        async def run_periodically():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await func()
+                except Exception as e:
+                    logger.error(f"定期タスク {name} でエラー: {e}", exc_info=True)
+
+        self._background_tasks.append(asyncio.create_task(run_periodically(), name=name))
+        logger.info(f"定期タスク起動: {name} ({interval}秒ごと)")
+
     async def on_ready(self):
         """Bot起動時の処理"""
         logger.info(f"ログイン成功: {self.user} (ID: {self.user.id})")
@@ -169,16 +345,63 @@ class DiscordAIBot(commands.Bot):
 
         logger.info("Bot準備完了")
 
-    async def on_message_delete(self, message: discord.Message):
-        """メッセージ削除時の処理"""
-        # スレッド内のメッセージのみ処理
-        if isinstance(message.channel, discord.Thread):
-            if message.channel.owner_id == self.user.id:
-                # キューから削除済みとしてマーク
-                if self.message_queue.mark_deleted(message.channel.id, message.id):
-                    logger.info(
-                        f"メッセージをキューから削除: thread={message.channel.id}, msg={message.id}"
-                    )
+    async def close(self):
+        """Bot停止時の処理"""
+        # 実行中のAgentを中断し、Claude CLI のプロセスが残らないようにする
+        await self.turns.cancel_all("Bot停止")
+        # 担当スレッドを手放し、他ノードがすぐに引き継げるようにする
+        if self.ownership is not None:
+            await self.ownership.release_all()
+
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+        await super().close()
+
+        # 実行中のDB処理を完了させ、未書き込みの履歴をフラッシュ
+        await self.session_store.close()
+
+    async def _forget_queued_message(self, thread_id: int, message_id: int):
+        """削除されたメッセージをキューから外す（キューにない場合は何もしない）"""
+        if self.message_queue.mark_deleted(thread_id, message_id):
+            self._hourglass_marked.discard(message_id)
+            logger.info(f"メッセージをキューから削除: thread={thread_id}, msg={message_id}")
+            await self._update_journal(
+                self._journal_ack, thread_id, [message_id]
+            )
+
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """
+        メッセージ削除時の処理
+
+        キャッシュにないメッセージの削除も届く raw イベントで処理する
+        （キューはメッセージを再取得しないため、削除はここでしか検知できない）。
+        処理中のメッセージが削除された場合は実行中のAgentを中断する
+        """
+        await self._forget_queued_message(payload.channel_id, payload.message_id)
+        self.turns.cancel_message(payload.message_id, "メッセージ削除")
+
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ):
+        """メッセージの一括削除時の処理"""
+        for message_id in payload.message_ids:
+            await self._forget_queued_message(payload.channel_id, message_id)
+            self.turns.cancel_message(message_id, "メッセージ削除")
+
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        """キュー内のメッセージが編集されたら処理する本文を差し替える"""
+        content = payload.data.get("content")
+        if content is None:
+            return
+        queued = self.message_queue.update_content(
+            payload.channel_id, payload.message_id, content
+        )
+        # 永続キューの本文も差し替える（再起動後・引き継ぎ後も編集後の本文で処理する）
+        # 複数ノード運用時は他ノードが担当中のスレッドのメッセージも永続キューにだけある
+        if queued or self.ownership is not None:
+            await self._journal_edit(payload.channel_id, payload.message_id, content)
 
     async def on_message(self, message: discord.Message):
         """メッセージ受信時の処理（スレッドベース）"""
@@ -201,18 +424,42 @@ class DiscordAIBot(commands.Bot):
                     f"スレッド内メッセージ: {message.author.name} in thread {message.channel.id}"
                 )
 
-                # メッセージをキューに追加
-                position = self.message_queue.add_message(
+                # 処理に必要な情報（本文・投稿者・添付ファイル）をスナップショットとして保持
+                # （キューから取り出す時にメッセージを再取得しない）
+                attachments = self._snapshot_attachments(message)
+
+                # 永続キューに記録（記録済み＝重複配信ならスキップ）
+                if not await self._journal_enqueue(message, attachments):
+                    logger.info(f"記録済みのメッセージをスキップ: msg={message.id}")
+                    return
+
+                # 複数ノード運用: 他ノードが担当中のスレッドなら永続キュー経由で任せる
+                if self.ownership is not None and not await self.ownership.acquire(
+                    message.channel.id
+                ):
+                    logger.info(
+                        f"他ノードが担当中のスレッド: thread={message.channel.id}, msg={message.id}"
+                    )
+                    return
+
+                # メッセージをキューに追加（上限到達時は queue.overflow に従う）
+                result = self.message_queue.add_message(
                     thread_id=message.channel.id,
                     message_id=message.id,
                     user_id=message.author.id,
                     content=message.content,
-                    has_attachments=bool(message.attachments),
+                    author_name=message.author.display_name,
+                    attachments=attachments,
                 )
+                await self._apply_overflow(message.channel.id, message.id, result)
+                if not result.accepted or result.merged_into is not None:
+                    return
 
                 # キュー位置を通知（オプション）
+                position = result.position
                 if position > 0:
                     queue_size = self.message_queue.get_queue_size(message.channel.id)
+                    self._hourglass_marked.add(message.id)
                     await message.add_reaction("⏳")  # キューイング中を示す
                     logger.info(
                         f"メッセージをキューに追加: position={position}, queue_size={queue_size}"
@@ -709,17 +956,48 @@ class DiscordAIBot(commands.Bot):
             message: ユーザーのメンション付きメッセージ
             agent_name: 使用するエージェント名 (Noneの場合はチャンネルのデフォルトを使用)
         """
+        if self.ownership is None:
+            await self._create_thread_and_start(message, agent_name)
+            return
+
+        # 複数ノード運用: 同じメンションを受け取った他ノードと重複してスレッドを作らない
+        # （元メッセージから作るスレッドのIDはメッセージIDと同じ）
+        if not await self.ownership.acquire(message.id):
+            logger.info(f"他ノードが対応中のメンション: msg={message.id}")
+            return
+        try:
+            await self._create_thread_and_start(message, agent_name)
+        finally:
+            # キュー処理に引き継がなかった場合は更新をやめ、TTL経過で失効させる
+            # （それまでは遅れて届いた同じメンションを他ノードが弾ける）
+            if not self.message_queue.is_processing(message.id):
+                self.ownership.forget(message.id)
+
+    async def _create_thread_and_start(
+        self, message: discord.Message, agent_name: Optional[str]
+    ):
+        """create_thread_and_start の本体"""
         # レート制限チェック
         allowed, error_msg = await self.rate_limiter.check_rate_limit(message.author.id)
         if not allowed:
             await message.reply(f"⚠️ {error_msg}")
             return
 
+        # 順番待ちが上限に達している間はスレッドを作らずに断る
+        if self.scheduler.is_saturated():
+            await message.reply(
+                "⚠️ 現在混雑しています。しばらくしてからもう一度メンションしてください。"
+            )
+            return
+
         # エージェント名が指定されていない場合、チャンネルのデフォルトを取得
+        # （メモリ上のルーティングテーブルから取得、DBアクセスなし）
         if agent_name is None:
-            settings = self.session_store.get_channel_settings(message.channel.id)
-            if settings and settings.default_agent:
-                agent_name = settings.default_agent
+            channel_agent = await self.session_store.get_channel_default_agent(
+                message.channel.id
+            )
+            if channel_agent:
+                agent_name = channel_agent
                 logger.info(f"Using channel default agent: {agent_name}")
             else:
                 agent_name = self.agent_registry.get_default_agent_name()
@@ -753,10 +1031,11 @@ class DiscordAIBot(commands.Bot):
             return
 
         # データベースにセッションを即座に記録（重要: キュー処理前に作成）
-        self.session_store.create_thread_session(
+        await self.session_store.create_thread_session(
             thread_id=thread.id,
             user_id=message.author.id,
             agent_name=agent_name,
+            guild_id=message.guild.id if message.guild else None,
         )
         logger.info(f"セッション作成完了: thread_id={thread.id}, agent={agent_name}")
 
@@ -789,8 +1068,10 @@ class DiscordAIBot(commands.Bot):
             self.message_queue.set_processing(thread.id, True)
 
             try:
-                # 初回メッセージを処理
-                await self.process_in_thread(thread, content, message.author.id)
+                # 初回メッセージを処理（元メッセージが削除されたら中断）
+                await self.process_in_thread(
+                    thread, content, message.author.id, trigger_ids=[message.id]
+                )
             finally:
                 # 処理中フラグを下ろす
                 self.message_queue.set_processing(thread.id, False)
@@ -812,6 +1093,11 @@ class DiscordAIBot(commands.Bot):
             logger.debug(f"Thread {thread_id} is already being processed")
             return
 
+        # 複数ノード運用: スレッドの担当でなければ処理しない（メッセージは永続キューに残る）
+        if self.ownership is not None and not await self.ownership.acquire(thread_id):
+            logger.info(f"他ノードが担当中のスレッド: thread={thread_id}")
+            return
+
         # ロックを取得して処理開始
         async with self.message_queue.get_lock(thread_id):
             self.message_queue.set_processing(thread_id, True)
@@ -819,56 +1105,502 @@ class DiscordAIBot(commands.Bot):
             try:
                 # キューが空になるまで処理
                 while True:
-                    queued_msg = self.message_queue.get_next_message(thread_id)
-
-                    if queued_msg is None:
+                    # 連投まとめ有効時は同じユーザーの連続メッセージをまとめて取得
+                    batch = await self.message_queue.get_next_batch(thread_id)
+
+                    if not batch:
+                        # 複数ノード運用: 他ノードが永続キューに記録したメッセージを引き取る
+                        if self.ownership is not None and (
+                            await self._adopt_thread_entries(thread_id)
+                            or self.message_queue.get_queue_size(thread_id)
+                        ):
+                            continue
                         # キューが空になった
                         logger.info(f"Queue empty for thread {thread_id}")
                         break
 
-                    # メッセージを取得（削除されていないか確認）
-                    try:
-                        message = await thread.fetch_message(queued_msg.message_id)
-                    except discord.NotFound:
-                        logger.info(
-                            f"Message {queued_msg.message_id} not found (deleted)"
-                        )
-                        continue
-                    except discord.HTTPException as e:
-                        logger.error(
-                            f"Failed to fetch message {queued_msg.message_id}: {e}"
+                    message_ids = [queued_msg.message_id for queued_msg in batch]
+                    if self.ownership is not None:
+                        # リースを失った（停止していた間に他ノードが引き継いだ）
+                        if thread_id not in self.ownership.held:
+                            logger.warning(f"スレッドの担当を失いました: thread={thread_id}")
+                            self.message_queue.clear_thread_queue(thread_id)
+                            break
+                        # 1件ずつ claim し、claim できたものだけ処理する（二重実行の防止）
+                        message_ids = await self.ownership.claim(thread_id, message_ids)
+                        batch = [m for m in batch if m.message_id in message_ids]
+                        if not batch:
+                            continue
+                    else:
+                        # 永続キュー: 処理開始を記録（再起動後に二重実行しないため）
+                        await self._update_journal(
+                            self.session_store.claim_messages, thread_id, message_ids
                         )
-                        continue
 
-                    # リアクションを削除（キューイング中マーク）
                     try:
-                        await message.remove_reaction("⏳", self.user)
-                    except:
-                        pass
-
-                    # メッセージを処理
-                    await self.handle_thread_message(message)
+                        # ⏳の除去・🔗の付与はAgentの開始を待たせないよう並行して実行
+                        self._update_reactions(thread, batch)
+
+                        # メッセージを処理（キュー登録時のスナップショットを使用。
+                        # 削除されたメッセージは削除イベントでキューから除外済み）
+                        await self.handle_thread_messages(thread, batch)
+                    finally:
+                        # 永続キュー: 処理済み（失敗・削除済みを含む）として除去
+                        await self._update_journal(
+                            self._journal_ack, thread_id, message_ids
+                        )
 
             finally:
                 self.message_queue.set_processing(thread_id, False)
 
+                # 複数ノード運用: キューが空になったら担当を手放す
+                if self.ownership is not None and not self.message_queue.get_queue_size(
+                    thread_id
+                ):
+                    await self.ownership.release(thread_id)
+
+    async def _journal_enqueue(
+        self, message: discord.Message, attachments: tuple[AttachmentSnapshot, ...]
+    ) -> bool:
+        """
+        永続キュー有効時にメッセージ（スナップショット）をDBに記録
+
+        Args:
+            message: スレッド内のユーザーメッセージ
+            attachments: 添付ファイルのスナップショット
+
+        Returns:
+            キューに追加してよければTrue（記録済みのメッセージならFalse）
+        """
+        if not self.message_queue.settings.durable:
+            return True
+        try:
+            return await self.session_store.enqueue_message(
+                bot_id=self.user.id,
+                thread_id=message.channel.id,
+                message_id=message.id,
+                user_id=message.author.id,
+                content=message.content,
+                author_name=message.author.display_name,
+                attachments=[asdict(attachment) for attachment in attachments],
+            )
+        except Exception as e:
+            # 記録できなくてもメモリ上のキューで処理は続ける
+            logger.error(f"永続キューへの記録に失敗: msg={message.id}: {e}")
+            return True
+
+    @property
+    def _journal_ack(self):
+        """
+        永続キューの ack（処理済み・削除済みのメッセージを除去）
+
+        複数ノード運用時は、遅れて届いた同じメッセージを他ノードが
+        再び記録しないよう、一定時間は記録を残す
+        """
+        if self.ownership is not None:
+            return self.ownership.ack
+        return self.session_store.ack_messages
+
+    async def _update_journal(self, method, thread_id: int, message_ids: list[int]):
+        """
+        永続キュー有効時に claim / ack を記録（失敗してもキュー処理は止めない）
+
+        Args:
+            method: session_store.claim_messages または _journal_ack
+            thread_id: Discord thread ID
+            message_ids: 対象のメッセージID
+        """
+        if not self.message_queue.settings.durable:
+            return
+        try:
+            await method(thread_id, message_ids)
+        except Exception as e:
+            logger.error(f"永続キューの更新に失敗: thread={thread_id}: {e}")
+
+    async def _journal_edit(
+        self,
+        thread_id: int,
+        message_id: int,
+        content: str,
+        attachments: Optional[list[dict]] = None,
+    ):
+        """
+        永続キュー有効時に記録済みメッセージの本文を差し替える（失敗しても処理は止めない）
+
+        Args:
+            thread_id: Discord thread ID
+            message_id: 編集された（または追記先の）メッセージID
+            content: 新しい本文
+            attachments: 新しい添付ファイル情報（None なら変更しない）
+        """
+        if not self.message_queue.settings.durable:
+            return
+        try:
+            await self.session_store.update_queued_message(
+                thread_id, message_id, content, attachments
+            )
+        except Exception as e:
+            logger.error(f"永続キューの本文更新に失敗: msg={message_id}: {e}")
+
+    async def restore_message_queue(self):
+        """
+        永続キューから未処理メッセージを読み込む（起動時）
+
+        未着手のメッセージは元の順番でメモリ上のキューに戻し、Bot準備完了後に
+        スレッドごとの処理を再開する。処理開始済み（claim済み）のメッセージは
+        再起動前に処理が途中まで進んでいた可能性があるため再実行せず、
+        スレッドに中断を通知して取り除く
+        """
+        entries = await self.session_store.load_message_queue(self.user.id)
+        if not entries:
+            return
+
+        interrupted: dict[int, list[int]] = {}
+        for entry in entries:
+            if entry.claimed_at is not None:
+                interrupted.setdefault(entry.thread_id, []).append(entry.message_id)
+        resumed = await self._requeue_entries(
+            [entry for entry in entries if entry.claimed_at is None]
+        )
+
+        for thread_id, message_ids in interrupted.items():
+            await self.session_store.ack_messages(thread_id, message_ids)
+
+        logger.info(
+            f"永続キューを復元: {sum(map(len, resumed.values()))}件を再開, "
+            f"{sum(map(len, interrupted.values()))}件は処理中に中断"
+            f"（{len(resumed)}スレッド）"
+        )
+        self._background_tasks.append(
+            asyncio.create_task(
+                self._resume_thread_queues(resumed, interrupted),
+                name="queue-resume",
+            )
+        )
+
+    async def _requeue_entries(self, entries: list[QueueEntry]) -> dict[int, list[int]]:
+        """
+        永続キューの未着手メッセージをメモリ上のキューに戻す
+
+        Args:
+            entries: claim されていないエントリ（古い順）
+
+        Returns:
+            スレッドID -> キューに戻したメッセージID（古い順）
+        """
+        resumed: dict[int, list[int]] = {}
+        for entry in entries:
+            result = self.message_queue.add_message(
+                thread_id=entry.thread_id,
+                message_id=entry.message_id,
+                user_id=entry.user_id,
+                content=entry.content,
+                has_attachments=entry.has_attachments,
+                author_name=entry.author_name,
+                attachments=tuple(
+                    AttachmentSnapshot(**attachment) for attachment in entry.attachments
+                ),
+            )
+            # 複数ノード運用: 受信時に自分でキューに入れたメッセージは取り込み済み
+            if result.duplicate:
+                continue
+            # 再起動前に付けた⏳が残っている可能性があるので処理開始時に外す
+            self._hourglass_marked.add(entry.message_id)
+            # 上限を超えた分は永続キューからも取り除く（Bot準備前なので通知はしない）
+            await self._apply_overflow(entry.thread_id, entry.message_id, result)
+            if result.shed is not None:
+                dropped = resumed.get(result.shed_thread_id, [])
+                if result.shed.message_id in dropped:
+                    dropped.remove(result.shed.message_id)
+            if not result.accepted or result.merged_into is not None:
+                continue
+            resumed.setdefault(entry.thread_id, []).append(entry.message_id)
+        return resumed
+
+    async def _adopt_thread_entries(self, thread_id: int) -> int:
+        """
+        他ノードが永続キューに記録したスレッドのメッセージをキューに取り込む（担当ノードのみ）
+
+        Returns:
+            キューに戻したメッセージ数
+        """
+        entries = await self.ownership.pending(self.user.id, thread_id)
+        resumed = await self._requeue_entries(entries)
+        return len(resumed.get(thread_id, []))
+
+    async def run_lease_heartbeat(self):
+        """
+        スレッドリースの更新と、担当ノードのいないスレッドの引き継ぎ
+
+        停止・応答不能になったノードのリースは TTL 経過で失効する。
+        そのスレッドの未着手メッセージを引き取り、処理中だったものは
+        再起動時と同様に中断として通知する
+        """
+        await self.ownership.renew()
+        await self.ownership.prune()
+        if not self.is_ready():
+            return
+        adopted, interrupted = await self.ownership.scan(self.user.id)
+        resumed = await self._requeue_entries(
+            [entry for entries in adopted.values() for entry in entries]
+        )
+        # 上限超過で全件を処理しなかったスレッドは担当を手放す
+        for thread_id in adopted.keys() - resumed.keys():
+            await self.ownership.release(thread_id)
+        if resumed or interrupted:
+            self._spawn(self._resume_thread_queues(resumed, interrupted))
+
+    async def _resume_thread_queues(
+        self, resumed: dict[int, list[int]], interrupted: dict[int, list[int]]
+    ):
+        """
+        復元したスレッドのキュー処理を再開（Bot準備完了後）
+
+        Args:
+            resumed: 再開するスレッドID -> メッセージID
+            interrupted: 処理中に中断したスレッドID -> メッセージID
+        """
+        await self.wait_until_ready()
+
+        threads = []
+        for thread_id in dict.fromkeys([*interrupted, *resumed]):
+            thread = self.get_channel(thread_id)
+            if thread is None:
+                try:
+                    thread = await self.fetch_channel(thread_id)
+                except discord.HTTPException as e:
+                    # スレッドが消えている: 処理できないのでキューから除去
+                    logger.warning(f"スレッドを取得できません: thread={thread_id}: {e}")
+                    self.message_queue.clear_thread_queue(thread_id)
+                    self._hourglass_marked.difference_update(resumed.get(thread_id, []))
+                    await self._update_journal(
+                        self._journal_ack,
+                        thread_id,
+                        resumed.get(thread_id, []),
+                    )
+                    if self.ownership is not None:
+                        await self.ownership.release(thread_id)
+                    continue
+
+            if thread_id in interrupted:
+                try:
+                    await thread.send(
+                        "⚠️ Botの再起動・停止により処理が中断されたメッセージがあります。"
+                        "必要であればもう一度送信してください。"
+                    )
+                except discord.HTTPException as e:
+                    logger.warning(f"中断通知の送信に失敗: thread={thread_id}: {e}")
+            if thread_id in resumed:
+                threads.append(thread)
+
+        # 同時実行数はスケジューラが制限する
+        await asyncio.gather(
+            *(self.process_thread_queue(thread) for thread in threads),
+            return_exceptions=True,
+        )
+
+    @staticmethod
+    def _snapshot_attachments(message: discord.Message) -> tuple[AttachmentSnapshot, ...]:
+        """添付ファイルのダウンロードに必要な情報だけを取り出す"""
+        return tuple(
+            AttachmentSnapshot(
+                filename=attachment.filename,
+                url=attachment.url,
+                size=attachment.size,
+                content_type=attachment.content_type,
+            )
+            for attachment in message.attachments
+        )
+
+    def _update_reactions(self, thread: discord.Thread, batch: list[QueuedMessage]):
+        """
+        キューから取り出したメッセージのリアクションをバックグラウンドで更新
+
+        ⏳（キューイング中）を外し、まとめて処理するメッセージには🔗を付ける。
+        メッセージは取得せず PartialMessage でリアクションだけを操作する
+
+        Args:
+            thread: Discord thread
+            batch: 取り出したメッセージ（1回のAgent実行分）
+        """
+        unmark = [m.message_id for m in batch if m.message_id in self._hourglass_marked]
+        self._hourglass_marked.difference_update(unmark)
+        link = [m.message_id for m in batch] if len(batch) > 1 else []
+        if not unmark and not link:
+            return
+
+        async def update():
+            for message_id in unmark:
+                try:
+                    await thread.get_partial_message(message_id).remove_reaction(
+                        "⏳", self.user
+                    )
+                except discord.HTTPException:
+                    pass
+            for message_id in link:
+                try:
+                    await thread.get_partial_message(message_id).add_reaction("🔗")
+                except discord.HTTPException:
+                    pass
+
+        self._spawn(update())
+
+    def _spawn(self, coro) -> None:
+        """
+        リアクション更新などの Discord 操作をバックグラウンドで実行
+
+        キュー処理を API 呼び出しで待たせないため。タスクは完了まで参照を保持する
+        """
+        task = asyncio.create_task(coro)
+        self._reaction_tasks.add(task)
+        task.add_done_callback(self._reaction_tasks.discard)
+
+    async def _apply_overflow(
+        self, thread_id: int, message_id: int, result: EnqueueResult
+    ):
+        """
+        キュー上限（queue.max_thread_depth / max_total_depth）に達した結果を反映
+
+        処理しないことになったメッセージ（拒否された新着、または押し出された
+        最古のメッセージ）は永続キューから取り除き、🚫 を付けてスレッドに通知する。
+        先行メッセージにまとめた場合は 🔗 を付ける（本文は先行メッセージ側で処理）
+
+        Args:
+            thread_id: メッセージを追加したスレッドID
+            message_id: 追加したメッセージID
+            result: ThreadMessageQueue.add_message の戻り値
+        """
+        if result.duplicate:
+            return  # 既にキューにあるメッセージ（元のエントリはそのまま処理する）
+        dropped: list[tuple[int, int]] = []  # (thread_id, message_id)
+        if not result.accepted:
+            dropped.append((thread_id, message_id))
+        if result.shed is not None:
+            dropped.append((result.shed_thread_id, result.shed.message_id))
+        if result.merged_into is not None:
+            # 先に追記先の記録を更新してから ack する（再起動後も追記分を失わない）
+            target = self.message_queue.get_message(thread_id, result.merged_into)
+            if target is not None:
+                await self._journal_edit(
+                    thread_id,
+                    target.message_id,
+                    target.content,
+                    [asdict(attachment) for attachment in target.attachments],
+                )
+            await self._update_journal(
+                self._journal_ack, thread_id, [message_id]
+            )
+            unmark = message_id in self._hourglass_marked
+            self._hourglass_marked.discard(message_id)
+            self._spawn(
+                self._mark_messages(
+                    thread_id, [message_id], add="🔗", remove="⏳" if unmark else None
+                )
+            )
+        for dropped_thread_id, dropped_id in dropped:
+            await self._update_journal(
+                self._journal_ack, dropped_thread_id, [dropped_id]
+            )
+            unmark = dropped_id in self._hourglass_marked
+            self._hourglass_marked.discard(dropped_id)
+            self._spawn(
+                self._mark_messages(
+                    dropped_thread_id,
+                    [dropped_id],
+                    add="🚫",
+                    remove="⏳" if unmark else None,
+                    notify=True,
+                )
+            )
+
+    async def _mark_messages(
+        self,
+        thread_id: int,
+        message_ids: list[int],
+        add: Optional[str] = None,
+        remove: Optional[str] = None,
+        notify: bool = False,
+    ):
+        """
+        スレッド内のメッセージのリアクションを更新（メッセージは取得しない）
+
+        Args:
+            thread_id: Discord thread ID
+            message_ids: 対象のメッセージID
+            add: 付けるリアクション
+            remove: 外すリアクション（Bot自身のもの）
+            notify: 処理しなかった旨をスレッドに通知する（1分に1回まで）
+        """
+        thread = self.get_channel(thread_id)
+        if thread is None:
+            return  # 起動直後（キャッシュ未構築）やスレッド削除後
+        for message_id in message_ids:
+            partial = thread.get_partial_message(message_id)
+            try:
+                if remove:
+                    await partial.remove_reaction(remove, self.user)
+                if add:
+                    await partial.add_reaction(add)
+            except discord.HTTPException:
+                pass
+        if not notify:
+            return
+
+        now = time.monotonic()
+        for notified_id, notified_at in list(self._shed_notices.items()):
+            if now - notified_at >= SHED_NOTICE_INTERVAL:
+                del self._shed_notices[notified_id]
+        if thread_id in self._shed_notices:
+            return
+        self._shed_notices[thread_id] = now
+        try:
+            await thread.send(
+                "⚠️ 処理待ちのメッセージが上限に達したため、🚫 を付けたメッセージは"
+                "処理されません。少し待ってから送り直してください。"
+            )
+        except discord.HTTPException as e:
+            logger.warning(f"Failed to send overflow notice: {e}")
+
     async def handle_thread_message(self, message: discord.Message):
         """
-        スレッド内のメッセージを処理（キューから取り出された後）
+        スレッド内のメッセージを1件処理（キューを通さない場合）
 
         Args:
             message: スレッド内のユーザーメッセージ
         """
-        thread = message.channel
+        queued_msg = QueuedMessage(
+            message_id=message.id,
+            user_id=message.author.id,
+            content=message.content,
+            has_attachments=bool(message.attachments),
+            author_name=message.author.display_name,
+            attachments=self._snapshot_attachments(message),
+        )
+        await self.handle_thread_messages(message.channel, [queued_msg])
+
+    async def handle_thread_messages(
+        self, thread: discord.Thread, messages: list[QueuedMessage]
+    ):
+        """
+        同じユーザーの連続メッセージを1回のAgent実行として処理
+
+        本文は改行でつなぎ、添付ファイルはまとめて保存する。
+        キュー登録時のスナップショットを使うため Discord への問い合わせは行わない
+
+        Args:
+            thread: Discord thread
+            messages: キューから取り出したメッセージ（古い順、同じユーザー）
+        """
+        user_id = messages[0].user_id
 
         # レート制限チェック
-        allowed, error_msg = await self.rate_limiter.check_rate_limit(message.author.id)
+        allowed, error_msg = await self.rate_limiter.check_rate_limit(user_id)
         if not allowed:
             await thread.send(f"⚠️ {error_msg}")
             return
 
-        # セッションの存在確認と更新
-        session = self.session_store.get_thread_session(thread.id)
+        # セッションの存在確認（キャッシュ優先、DBアクセスなし）
+        session = await self.session_store.get_thread_info(thread.id)
         if not session:
             logger.warning(f"セッションが見つかりません: thread_id={thread.id}")
             await thread.send(
@@ -886,42 +1618,120 @@ class DiscordAIBot(commands.Bot):
             )
             return
 
-        # 添付ファイルの処理
-        content = message.content
-        if message.attachments:
+        # 添付ファイルの処理（まとめた全メッセージ分）
+        content = "\n".join(m.content for m in messages if m.content)
+        attachments = [a for m in messages for a in m.attachments]
+        if attachments:
             try:
                 await file_manager.download_attachments(
-                    message.attachments,
+                    attachments,
                     agent_config.workspace,
                     max_file_size=1024 * 1024,  # 1MB
                 )
-                content += f"\n\n（{len(message.attachments)}個のファイルをworkspace/に保存しました）"
+                content += f"\n\n（{len(attachments)}個のファイルをworkspace/に保存しました）"
             except (OSError, aiohttp.ClientError) as e:
                 logger.error(f"ファイルダウンロードエラー: {e}")
                 await thread.send(f"⚠️ ファイルのダウンロードに失敗しました: {e}")
                 return
 
-        # Agent処理
-        await self.process_in_thread(thread, content, message.author.id)
+        # Agent処理（まとめたメッセージのどれかが削除されたら中断）
+        await self.process_in_thread(
+            thread, content, user_id, trigger_ids=[m.message_id for m in messages]
+        )
 
     async def process_in_thread(
-        self, thread: discord.Thread, user_prompt: str, user_id: int
+        self,
+        thread: discord.Thread,
+        user_prompt: str,
+        user_id: int,
+        trigger_ids: Sequence[int] = (),
+    ):
+        """
+        実行枠を確保してからスレッド内でAgentを実行
+
+        同時実行数・ギルド/ユーザー単位の上限に達している間は順番待ちとなり、
+        待ち順をスレッドに表示する（開始時に削除）。
+        順番待ち・実行中とも /cancel またはトリガーメッセージの削除で中断できる
+
+        Args:
+            thread: Discord thread
+            user_prompt: ユーザーのプロンプト
+            user_id: ユーザーID
+            trigger_ids: 処理するメッセージのID（削除されたら中断）
+        """
+        wait_msg = None
+        started = False
+
+        async def show_position(position: int):
+            nonlocal wait_msg
+            text = f"⏳ 実行待ち: {position}番目（前の処理が終わり次第開始します）"
+            try:
+                if wait_msg is None:
+                    wait_msg = await thread.send(text)
+                else:
+                    await wait_msg.edit(content=text)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to show queue position: {e}")
+
+        guild_id = thread.guild.id if thread.guild else None
+
+        async def run_turn(turn: RunningTurn):
+            nonlocal started
+            try:
+                async with self.scheduler.slot(
+                    user_id, guild_id, on_position=show_position
+                ):
+                    started = True
+                    if wait_msg is not None:
+                        try:
+                            await wait_msg.delete()
+                        except discord.HTTPException:
+                            pass
+                    await self._run_agent_in_thread(thread, user_prompt, user_id, turn)
+            except SchedulerFull:
+                # 順番待ちが上限（scheduler.max_waiting）に達している
+                await thread.send(
+                    "⚠️ 混雑しているため処理できませんでした。しばらくしてから送り直してください。"
+                )
+
+        turn = await self.turns.run(thread.id, user_id, trigger_ids, run_turn)
+        if turn.cancelled and not started:
+            # 順番待ちの間に中断された（実行中の中断は _run_agent_in_thread で表示）
+            text = f"🛑 実行を取り消しました（{turn.cancel_reason}）"
+            try:
+                if wait_msg is not None:
+                    await wait_msg.edit(content=text)
+                else:
+                    await thread.send(text)
+            except discord.HTTPException:
+                pass
+
+    async def _run_agent_in_thread(
+        self,
+        thread: discord.Thread,
+        user_prompt: str,
+        user_id: int,
+        turn: Optional[RunningTurn] = None,
     ):
         """
         スレッド内でAgentを実行し、思考プロセスを可視化
 
+        中断（タスクのキャンセル）された場合は、それまでの応答テキストと
+        セッションIDを記録してから CancelledError を送出し直す
+
         Args:
             thread: Discord thread
             user_prompt: ユーザーのプロンプト
             user_id: ユーザーID
+            turn: TurnRegistry に登録した実行（CLIプロセスの識別・中断理由の表示に使用）
         """
         # ユーザーメッセージをDBに保存
-        self.session_store.add_message(
+        await self.session_store.add_message(
             thread_id=thread.id, role="user", content=user_prompt
         )
 
-        # 既存のセッションを取得
-        session = self.session_store.get_thread_session(thread.id)
+        # 既存のセッションを取得（キャッシュ優先）
+        session = await self.session_store.get_thread_info(thread.id)
         if not session:
             logger.error(f"Session not found for thread {thread.id}")
             await thread.send("⚠️ セッション情報が見つかりません")
@@ -965,6 +1775,13 @@ class DiscordAIBot(commands.Bot):
             )
         print(f"{Colors.HEADER}{'=' * 80}{Colors.ENDC}\n", flush=True)
 
+        # 結果待ちのツール呼び出し: tool_use_id -> (ツール名, パラメータ, 開始時刻)
+        pending_tools = {}
+        # 中断時に記録する途中経過（応答テキストと開始時のセッションID）
+        partial_texts = []
+        started_session_id = None
+        stream = None
+
         try:
             async with thread.typing():
                 result_text = ""
@@ -973,14 +1790,15 @@ class DiscordAIBot(commands.Bot):
                 current_tool_message = None  # ツールメッセージのIDを保持
                 seen_thinking = set()  # 表示済みの思考を追跡（重複防止）
 
-                # Agent SDK実行
-                async for agent_message in query(
+                # Agent SDK実行（中断時にすぐ閉じられるようストリームを保持）
+                stream = query(
                     prompt=user_prompt,
                     options=ClaudeAgentOptions(
                         cli_path=str(self.claude_cli_path),
                         permission_mode="bypassPermissions",  # 全ツールを自動承認
                         max_turns=20,
-                        env=self.env_vars,
+                        # 中断時にプロセスツリーごと終了できるよう実行ごとの印を付ける
+                        env={**self.env_vars, **(turn.env if turn else {})},
                         cwd=str(agent_config.workspace),
                         system_prompt=agent_config.system_prompt,
                         resume=sdk_session_id,  # セッションを継続
@@ -996,13 +1814,21 @@ class DiscordAIBot(commands.Bot):
                         ],
                         setting_sources=["project"],  # .mcp.json を読み込む
                     ),
-                ):
+                )
+                async for agent_message in stream:
                     # ターミナルにログ表示
                     self._log_agent_message(agent_message)
 
                     # Discord表示用にメッセージを解析
                     msg_type = type(agent_message).__name__
 
+                    # SystemMessage(init) - セッションID（中断時の記録用）
+                    if msg_type == "SystemMessage" and (
+                        getattr(agent_message, "subtype", None) == "init"
+                    ):
+                        data = getattr(agent_message, "data", None) or {}
+                        started_session_id = data.get("session_id")
+
                     # AssistantMessage - 思考とツール使用を含む
                     if msg_type == "AssistantMessage" and hasattr(
                         agent_message, "content"
@@ -1018,6 +1844,9 @@ class DiscordAIBot(commands.Bot):
                             for item in content:
                                 item_type = type(item).__name__
 
+                                if item_type == "TextBlock" and getattr(item, "text", ""):
+                                    partial_texts.append(item.text)
+
                                 # ThinkingBlock - 思考プロセス（-# プレフィックス）
                                 # ツール使用がある場合のみ表示（最終結果との重複を避ける）
                                 if item_type == "ThinkingBlock" and has_tool_use:
@@ -1089,9 +1918,11 @@ class DiscordAIBot(commands.Bot):
                                                 for k, v in key_params.items()
                                             )
 
-                                        # DBログ用に完全なパラメータを保存
+                                        # DBログ用に完全なパラメータを保存（コンパクトなJSON）
                                         params_str = json.dumps(
-                                            tool_input, indent=2, ensure_ascii=False
+                                            tool_input,
+                                            ensure_ascii=False,
+                                            separators=(",", ":"),
                                         )
                                     else:
                                         params_str = str(tool_input)[:500]
@@ -1104,13 +1935,11 @@ class DiscordAIBot(commands.Bot):
                                         content=f"⚙️ 実行中: {tool_name}..."
                                     )
 
-                                    # DBにツールログ保存
-                                    self.session_store.log_tool_use(
-                                        thread_id=thread.id,
-                                        tool_name=tool_name,
-                                        tool_params=params_str
-                                        if "params_str" in locals()
-                                        else "",
+                                    # ツールログは結果が届いた時点で所要時間付きでDBに保存
+                                    pending_tools[getattr(item, "id", None)] = (
+                                        tool_name,
+                                        params_str,
+                                        datetime.utcnow(),
                                     )
 
                     # UserMessage - ツール結果を含む
@@ -1126,6 +1955,22 @@ class DiscordAIBot(commands.Bot):
                                     is_error = getattr(item, "is_error", False)
                                     result_str = str(tool_result)
 
+                                    # 対応する ToolUseBlock と組にしてDBにツールログ保存
+                                    tool_use_id = getattr(item, "tool_use_id", None)
+                                    pending = pending_tools.pop(tool_use_id, None)
+                                    if pending:
+                                        tool_name, params_str, started_at = pending
+                                        await self.session_store.log_tool_use(
+                                            thread_id=thread.id,
+                                            tool_name=tool_name,
+                                            tool_params=params_str,
+                                            tool_result=result_str,
+                                            tool_use_id=tool_use_id,
+                                            started_at=started_at,
+                                            finished_at=datetime.utcnow(),
+                                            is_error=bool(is_error),
+                                        )
+
                                     # ツールメッセージを編集して結果を表示
                                     if current_tool_message:
                                         if is_error:
@@ -1173,7 +2018,9 @@ class DiscordAIBot(commands.Bot):
 
                 # セッションIDをDBに保存
                 if new_session_id:
-                    self.session_store.update_sdk_session_id(thread.id, new_session_id)
+                    await self.session_store.update_sdk_session_id(
+                        thread.id, new_session_id
+                    )
 
                 # ステータスメッセージを削除
                 await status_msg.delete()
@@ -1183,7 +2030,7 @@ class DiscordAIBot(commands.Bot):
                     await self.send_response_to_thread(thread, result_text)
 
                     # DBに保存
-                    self.session_store.add_message(
+                    await self.session_store.add_message(
                         thread_id=thread.id, role="assistant", content=result_text
                     )
                 else:
@@ -1201,6 +2048,17 @@ class DiscordAIBot(commands.Bot):
                 )
                 print(f"{Colors.HEADER}{'=' * 80}{Colors.ENDC}\n", flush=True)
 
+        except asyncio.CancelledError:
+            # /cancel・トリガーメッセージの削除などで中断された
+            reason = turn.cancel_reason if turn and turn.cancelled else "キャンセル"
+            logger.info(f"Agent実行を中断: thread={thread.id}, reason={reason}")
+            await self._record_interrupted_turn(
+                thread, status_msg, reason, partial_texts, started_session_id
+            )
+            print(f"\n{Colors.YELLOW}🛑 Agent実行を中断:{Colors.ENDC} {reason}", flush=True)
+            print(f"{Colors.HEADER}{'=' * 80}{Colors.ENDC}\n", flush=True)
+            raise
+
         except Exception as e:
             logger.error(f"Agent実行エラー: {e}", exc_info=True)
             await status_msg.edit(content=f"❌ エラーが発生しました: {e}")
@@ -1209,6 +2067,64 @@ class DiscordAIBot(commands.Bot):
             print(f"\n{Colors.RED}❌ Agent実行エラー:{Colors.ENDC} {e}", flush=True)
             print(f"{Colors.HEADER}{'=' * 80}{Colors.ENDC}\n", flush=True)
 
+        finally:
+            # SDKのストリームを閉じて Claude CLI を終了させる（完了時は何もしない）
+            if stream is not None:
+                try:
+                    await stream.aclose()
+                except Exception as e:
+                    logger.warning(f"Failed to close agent stream: {e}")
+
+            # 結果が届かなかったツール呼び出しも記録（所要時間なし）
+            for tool_use_id, (tool_name, params_str, started_at) in pending_tools.items():
+                try:
+                    await self.session_store.log_tool_use(
+                        thread_id=thread.id,
+                        tool_name=tool_name,
+                        tool_params=params_str,
+                        tool_use_id=tool_use_id,
+                        started_at=started_at,
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to log unfinished tool {tool_name}: {e}")
+
+    async def _record_interrupted_turn(
+        self,
+        thread: discord.Thread,
+        status_msg: discord.Message,
+        reason: str,
+        partial_texts: list[str],
+        session_id: Optional[str],
+    ):
+        """
+        中断されたAgent実行の途中経過を記録
+
+        それまでの応答テキストを履歴に残し、セッションIDを保存して
+        次のメッセージで会話を続けられるようにする（失敗しても中断処理は続ける）
+
+        Args:
+            thread: Discord thread
+            status_msg: 処理中ステータスメッセージ
+            reason: 中断理由
+            partial_texts: 中断までに届いた応答テキスト
+            session_id: 開始時に通知されたセッションID
+        """
+        try:
+            await status_msg.edit(content=f"🛑 中断しました（{reason}）")
+        except discord.HTTPException:
+            pass
+        try:
+            if partial_texts:
+                await self.session_store.add_message(
+                    thread_id=thread.id,
+                    role="assistant",
+                    content="\n\n".join(partial_texts) + f"\n\n（{reason}により中断）",
+                )
+            if session_id:
+                await self.session_store.update_sdk_session_id(thread.id, session_id)
+        except Exception as e:
+            logger.warning(f"Failed to record interrupted turn: {e}")
+
     async def send_response_to_thread(self, thread: discord.Thread, response: str):
         """
         スレッドに応答を送信（2000文字制限対応）
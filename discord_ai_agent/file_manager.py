@@ -4,15 +4,17 @@ import aiohttp
 import asyncio
 import discord
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 import logging
 
+from .message_queue import AttachmentSnapshot
+
 
 logger = logging.getLogger(__name__)
 
 
 async def download_attachments(
-    attachments: List[discord.Attachment],
+    attachments: List[Union[discord.Attachment, AttachmentSnapshot]],
     workspace: Path,
     max_file_size: int = 10 * 1024 * 1024,  # 10MB
     timeout: int = 30,
@@ -21,7 +23,7 @@ async def download_attachments(
     Discordの添付ファイルをワークスペースにダウンロード
 
     Args:
-        attachments: Discord Attachmentオブジェクトのリスト
+        attachments: Discord Attachment（またはキューのスナップショット）のリスト
         workspace: ダウンロード先のワークスペースディレクトリ
         max_file_size: 最大ファイルサイズ（バイト）
         timeout: ダウンロードタイムアウト（秒）
@@ -82,7 +84,7 @@ async def download_attachments(
 
 async def _download_attachment(
     session: aiohttp.ClientSession,
-    attachment: discord.Attachment,
+    attachment: Union[discord.Attachment, AttachmentSnapshot],
     workspace: Path,
     max_file_size: int,
     timeout: int,
@@ -92,7 +94,7 @@ async def _download_attachment(
 
     Args:
         session: aiohttpセッション
-        attachment: Discord Attachmentオブジェクト
+        attachment: Discord Attachment（またはキューのスナップショット）
         workspace: ダウンロード先ディレクトリ
         max_file_size: 最大ファイルサイズ
         timeout: タイムアウト（秒）
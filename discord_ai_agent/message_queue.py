@@ -2,22 +2,109 @@
 
 import asyncio
 import logging
-from dataclasses import dataclass
-from typing import Dict, Optional
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
 from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# What add_message does when a depth limit is reached
+OVERFLOW_POLICIES = ("reject_newest", "drop_oldest", "coalesce")
 
-@dataclass
+
+@dataclass(frozen=True)
+class QueueSettings:
+    """Settings for ThreadMessageQueue (``queue`` section of config.yaml)"""
+
+    idle_ttl: float = 300.0  # Seconds an empty, idle thread's state is kept
+    coalesce: bool = False  # Merge a user's consecutive pending messages into one turn
+    coalesce_window: float = 1.5  # Debounce: wait until the thread is quiet this long
+    coalesce_max_wait: float = 10.0  # Longest debounce after the oldest pending enqueue
+    coalesce_max: int = 10  # Most messages merged into one turn
+    durable: bool = False  # Journal queued messages in the session DB (see bot)
+    max_thread_depth: int = 0  # Pending messages per thread (0 = no limit)
+    max_total_depth: int = 0  # Pending messages across all threads (0 = no limit)
+    overflow: str = "reject_newest"  # One of OVERFLOW_POLICIES
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "QueueSettings":
+        """
+        Build settings from the ``queue`` section of config.yaml
+
+        Raises:
+            ValueError: If an unknown key is present or a limit/policy is invalid
+        """
+        config = dict(config or {})
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown queue settings: {sorted(unknown)}")
+        settings = cls(**config)
+        if settings.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"queue.overflow must be one of {OVERFLOW_POLICIES}: {settings.overflow!r}"
+            )
+        if settings.max_thread_depth < 0 or settings.max_total_depth < 0:
+            raise ValueError("queue.max_thread_depth / max_total_depth must not be negative")
+        if settings.coalesce_max_wait < 0:
+            raise ValueError("queue.coalesce_max_wait must not be negative")
+        return settings
+
+
+@dataclass(frozen=True, slots=True)
+class AttachmentSnapshot:
+    """What the bot needs of a discord.Attachment to download it later"""
+
+    filename: str
+    url: str
+    size: int
+    content_type: Optional[str] = None
+
+
+@dataclass(slots=True)
 class QueuedMessage:
-    """Queued message with metadata"""
+    """
+    Queued message with a snapshot of what handling it needs
+
+    Content, author and attachments are captured in on_message, so the
+    message does not have to be fetched again when it is dequeued.
+    """
 
     message_id: int
     user_id: int
     content: str
     has_attachments: bool
     deleted: bool = False
+    author_name: str = ""
+    attachments: Tuple[AttachmentSnapshot, ...] = ()
+    queued_at: float = 0.0  # time.monotonic() of the enqueue
+
+
+@dataclass(frozen=True, slots=True)
+class EnqueueResult:
+    """Outcome of ThreadMessageQueue.add_message"""
+
+    accepted: bool  # False: rejected by a depth limit (reject_newest) or a duplicate
+    position: int  # 0-indexed among pending messages (-1 if rejected)
+    shed: Optional[QueuedMessage] = None  # Oldest message dropped to make room
+    shed_thread_id: Optional[int] = None  # Thread the dropped message was in
+    merged_into: Optional[int] = None  # Message the new one was coalesced into
+    duplicate: bool = False  # The message_id was already pending (nothing changed)
+
+
+class _ThreadState:
+    """Per-thread queue, message index, lock and processing flag"""
+
+    __slots__ = ("queue", "index", "pending", "lock", "processing", "last_added")
+
+    def __init__(self):
+        self.queue: deque = deque()  # QueuedMessage in arrival order (incl. deleted)
+        self.index: Dict[int, QueuedMessage] = {}  # message_id -> pending entry
+        self.pending = 0  # Entries in queue that are not deleted
+        self.lock: Optional[asyncio.Lock] = None  # Created on first get_lock
+        self.processing = False
+        self.last_added = 0.0  # time.monotonic() of the newest enqueue
 
 
 class ThreadMessageQueue:
@@ -29,13 +116,84 @@ class ThreadMessageQueue:
     - Process messages sequentially
     - Handle deleted messages before processing
     - Thread-safe with asyncio locks
+    - O(1) delete marking, queue size and stats (message_id index and
+      live counters)
+    - Per-thread state is evicted once a thread has been empty and idle for
+      idle_ttl seconds, so memory does not grow with every thread ever seen
+    - Optional burst coalescing: get_next_batch merges a user's consecutive
+      pending messages into one agent turn
+    - Optional per-thread and global depth limits; a full queue rejects the
+      new message, drops the oldest pending one or merges the new message
+      into the same user's last pending one (overflow policy)
     """
 
-    def __init__(self):
-        """Initialize the message queue system"""
-        self._queues: Dict[int, deque] = {}  # thread_id -> deque of QueuedMessage
-        self._locks: Dict[int, asyncio.Lock] = {}  # thread_id -> processing lock
-        self._processing: Dict[int, bool] = {}  # thread_id -> is_processing flag
+    def __init__(self, settings: Optional[QueueSettings] = None):
+        """
+        Initialize the message queue system
+
+        Args:
+            settings: Eviction and coalescing settings (default: QueueSettings())
+        """
+        self.settings = settings or QueueSettings()
+        self.idle_ttl = self.settings.idle_ttl
+        self._threads: Dict[int, _ThreadState] = {}
+        # Empty, idle threads in the order they went idle -> monotonic time
+        # (dicts keep insertion order, so the oldest is always first)
+        self._idle: Dict[int, float] = {}
+        self._pending_total = 0
+        self._processing_total = 0
+        # Pending messages across all threads in arrival order, for dropping
+        # the globally oldest one: (thread_id, message_id) -> None
+        self._order: Dict[Tuple[int, int], None] = {}
+        # Load-shedding counters (since start)
+        self._rejected_total = 0
+        self._shed_total = 0
+        self._coalesced_total = 0
+
+    def _state(self, thread_id: int) -> _ThreadState:
+        """Get (or create) a thread's state and mark it as in use"""
+        state = self._threads.get(thread_id)
+        if state is None:
+            state = self._threads[thread_id] = _ThreadState()
+        else:
+            self._idle.pop(thread_id, None)
+        return state
+
+    def _mark_idle_if_empty(self, thread_id: int, state: _ThreadState) -> None:
+        if not state.pending and not state.processing:
+            self._idle.pop(thread_id, None)
+            self._idle[thread_id] = time.monotonic()
+
+    def evict_idle(self) -> int:
+        """
+        Drop the state of threads that have been empty and idle for idle_ttl
+
+        Amortized O(1): only expired entries at the front of the idle list
+        are visited. Called on every enqueue.
+
+        Returns:
+            Number of threads evicted
+        """
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        while self._idle:
+            thread_id, idle_since = next(iter(self._idle.items()))
+            if idle_since > cutoff:
+                break
+            del self._idle[thread_id]
+            state = self._threads.get(thread_id)
+            if state is None or state.pending or state.processing:
+                continue
+            if state.lock and state.lock.locked():
+                # Still held by a worker: check again after another idle_ttl
+                # (re-added at the back, so the list stays in time order)
+                self._idle[thread_id] = time.monotonic()
+                continue
+            del self._threads[thread_id]
+            evicted += 1
+        if evicted:
+            logger.debug(f"Evicted {evicted} idle thread queues")
+        return evicted
 
     def add_message(
         self,
@@ -44,7 +202,9 @@ class ThreadMessageQueue:
         user_id: int,
         content: str,
         has_attachments: bool = False,
-    ) -> int:
+        author_name: str = "",
+        attachments: Tuple[AttachmentSnapshot, ...] = (),
+    ) -> EnqueueResult:
         """
         Add a message to the thread queue
 
@@ -54,31 +214,136 @@ class ThreadMessageQueue:
             user_id: User ID
             content: Message content
             has_attachments: Whether message has attachments
+            author_name: Author's display name
+            attachments: Attachment metadata (implies has_attachments)
 
         Returns:
-            Queue position (0-indexed)
+            EnqueueResult with the queue position (0-indexed, counting pending
+            messages only) and what the overflow policy did, if a limit was hit.
+            A message_id that is already pending is not queued again
+            (accepted=False, duplicate=True).
         """
-        if thread_id not in self._queues:
-            self._queues[thread_id] = deque()
-            self._locks[thread_id] = asyncio.Lock()
-            self._processing[thread_id] = False
+        self.evict_idle()
+        state = self._state(thread_id)
+
+        if message_id in state.index:
+            logger.info(
+                f"Message already queued, skipped: thread={thread_id}, msg={message_id}"
+            )
+            return EnqueueResult(accepted=False, position=-1, duplicate=True)
+
+        settings = self.settings
+        shed = None
+        shed_thread_id = None
+        thread_full = settings.max_thread_depth and (
+            state.pending >= settings.max_thread_depth
+        )
+        if thread_full or (
+            settings.max_total_depth and self._pending_total >= settings.max_total_depth
+        ):
+            policy = settings.overflow
+            if policy == "coalesce":
+                target = self._last_pending(state)
+                if target is not None and target.user_id == user_id:
+                    self._merge(target, content, attachments)
+                    self._coalesced_total += 1
+                    logger.info(
+                        f"Queue full, message coalesced: thread={thread_id}, "
+                        f"msg={message_id} -> {target.message_id}"
+                    )
+                    return EnqueueResult(
+                        accepted=True,
+                        position=state.pending - 1,
+                        merged_into=target.message_id,
+                    )
+            elif policy == "drop_oldest":
+                # Drop from this thread when it is the one that is full,
+                # otherwise the globally oldest pending message
+                shed_thread_id = (
+                    thread_id if thread_full else next(iter(self._order))[0]
+                )
+                shed = self._drop_oldest(shed_thread_id)
+
+            if shed is None:
+                # reject_newest (also the fallback when nothing can be merged)
+                self._rejected_total += 1
+                logger.warning(
+                    f"Queue full, message rejected: thread={thread_id}, msg={message_id}, "
+                    f"thread_depth={state.pending}, total_depth={self._pending_total}"
+                )
+                self._mark_idle_if_empty(thread_id, state)
+                return EnqueueResult(accepted=False, position=-1)
+
+            self._shed_total += 1
+            logger.warning(
+                f"Queue full, oldest message dropped: thread={shed_thread_id}, "
+                f"msg={shed.message_id} (for msg={message_id} in thread={thread_id})"
+            )
 
         queued_msg = QueuedMessage(
             message_id=message_id,
             user_id=user_id,
             content=content,
-            has_attachments=has_attachments,
+            has_attachments=has_attachments or bool(attachments),
+            author_name=author_name,
+            attachments=tuple(attachments),
+            queued_at=time.monotonic(),
         )
 
-        self._queues[thread_id].append(queued_msg)
-        queue_position = len(self._queues[thread_id]) - 1
+        state.queue.append(queued_msg)
+        state.index[message_id] = queued_msg
+        state.pending += 1
+        state.last_added = queued_msg.queued_at
+        self._pending_total += 1
+        self._order[(thread_id, message_id)] = None
+        queue_position = state.pending - 1
 
         logger.info(
             f"Message queued: thread={thread_id}, msg={message_id}, "
-            f"position={queue_position}, queue_size={len(self._queues[thread_id])}"
+            f"position={queue_position}, queue_size={state.pending}"
         )
 
-        return queue_position
+        return EnqueueResult(
+            accepted=True,
+            position=queue_position,
+            shed=shed,
+            shed_thread_id=shed_thread_id,
+        )
+
+    @staticmethod
+    def _last_pending(state: _ThreadState) -> Optional[QueuedMessage]:
+        """Newest non-deleted message of a thread"""
+        for msg in reversed(state.queue):
+            if not msg.deleted:
+                return msg
+        return None
+
+    @staticmethod
+    def _merge(
+        target: QueuedMessage, content: str, attachments: Tuple[AttachmentSnapshot, ...]
+    ) -> None:
+        """Append a message's content and attachments to a pending one"""
+        if content:
+            target.content = f"{target.content}\n{content}" if target.content else content
+        if attachments:
+            target.attachments += tuple(attachments)
+            target.has_attachments = True
+
+    def _drop_oldest(self, thread_id: int) -> Optional[QueuedMessage]:
+        """Remove and return a thread's oldest pending message"""
+        state = self._threads.get(thread_id)
+        if state is None:
+            return None
+        while state.queue:
+            msg = state.queue.popleft()
+            if not msg.deleted:
+                del state.index[msg.message_id]
+                state.pending -= 1
+                self._pending_total -= 1
+                del self._order[(thread_id, msg.message_id)]
+                self._mark_idle_if_empty(thread_id, state)
+                return msg
+        return None
 
     def mark_deleted(self, thread_id: int, message_id: int) -> bool:
         """
@@ -91,18 +356,42 @@ class ThreadMessageQueue:
         Returns:
             True if message was found and marked, False otherwise
         """
-        if thread_id not in self._queues:
+        state = self._threads.get(thread_id)
+        if state is None:
             return False
 
-        for msg in self._queues[thread_id]:
-            if msg.message_id == message_id:
-                msg.deleted = True
-                logger.info(
-                    f"Message marked as deleted: thread={thread_id}, msg={message_id}"
-                )
-                return True
+        msg = state.index.pop(message_id, None)
+        if msg is None:
+            return False
+
+        # The entry stays in the deque and is skipped when it reaches the front
+        msg.deleted = True
+        state.pending -= 1
+        self._pending_total -= 1
+        del self._order[(thread_id, message_id)]
+        self._mark_idle_if_empty(thread_id, state)
+        logger.info(f"Message marked as deleted: thread={thread_id}, msg={message_id}")
+        return True
+
+    def update_content(self, thread_id: int, message_id: int, content: str) -> bool:
+        """
+        Replace the content of a pending message (after an edit)
+
+        Args:
+            thread_id: Discord thread ID
+            message_id: Discord message ID
+            content: New message content
 
-        return False
+        Returns:
+            True if the message is pending in the queue, False otherwise
+        """
+        state = self._threads.get(thread_id)
+        msg = state.index.get(message_id) if state is not None else None
+        if msg is None:
+            return False
+        msg.content = content
+        logger.info(f"Queued message edited: thread={thread_id}, msg={message_id}")
+        return True
 
     def get_next_message(self, thread_id: int) -> Optional[QueuedMessage]:
         """
@@ -114,15 +403,20 @@ class ThreadMessageQueue:
         Returns:
             Next QueuedMessage or None if queue is empty
         """
-        if thread_id not in self._queues:
+        state = self._threads.get(thread_id)
+        if state is None:
             return None
 
-        queue = self._queues[thread_id]
+        queue = state.queue
 
         # Skip deleted messages and remove them from queue
         while queue:
             msg = queue.popleft()
             if not msg.deleted:
+                del state.index[msg.message_id]
+                state.pending -= 1
+                self._pending_total -= 1
+                del self._order[(thread_id, msg.message_id)]
                 logger.info(
                     f"Dequeued message: thread={thread_id}, msg={msg.message_id}"
                 )
@@ -132,8 +426,67 @@ class ThreadMessageQueue:
                     f"Skipped deleted message: thread={thread_id}, msg={msg.message_id}"
                 )
 
+        self._mark_idle_if_empty(thread_id, state)
         return None
 
+    async def get_next_batch(self, thread_id: int) -> List[QueuedMessage]:
+        """
+        Get the next message, merged with the same user's burst if coalescing
+
+        Without coalescing this is get_next_message as a list. With it, the
+        call first waits until no message has been queued in the thread for
+        coalesce_window seconds (debounce), but no longer than until
+        coalesce_max_wait seconds after the oldest pending message was queued,
+        so a steady stream of messages cannot hold the thread back forever.
+        It then takes the next message plus
+        the consecutive pending messages from the same user (up to
+        coalesce_max). Another user's message ends the batch, so replies are
+        never reordered.
+
+        Args:
+            thread_id: Discord thread ID
+
+        Returns:
+            Messages to handle as one turn (empty if the queue is empty)
+        """
+        settings = self.settings
+        if not settings.coalesce:
+            msg = self.get_next_message(thread_id)
+            return [msg] if msg is not None else []
+
+        state = self._threads.get(thread_id)
+        while state is not None and state.pending:
+            oldest = next(msg for msg in state.queue if not msg.deleted)
+            wait = min(
+                state.last_added + settings.coalesce_window,
+                oldest.queued_at + settings.coalesce_max_wait,
+            ) - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            state = self._threads.get(thread_id)
+
+        first = self.get_next_message(thread_id)
+        if first is None:
+            return []
+        batch = [first]
+        queue = self._threads[thread_id].queue
+        while queue and len(batch) < settings.coalesce_max:
+            msg = queue[0]
+            if msg.deleted:
+                queue.popleft()
+            elif msg.user_id == first.user_id:
+                batch.append(self.get_next_message(thread_id))
+            else:
+                break
+
+        if len(batch) > 1:
+            logger.info(
+                f"Coalesced {len(batch)} messages: thread={thread_id}, "
+                f"msgs={[m.message_id for m in batch]}"
+            )
+        return batch
+
     def get_queue_size(self, thread_id: int) -> int:
         """
         Get the number of pending messages in the queue
@@ -144,10 +497,36 @@ class ThreadMessageQueue:
         Returns:
             Number of pending messages (excluding deleted)
         """
-        if thread_id not in self._queues:
-            return 0
+        state = self._threads.get(thread_id)
+        return state.pending if state is not None else 0
+
+    def get_message(self, thread_id: int, message_id: int) -> Optional[QueuedMessage]:
+        """
+        Get a pending message (e.g. the one another message was merged into)
 
-        return sum(1 for msg in self._queues[thread_id] if not msg.deleted)
+        Args:
+            thread_id: Discord thread ID
+            message_id: Discord message ID
+
+        Returns:
+            The QueuedMessage, or None if it is not pending
+        """
+        state = self._threads.get(thread_id)
+        return state.index.get(message_id) if state is not None else None
+
+    def contains(self, thread_id: int, message_id: int) -> bool:
+        """
+        Check if a message is pending in a thread's queue
+
+        Args:
+            thread_id: Discord thread ID
+            message_id: Discord message ID
+
+        Returns:
+            True if the message is queued and not yet taken or deleted
+        """
+        state = self._threads.get(thread_id)
+        return state is not None and message_id in state.index
 
     def is_processing(self, thread_id: int) -> bool:
         """
@@ -159,7 +538,8 @@ class ThreadMessageQueue:
         Returns:
             True if processing, False otherwise
         """
-        return self._processing.get(thread_id, False)
+        state = self._threads.get(thread_id)
+        return state.processing if state is not None else False
 
     def get_lock(self, thread_id: int) -> asyncio.Lock:
         """
@@ -171,9 +551,10 @@ class ThreadMessageQueue:
         Returns:
             asyncio.Lock for the thread
         """
-        if thread_id not in self._locks:
-            self._locks[thread_id] = asyncio.Lock()
-        return self._locks[thread_id]
+        state = self._state(thread_id)
+        if state.lock is None:
+            state.lock = asyncio.Lock()
+        return state.lock
 
     def set_processing(self, thread_id: int, is_processing: bool):
         """
@@ -183,7 +564,11 @@ class ThreadMessageQueue:
             thread_id: Discord thread ID
             is_processing: Processing state
         """
-        self._processing[thread_id] = is_processing
+        state = self._state(thread_id)
+        if state.processing != is_processing:
+            self._processing_total += 1 if is_processing else -1
+        state.processing = is_processing
+        self._mark_idle_if_empty(thread_id, state)
         logger.debug(f"Thread {thread_id} processing state: {is_processing}")
 
     def clear_thread_queue(self, thread_id: int):
@@ -193,26 +578,33 @@ class ThreadMessageQueue:
         Args:
             thread_id: Discord thread ID
         """
-        if thread_id in self._queues:
-            size = len(self._queues[thread_id])
-            self._queues[thread_id].clear()
+        state = self._threads.get(thread_id)
+        if state is not None:
+            size = state.pending
+            for message_id in state.index:
+                del self._order[(thread_id, message_id)]
+            state.queue.clear()
+            state.index.clear()
+            state.pending = 0
+            self._pending_total -= size
+            self._mark_idle_if_empty(thread_id, state)
             logger.info(
                 f"Cleared queue for thread {thread_id}: {size} messages removed"
             )
 
     def get_stats(self) -> Dict[str, int]:
         """
-        Get queue statistics
+        Get queue statistics (O(1), from live counters)
 
         Returns:
             Dictionary with statistics
         """
-        total_threads = len(self._queues)
-        total_messages = sum(len(q) for q in self._queues.values())
-        processing_threads = sum(1 for p in self._processing.values() if p)
-
         return {
-            "total_threads": total_threads,
-            "total_queued_messages": total_messages,
-            "processing_threads": processing_threads,
+            "total_threads": len(self._threads),
+            "total_queued_messages": self._pending_total,
+            "processing_threads": self._processing_total,
+            "idle_threads": len(self._idle),
+            "rejected_messages": self._rejected_total,
+            "shed_messages": self._shed_total,
+            "coalesced_messages": self._coalesced_total,
         }
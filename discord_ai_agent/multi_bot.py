@@ -16,7 +16,9 @@ import discord
 from dotenv import load_dotenv
 
 from discord_ai_agent.agent_loader import load_agent_config
+from discord_ai_agent.app_config import load_config_section
 from discord_ai_agent.discord_bot import DiscordAIBot
+from discord_ai_agent.scheduler import AgentScheduler, SchedulerSettings
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +47,10 @@ class MultiBotManager:
         self.bots: List[DiscordAIBot] = []
         self.bot_configs: List[BotConfig] = []
         self.tasks: List[asyncio.Task] = []
+        # One scheduler for every bot: the concurrency limit is per process
+        self.scheduler = AgentScheduler(
+            SchedulerSettings.from_config(load_config_section("scheduler"))
+        )
 
         if not self.config_file.exists():
             raise FileNotFoundError(f"Config file not found: {config_file}")
@@ -117,7 +123,7 @@ class MultiBotManager:
             intents.messages = True
             intents.guilds = True
 
-            bot = DiscordAIBot(agent_config, intents=intents)
+            bot = DiscordAIBot(agent_config, intents=intents, scheduler=self.scheduler)
             self.bots.append(bot)
 
             # Start bot
@@ -0,0 +1,231 @@
+"""Thread ownership across several bot processes (nodes) sharing one store
+
+ThreadMessageQueue locks and processing flags only work inside one process.
+With ``leases.enabled`` every node that receives a thread message journals
+it (the journal insert is idempotent, so a message delivered to several
+nodes is journaled once) and then tries to lease the thread:
+
+- The lease holder queues the message locally and runs the thread's turns.
+  It renews its leases on every heartbeat and releases a lease once the
+  thread's queue is drained and no journal entry for it is left.
+- Any other node leaves the message in the journal; the holder picks it up
+  when its local queue drains.
+- On each heartbeat a node also scans the journal for threads nobody holds
+  (their node died, hung past the TTL or released without seeing a late
+  entry) and adopts them. Entries that were claimed by the dead node were
+  mid-turn: they are acked without being replayed, like after a restart.
+
+Acks leave tombstones in the journal for ``dedupe_window`` seconds, so a
+replica that receives a message after it was handled elsewhere (a slow
+gateway connection, a resumed session replaying events) still finds it
+journaled and drops it.
+
+Leases decide who works on a thread; claims fence each message. Before a
+turn starts, its messages are claimed one by one and only the ones this
+node claimed are handled, so a message never runs twice even if a lease is
+lost to a stalled node (the stale node finds its claims gone).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .database import QueueEntry, SessionBackend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LeaseSettings:
+    """Settings for ThreadOwnership (``leases`` section of config.yaml)"""
+
+    enabled: bool = False  # Coordinate thread queues with other nodes
+    ttl: float = 30.0  # Seconds a lease lasts without renewal
+    heartbeat: float = 5.0  # Seconds between renewals / journal scans
+    node_id: str = ""  # Unique per process (default: hostname:pid)
+    dedupe_window: float = 600.0  # Seconds handled messages stay journaled
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "LeaseSettings":
+        """
+        Build settings from the ``leases`` section of config.yaml
+
+        Raises:
+            ValueError: If an unknown key is present or the timings are invalid
+        """
+        config = dict(config or {})
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown leases settings: {sorted(unknown)}")
+        settings = cls(**config)
+        if settings.heartbeat <= 0 or settings.ttl <= settings.heartbeat:
+            raise ValueError("leases.ttl must be longer than leases.heartbeat (> 0)")
+        if settings.dedupe_window < 0:
+            raise ValueError("leases.dedupe_window must not be negative")
+        return settings
+
+
+class ThreadOwnership:
+    """
+    This node's thread leases
+
+    All methods go to the shared store; ``held`` is the local view of the
+    leases this node believes it holds (corrected on every renew()).
+    Acquire, release and renew run one at a time, so a release cannot
+    delete a lease that another task of this node has just extended.
+    """
+
+    def __init__(self, store: SessionBackend, settings: LeaseSettings):
+        """
+        Initialize ownership tracking
+
+        Args:
+            store: Session backend shared by all nodes
+            settings: Lease timings and node ID
+        """
+        self.store = store
+        self.settings = settings
+        self.node_id = settings.node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.held: Set[int] = set()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, thread_id: int) -> bool:
+        """
+        Lease a thread (or extend this node's lease)
+
+        Returns:
+            True if this node holds the thread now
+        """
+        async with self._lock:
+            if await self.store.acquire_thread_lease(
+                thread_id, self.node_id, self.settings.ttl
+            ):
+                self.held.add(thread_id)
+                return True
+            self.held.discard(thread_id)
+            return False
+
+    async def _take_over(self, thread_id: int) -> bool:
+        """Lease a thread this node does not hold yet (False if it already does)"""
+        async with self._lock:
+            if thread_id in self.held:
+                return False
+            if await self.store.acquire_thread_lease(
+                thread_id, self.node_id, self.settings.ttl
+            ):
+                self.held.add(thread_id)
+                return True
+            return False
+
+    async def release(self, thread_id: int) -> None:
+        """Give up a thread so the next message may go to any node"""
+        async with self._lock:
+            self.held.discard(thread_id)
+            await self.store.release_thread_lease(thread_id, self.node_id)
+
+    def forget(self, thread_id: int) -> None:
+        """Stop renewing a lease without releasing it; it lapses after the TTL"""
+        self.held.discard(thread_id)
+
+    async def release_all(self) -> None:
+        """Give up every lease (shutdown), so other nodes take over at once"""
+        for thread_id in list(self.held):
+            await self.release(thread_id)
+
+    async def renew(self) -> List[int]:
+        """
+        Extend every held lease by the TTL
+
+        Returns:
+            Thread IDs whose lease was lost (expired and taken by another node)
+        """
+        async with self._lock:
+            held = list(self.held)
+            renewed = set(
+                await self.store.renew_thread_leases(
+                    self.node_id, held, self.settings.ttl
+                )
+            )
+            lost = [thread_id for thread_id in held if thread_id not in renewed]
+            self.held.difference_update(lost)
+        if lost:
+            logger.warning(f"Thread leases lost to other nodes: {lost}")
+        return lost
+
+    async def claim(self, thread_id: int, message_ids: List[int]) -> List[int]:
+        """
+        Claim journaled messages one by one before their turn starts
+
+        Returns:
+            The message IDs this node claimed (others were claimed elsewhere)
+        """
+        return [
+            message_id
+            for message_id in message_ids
+            if await self.store.claim_messages(thread_id, [message_id])
+        ]
+
+    async def ack(self, thread_id: int, message_ids: List[int]) -> int:
+        """Ack journaled messages, leaving tombstones against late deliveries"""
+        return await self.store.ack_messages(thread_id, message_ids, tombstone=True)
+
+    async def prune(self) -> int:
+        """Delete tombstones older than the dedupe window"""
+        return await self.store.prune_message_queue(self.settings.dedupe_window)
+
+    async def pending(self, bot_id: int, thread_id: int) -> List[QueueEntry]:
+        """Unclaimed journal entries of one thread, in enqueue order"""
+        return await self.store.load_thread_queue(
+            bot_id, thread_id, unclaimed_only=True
+        )
+
+    async def scan(
+        self, bot_id: int
+    ) -> Tuple[Dict[int, List[QueueEntry]], Dict[int, List[int]]]:
+        """
+        Adopt journaled threads that no live node holds
+
+        Threads this node already holds are skipped; their worker picks up
+        new entries when its queue drains.
+
+        Args:
+            bot_id: Discord user ID of the bot (journal owner)
+
+        Returns:
+            (adopted, interrupted): thread ID -> unclaimed entries to queue
+            locally, and thread ID -> message IDs that were mid-turn on the
+            previous holder (already acked)
+        """
+        orphans = [
+            thread_id
+            for thread_id in await self.store.find_unleased_threads(bot_id)
+            if thread_id not in self.held
+        ]
+
+        adopted: Dict[int, List[QueueEntry]] = {}
+        interrupted: Dict[int, List[int]] = {}
+        for thread_id in orphans:
+            if not await self._take_over(thread_id):
+                continue  # A live node (possibly this one, meanwhile) is on it
+            # Reload: the query above may predate the previous holder's acks
+            entries = await self.store.load_thread_queue(bot_id, thread_id)
+            claimed = [e.message_id for e in entries if e.claimed_at is not None]
+            if claimed and await self.ack(thread_id, claimed):
+                interrupted[thread_id] = claimed
+            unclaimed = [e for e in entries if e.claimed_at is None]
+            if unclaimed:
+                adopted[thread_id] = unclaimed
+            else:
+                await self.release(thread_id)
+
+        if adopted or interrupted:
+            logger.info(
+                f"Adopted {sum(map(len, adopted.values()))} journaled messages in "
+                f"{len(adopted)} threads ({sum(map(len, interrupted.values()))} "
+                f"interrupted) as {self.node_id}"
+            )
+        return adopted, interrupted
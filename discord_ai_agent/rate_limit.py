@@ -1,24 +1,128 @@
-"""レート制限モジュール"""
+"""レート制限モジュール
 
+ユーザーごと・時間窓（1分・1時間）ごとに「スライディングウィンドウカウンタ」で数える。
+窓を固定長のバケットに区切り、現在と直前のバケットの件数だけを持つ。
+直前のバケットの件数を、現在の窓と重なっている割合で按分して足したものを
+窓内のリクエスト数の推定値とする::
+
+    推定値 = 直前の件数 × (1 - 現在のバケットの経過割合) + 現在の件数
+
+リクエストの時刻を1件ずつ保持しないため、チェックは O(1)、
+メモリはユーザーあたり窓の数 × 3 個の数値で一定になる。
+直前のバケットが空になったユーザーは cleanup() で取り除く（Botが定期実行）。
+"""
+
+import math
 import time
-from collections import defaultdict
-from typing import Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MINUTE = 60.0
+HOUR = 3600.0
+
+# 按分の浮動小数点誤差で、案内した待ち時間ちょうどのリクエストを弾かないための許容差
+_TOLERANCE = 1e-9
+
+
+class _Window:
+    """1ユーザー・1つの時間窓のカウンタ"""
+
+    __slots__ = ("bucket", "prev", "curr")
+
+    def __init__(self, bucket: int):
+        self.bucket = bucket  # 現在のバケット番号（時刻 // 窓の長さ）
+        self.prev = 0  # 直前のバケットの件数
+        self.curr = 0  # 現在のバケットの件数
+
+    def roll(self, bucket: int) -> None:
+        """現在のバケットを進める"""
+        if bucket == self.bucket:
+            return
+        self.prev = self.curr if bucket == self.bucket + 1 else 0
+        self.curr = 0
+        self.bucket = bucket
+
+
+@dataclass(frozen=True)
+class _Limit:
+    """時間窓の長さと上限"""
+
+    span: float  # 窓の長さ（秒）
+    limit: int  # 窓あたりの最大リクエスト数
+    label: str  # エラーメッセージ用（"1分間" など）
+
+    def estimate(self, window: _Window, now: float) -> float:
+        """窓内のリクエスト数の推定値（window は roll 済み）"""
+        elapsed = now / self.span - window.bucket  # 現在のバケットの経過割合
+        return window.prev * (1.0 - elapsed) + window.curr
+
+    def retry_after(self, window: _Window, now: float) -> float:
+        """あと1件受け付けられるようになるまでの秒数（window は roll 済み）"""
+        start = window.bucket * self.span
+        room = self.limit - 1 - window.curr
+        if room >= 0:
+            # 現在のバケット内で、直前のバケットの按分が十分に減るまで待つ
+            offset = self.span * (1.0 - room / window.prev)
+            return start + offset - now
+        # 次のバケットで、今回の件数の按分が十分に減るまで待つ
+        offset = self.span * (1.0 - (self.limit - 1) / window.curr)
+        return start + self.span + offset - now
 
 
 class RateLimiter:
     """リクエストのレート制限を行うクラス"""
 
-    def __init__(self, per_minute: int = 10, per_hour: int = 100):
+    def __init__(
+        self,
+        per_minute: int = 10,
+        per_hour: int = 100,
+        cleanup_interval: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         """
         初期化
 
         Args:
             per_minute: 1分間あたりの最大リクエスト数
             per_hour: 1時間あたりの最大リクエスト数
+            cleanup_interval: cleanup() を実行する間隔（秒、Botが使用。0以下で無効）
+            clock: 現在時刻（秒）を返す関数
         """
         self.per_minute = per_minute
         self.per_hour = per_hour
-        self.requests: dict[int, list[float]] = defaultdict(list)
+        self.cleanup_interval = cleanup_interval
+        self._clock = clock
+        self._limits = (
+            _Limit(MINUTE, per_minute, "1分間"),
+            _Limit(HOUR, per_hour, "1時間"),
+        )
+        # ユーザーID -> 時間窓ごとのカウンタ（_limits と同じ順）
+        self._users: Dict[int, Tuple[_Window, ...]] = {}
+        self._rejected_total = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "RateLimiter":
+        """
+        config.yaml の rate_limit セクションから作成
+
+        Raises:
+            ValueError: 不明なキーがある、または上限が1未満の場合
+        """
+        config = dict(config or {})
+        keys = {
+            "requests_per_minute": "per_minute",
+            "requests_per_hour": "per_hour",
+            "cleanup_interval": "cleanup_interval",
+        }
+        unknown = set(config) - set(keys)
+        if unknown:
+            raise ValueError(f"Unknown rate_limit settings: {sorted(unknown)}")
+        limiter = cls(**{keys[key]: value for key, value in config.items()})
+        if min(limiter.per_minute, limiter.per_hour) < 1:
+            raise ValueError(
+                "rate_limit.requests_per_minute / requests_per_hour must be at least 1"
+            )
+        return limiter
 
     async def check_rate_limit(self, user_id: int) -> Tuple[bool, str]:
         """
@@ -30,51 +134,53 @@ class RateLimiter:
         Returns:
             (許可されるかどうか, エラーメッセージ)
         """
-        now = time.time()
-        user_requests = self.requests[user_id]
-
-        # 古いリクエストを削除（1時間以上前のもの）
-        self.requests[user_id] = [r for r in user_requests if now - r < 3600]
-        user_requests = self.requests[user_id]
-
-        # 1分間のチェック
-        minute_ago = now - 60
-        minute_count = sum(1 for r in user_requests if r > minute_ago)
-        if minute_count >= self.per_minute:
-            remaining = int(60 - (now - min(r for r in user_requests if r > minute_ago)))
-            return False, f"レート制限: 1分間あたり{self.per_minute}リクエストまで。あと{remaining}秒お待ちください。"
-
-        # 1時間のチェック
-        if len(user_requests) >= self.per_hour:
-            # 最も古いリクエストからの経過時間を計算
-            oldest_request = min(user_requests)
-            remaining = int(3600 - (now - oldest_request))
-            return False, f"レート制限: 1時間あたり{self.per_hour}リクエストまで。あと{remaining}秒お待ちください。"
+        now = self._clock()
+        windows = self._users.get(user_id)
+        if windows is None:
+            windows = tuple(_Window(int(now // limit.span)) for limit in self._limits)
+            self._users[user_id] = windows
+
+        for limit, window in zip(self._limits, windows):
+            window.roll(int(now // limit.span))
+            if limit.estimate(window, now) + 1 > limit.limit + _TOLERANCE:
+                self._rejected_total += 1
+                remaining = max(1, math.ceil(limit.retry_after(window, now)))
+                return False, f"レート制限: {limit.label}あたり{limit.limit}リクエストまで。あと{remaining}秒お待ちください。"
 
         # リクエストを記録
-        self.requests[user_id].append(now)
+        for window in windows:
+            window.curr += 1
         return True, ""
 
-    def cleanup(self, max_age_seconds: int = 3600) -> int:
+    def cleanup(self) -> int:
         """
-        古いリクエストデータをクリーンアップ
+        カウントに影響しなくなったユーザーのデータを削除
 
-        Args:
-            max_age_seconds: 保持する最大秒数
+        全ての時間窓で直前のバケットまで空になった（最後のリクエストが
+        窓の長さの2倍以上前の）ユーザーが対象
 
         Returns:
             削除されたエントリ数
         """
-        now = time.time()
-        removed = 0
-
-        for user_id in list(self.requests.keys()):
-            self.requests[user_id] = [
-                r for r in self.requests[user_id]
-                if now - r < max_age_seconds
-            ]
-            if not self.requests[user_id]:
-                del self.requests[user_id]
-                removed += 1
-
-        return removed
+        now = self._clock()
+        current = [int(now // limit.span) for limit in self._limits]
+        expired = [
+            user_id
+            for user_id, windows in self._users.items()
+            if all(window.bucket + 1 < bucket for window, bucket in zip(windows, current))
+        ]
+        for user_id in expired:
+            del self._users[user_id]
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        統計情報を取得
+
+        Returns:
+            追跡中のユーザー数と、制限したリクエストの累計
+        """
+        return {
+            "tracked_users": len(self._users),
+            "rejected_requests": self._rejected_total,
+        }
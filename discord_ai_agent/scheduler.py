@@ -0,0 +1,349 @@
+"""Global agent concurrency scheduler with fair share across guilds and users
+
+Every agent turn spawns a Claude CLI subprocess (plus its MCP servers), so
+the number of turns running at once is capped globally, per guild and per
+user. Turns that cannot start yet wait in a weighted fair queue:
+
+- Each guild and each user accumulates virtual time: the wall-clock seconds
+  their turns ran, divided by their weight.
+- When a slot frees up, the waiting turn whose guild has the least virtual
+  time starts first, then the least-served user within it, then arrival
+  order.
+- A newcomer starts at the virtual time of the last turn started, so idle
+  periods are not banked as credit.
+
+A heavy user therefore falls behind everyone else instead of starving them.
+With max_waiting set, the wait queue itself is bounded: a turn that would
+have to wait behind max_waiting others is refused with SchedulerFull.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Called with the 1-based queue position while a turn is waiting
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class SchedulerFull(RuntimeError):
+    """Raised by acquire() when max_waiting turns are already waiting"""
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    """Settings for AgentScheduler (``scheduler`` section of config.yaml)"""
+
+    max_concurrent: int = 4  # Agent turns running at once (whole process)
+    per_guild: int = 0  # Running turns per guild (0 = no limit)
+    per_user: int = 2  # Running turns per user (0 = no limit)
+    max_waiting: int = 0  # Turns allowed to wait for a slot (0 = no limit)
+    guild_weights: Dict[int, float] = field(default_factory=dict)  # Default 1.0
+    user_weights: Dict[int, float] = field(default_factory=dict)  # Default 1.0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "SchedulerSettings":
+        """
+        Build settings from the ``scheduler`` section of config.yaml
+
+        Raises:
+            ValueError: If an unknown key is present or a limit/weight is invalid
+        """
+        config = dict(config or {})
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown scheduler settings: {sorted(unknown)}")
+        for key in ("guild_weights", "user_weights"):
+            weights = {int(k): float(v) for k, v in (config.get(key) or {}).items()}
+            if any(weight <= 0 for weight in weights.values()):
+                raise ValueError(f"scheduler.{key} must be positive")
+            config[key] = weights
+        settings = cls(**config)
+        if settings.max_concurrent < 1:
+            raise ValueError("scheduler.max_concurrent must be at least 1")
+        if min(settings.per_guild, settings.per_user, settings.max_waiting) < 0:
+            raise ValueError(
+                "scheduler.per_guild / per_user / max_waiting must not be negative"
+            )
+        return settings
+
+
+class _Ticket:
+    """One agent turn, waiting or running"""
+
+    __slots__ = ("user_id", "guild_id", "seq", "event", "granted", "started", "watch")
+
+    def __init__(self, user_id: int, guild_id: Optional[int], seq: int, watch: bool):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.seq = seq  # Arrival order (tie-breaker)
+        self.event = asyncio.Event()  # Set when granted or the queue moved
+        self.granted = False
+        self.started = 0.0  # time.monotonic() when granted
+        self.watch = watch  # Wants position updates
+
+
+class AgentScheduler:
+    """
+    Admission control for agent turns
+
+    Use ``async with scheduler.slot(user_id, guild_id): ...`` around the
+    agent run. All state lives on the event loop; nothing here blocks.
+    """
+
+    def __init__(self, settings: Optional[SchedulerSettings] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            settings: Limits and weights (default: SchedulerSettings())
+        """
+        self.settings = settings or SchedulerSettings()
+        self._seq = itertools.count()
+        self._waiting: List[_Ticket] = []
+        self._running = 0
+        self._guild_running: Dict[Optional[int], int] = {}
+        self._user_running: Dict[int, int] = {}
+        # Virtual time (weighted seconds of service) of guilds/users with
+        # work; entries at or below the floor are dropped when idle
+        self._guild_vtime: Dict[Optional[int], float] = {}
+        self._user_vtime: Dict[int, float] = {}
+        self._guild_floor = 0.0
+        self._user_floor = 0.0
+        self._rejected_total = 0  # Turns refused with SchedulerFull
+
+    def _key(self, ticket: _Ticket):
+        return (
+            self._guild_vtime[ticket.guild_id],
+            self._user_vtime[ticket.user_id],
+            ticket.seq,
+        )
+
+    def _eligible(self, ticket: _Ticket) -> bool:
+        settings = self.settings
+        if settings.per_guild and (
+            self._guild_running.get(ticket.guild_id, 0) >= settings.per_guild
+        ):
+            return False
+        if settings.per_user and (
+            self._user_running.get(ticket.user_id, 0) >= settings.per_user
+        ):
+            return False
+        return True
+
+    def _grant(self, ticket: _Ticket) -> None:
+        self._waiting.remove(ticket)
+        ticket.granted = True
+        ticket.started = time.monotonic()
+        self._running += 1
+        self._guild_running[ticket.guild_id] = (
+            self._guild_running.get(ticket.guild_id, 0) + 1
+        )
+        self._user_running[ticket.user_id] = self._user_running.get(ticket.user_id, 0) + 1
+        self._guild_floor = max(self._guild_floor, self._guild_vtime[ticket.guild_id])
+        self._user_floor = max(self._user_floor, self._user_vtime[ticket.user_id])
+        ticket.event.set()
+
+    def _dispatch(self) -> None:
+        """Start waiting turns while slots are free, in fair-share order"""
+        moved = False
+        while self._waiting and self._running < self.settings.max_concurrent:
+            eligible = [t for t in self._waiting if self._eligible(t)]
+            if not eligible:
+                break
+            self._grant(min(eligible, key=self._key))
+            moved = True
+        if moved:
+            # Positions changed: let waiters that show them refresh
+            for ticket in self._waiting:
+                if ticket.watch:
+                    ticket.event.set()
+
+    def position(self, ticket: _Ticket) -> int:
+        """
+        1-based place of a waiting turn in fair-share order
+
+        Turns ahead that are held back by their guild/user limit are not
+        counted (unless they are the same user's), so this is an estimate
+        for display.
+        """
+        key = self._key(ticket)
+        return 1 + sum(
+            1
+            for other in self._waiting
+            if self._key(other) < key
+            and (other.user_id == ticket.user_id or self._eligible(other))
+        )
+
+    def _enter(self, ticket: _Ticket) -> None:
+        # Newcomers start at the floor: idle time is not banked as credit
+        self._guild_vtime[ticket.guild_id] = max(
+            self._guild_vtime.get(ticket.guild_id, 0.0), self._guild_floor
+        )
+        self._user_vtime[ticket.user_id] = max(
+            self._user_vtime.get(ticket.user_id, 0.0), self._user_floor
+        )
+
+    async def acquire(
+        self,
+        user_id: int,
+        guild_id: Optional[int] = None,
+        on_position: Optional[PositionCallback] = None,
+    ) -> _Ticket:
+        """
+        Wait for a slot
+
+        Args:
+            user_id: Discord user ID of the requester
+            guild_id: Discord guild ID (None for DMs)
+            on_position: Awaited with the queue position when the turn has to
+                wait, and again whenever the position changes
+
+        Returns:
+            Ticket to pass to release()
+
+        Raises:
+            SchedulerFull: If the turn cannot start now and max_waiting turns
+                are already waiting
+        """
+        ticket = _Ticket(user_id, guild_id, next(self._seq), on_position is not None)
+        self._enter(ticket)
+        self._waiting.append(ticket)
+        self._dispatch()
+        if not ticket.granted and 0 < self.settings.max_waiting < len(self._waiting):
+            self._waiting.remove(ticket)
+            self._forget(ticket)
+            self._rejected_total += 1
+            logger.warning(
+                f"Agent turn refused, {self.settings.max_waiting} already waiting: "
+                f"user={user_id}, guild={guild_id}"
+            )
+            raise SchedulerFull(f"{self.settings.max_waiting} agent turns already waiting")
+
+        shown = None
+        try:
+            while not ticket.granted:
+                ticket.event.clear()
+                position = self.position(ticket)
+                if on_position is not None and position != shown:
+                    shown = position
+                    await on_position(position)
+                    continue  # The queue may have moved while awaiting
+                await ticket.event.wait()
+        except BaseException:
+            if ticket.granted:
+                self.release(ticket)
+            else:
+                self._waiting.remove(ticket)
+                self._dispatch()
+                self._forget(ticket)
+            raise
+
+        if shown is not None:
+            logger.info(
+                f"Agent slot granted after queueing: user={user_id}, guild={guild_id}"
+            )
+        return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        """
+        Free a slot and charge the turn's run time to its guild and user
+
+        Args:
+            ticket: Ticket returned by acquire()
+        """
+        elapsed = time.monotonic() - ticket.started
+        settings = self.settings
+        self._running -= 1
+        self._decrement(self._guild_running, ticket.guild_id)
+        self._decrement(self._user_running, ticket.user_id)
+        self._guild_vtime[ticket.guild_id] += elapsed / settings.guild_weights.get(
+            ticket.guild_id, 1.0
+        )
+        self._user_vtime[ticket.user_id] += elapsed / settings.user_weights.get(
+            ticket.user_id, 1.0
+        )
+        self._dispatch()
+        self._forget(ticket)
+
+    @staticmethod
+    def _decrement(counts: Dict[Any, int], key: Any) -> None:
+        if counts[key] <= 1:
+            del counts[key]
+        else:
+            counts[key] -= 1
+
+    def _forget(self, ticket: _Ticket) -> None:
+        # Drop virtual times that no longer matter: nothing waiting or running,
+        # and a newcomer would be raised to the floor anyway
+        has_work = any(
+            t.guild_id == ticket.guild_id or t.user_id == ticket.user_id
+            for t in self._waiting
+        )
+        if has_work:
+            return
+        if (
+            ticket.guild_id not in self._guild_running
+            and self._guild_vtime.get(ticket.guild_id, 0.0) <= self._guild_floor
+        ):
+            self._guild_vtime.pop(ticket.guild_id, None)
+        if (
+            ticket.user_id not in self._user_running
+            and self._user_vtime.get(ticket.user_id, 0.0) <= self._user_floor
+        ):
+            self._user_vtime.pop(ticket.user_id, None)
+
+    def is_saturated(self) -> bool:
+        """True if a new turn that has to wait would be refused"""
+        settings = self.settings
+        return (
+            settings.max_waiting > 0
+            and len(self._waiting) >= settings.max_waiting
+            and self._running >= settings.max_concurrent
+        )
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: int,
+        guild_id: Optional[int] = None,
+        on_position: Optional[PositionCallback] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of the block
+
+        Args:
+            user_id: Discord user ID of the requester
+            guild_id: Discord guild ID (None for DMs)
+            on_position: See acquire()
+
+        Raises:
+            SchedulerFull: See acquire()
+        """
+        ticket = await self.acquire(user_id, guild_id, on_position)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get scheduler statistics
+
+        Returns:
+            Dictionary with running/waiting turn counts, the limit and the
+            number of turns refused because the wait queue was full
+        """
+        return {
+            "running": self._running,
+            "waiting": len(self._waiting),
+            "max_concurrent": self.settings.max_concurrent,
+            "tracked_users": len(self._user_vtime),
+            "rejected_turns": self._rejected_total,
+        }
@@ -0,0 +1,108 @@
+"""ThreadOwnership leases, claims and ack tombstones against real backends"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from discord_ai_agent.database import open_backend
+from discord_ai_agent.ownership import LeaseSettings, ThreadOwnership
+
+BOT_ID = 1
+THREAD_ID = 100
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite"])
+async def store(request, tmp_path):
+    url = "memory://" if request.param == "memory" else None
+    backend = open_backend(url, str(tmp_path / "sessions.db"))
+    await backend.start()
+    yield backend
+    await backend.close()
+
+
+def node(store, node_id: str, ttl: float = 30.0) -> ThreadOwnership:
+    return ThreadOwnership(
+        store, LeaseSettings(enabled=True, ttl=ttl, heartbeat=ttl / 4, node_id=node_id)
+    )
+
+
+async def enqueue(store, message_id: int) -> bool:
+    return await store.enqueue_message(
+        BOT_ID, THREAD_ID, message_id, user_id=7, content=f"message {message_id}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_live_lease_blocks_second_owner(store):
+    first, second = node(store, "a"), node(store, "b")
+
+    assert await first.acquire(THREAD_ID)
+    assert not await second.acquire(THREAD_ID)
+    assert THREAD_ID in first.held
+    assert THREAD_ID not in second.held
+    # The holder itself may extend its lease
+    assert await first.acquire(THREAD_ID)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_can_be_taken_over(store):
+    first, second = node(store, "a", ttl=0.2), node(store, "b", ttl=0.2)
+
+    assert await first.acquire(THREAD_ID)
+    await asyncio.sleep(0.4)
+
+    assert await second.acquire(THREAD_ID)
+    # The stale holder finds out on its next heartbeat
+    assert await first.renew() == [THREAD_ID]
+    assert THREAD_ID not in first.held
+
+
+@pytest.mark.asyncio
+async def test_released_lease_is_free_at_once(store):
+    first, second = node(store, "a"), node(store, "b")
+
+    assert await first.acquire(THREAD_ID)
+    await first.release(THREAD_ID)
+
+    assert await second.acquire(THREAD_ID)
+
+
+@pytest.mark.asyncio
+async def test_only_one_node_claims_a_message(store):
+    first, second = node(store, "a"), node(store, "b")
+    assert await enqueue(store, 500)
+
+    claimed = await asyncio.gather(
+        first.claim(THREAD_ID, [500]), second.claim(THREAD_ID, [500])
+    )
+
+    assert sorted(claimed) == [[], [500]]
+    assert await first.pending(BOT_ID, THREAD_ID) == []
+
+
+@pytest.mark.asyncio
+async def test_late_delivery_of_acked_message_is_dropped(store):
+    owner = node(store, "a")
+    assert await enqueue(store, 600)
+    # The same message delivered to a second node before it was handled
+    assert not await enqueue(store, 600)
+
+    assert await owner.claim(THREAD_ID, [600]) == [600]
+    assert await owner.ack(THREAD_ID, [600]) == 1
+
+    assert not await enqueue(store, 600)
+    assert await store.load_thread_queue(BOT_ID, THREAD_ID) == []
+
+
+@pytest.mark.asyncio
+async def test_pruned_tombstone_no_longer_dedupes(store):
+    owner = ThreadOwnership(
+        store, LeaseSettings(enabled=True, node_id="a", dedupe_window=0)
+    )
+    assert await enqueue(store, 700)
+    await owner.ack(THREAD_ID, [700])
+    await asyncio.sleep(0.05)
+
+    assert await owner.prune() == 1
+    assert await enqueue(store, 700)
@@ -0,0 +1,150 @@
+"""AgentScheduler fairness, limits and wait-queue bounds"""
+
+import asyncio
+from collections import Counter
+
+import pytest
+
+from discord_ai_agent.scheduler import AgentScheduler, SchedulerFull, SchedulerSettings
+
+
+async def waiting(scheduler: AgentScheduler, count: int) -> None:
+    """Let queued tasks run until count turns are waiting"""
+    for _ in range(100):
+        if scheduler.get_stats()["waiting"] == count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {count} waiting: {scheduler.get_stats()}")
+
+
+@pytest.mark.asyncio
+async def test_backlog_does_not_starve_other_user():
+    scheduler = AgentScheduler(SchedulerSettings(max_concurrent=1, per_user=0))
+    order = []
+
+    async def turn(user_id: int):
+        async with scheduler.slot(user_id, guild_id=1):
+            order.append(user_id)
+            await asyncio.sleep(0.01)
+
+    first = await scheduler.acquire(1, guild_id=1)
+    await asyncio.sleep(0.01)
+    backlog = [asyncio.create_task(turn(1)) for _ in range(3)]
+    await waiting(scheduler, 3)
+    other = asyncio.create_task(turn(2))
+    await waiting(scheduler, 4)
+
+    scheduler.release(first)
+    await asyncio.gather(*backlog, other)
+
+    # User 1 already ran, so user 2 goes ahead of its earlier backlog
+    assert order == [2, 1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_busy_guild_does_not_starve_other_guild():
+    scheduler = AgentScheduler(SchedulerSettings(max_concurrent=1, per_user=0))
+    order = []
+
+    async def turn(user_id: int, guild_id: int):
+        async with scheduler.slot(user_id, guild_id):
+            order.append(guild_id)
+            await asyncio.sleep(0.01)
+
+    first = await scheduler.acquire(1, guild_id=1)
+    await asyncio.sleep(0.01)
+    # Different users, so only the guild's service time holds them back
+    backlog = [asyncio.create_task(turn(user_id, 1)) for user_id in (2, 3, 4)]
+    await waiting(scheduler, 3)
+    other = asyncio.create_task(turn(5, 2))
+    await waiting(scheduler, 4)
+
+    scheduler.release(first)
+    await asyncio.gather(*backlog, other)
+
+    assert order == [2, 1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_per_user_and_per_guild_limits():
+    settings = SchedulerSettings(max_concurrent=10, per_guild=3, per_user=2)
+    scheduler = AgentScheduler(settings)
+    users, guilds = Counter(), Counter()
+    peak_users, peak_guilds = Counter(), Counter()
+    peak_total = 0
+
+    async def turn(user_id: int, guild_id: int):
+        nonlocal peak_total
+        async with scheduler.slot(user_id, guild_id):
+            users[user_id] += 1
+            guilds[guild_id] += 1
+            peak_users[user_id] = max(peak_users[user_id], users[user_id])
+            peak_guilds[guild_id] = max(peak_guilds[guild_id], guilds[guild_id])
+            peak_total = max(peak_total, scheduler.get_stats()["running"])
+            await asyncio.sleep(0.01)
+            users[user_id] -= 1
+            guilds[guild_id] -= 1
+
+    turns = [(1, 1)] * 4 + [(2, 1)] * 4 + [(3, 2)] * 4
+    await asyncio.gather(*(turn(user_id, guild_id) for user_id, guild_id in turns))
+
+    assert peak_users == {1: 2, 2: 2, 3: 2}
+    assert peak_guilds == {1: 3, 2: 2}
+    assert peak_total == 5
+    assert scheduler.get_stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_max_waiting_refuses_new_turns():
+    scheduler = AgentScheduler(
+        SchedulerSettings(max_concurrent=1, per_user=0, max_waiting=2)
+    )
+    held = await scheduler.acquire(1)
+    waiters = [asyncio.create_task(scheduler.acquire(user_id)) for user_id in (2, 3)]
+    await waiting(scheduler, 2)
+    assert scheduler.is_saturated()
+
+    with pytest.raises(SchedulerFull):
+        await scheduler.acquire(4)
+
+    stats = scheduler.get_stats()
+    assert stats["waiting"] == 2
+    assert stats["rejected_turns"] == 1
+
+    scheduler.release(held)
+    for waiter in waiters:
+        scheduler.release(await waiter)
+    assert scheduler.get_stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_frees_its_place():
+    scheduler = AgentScheduler(
+        SchedulerSettings(max_concurrent=1, per_user=0, max_waiting=1)
+    )
+    held = await scheduler.acquire(1)
+    cancelled = asyncio.create_task(scheduler.acquire(2))
+    await waiting(scheduler, 1)
+    with pytest.raises(SchedulerFull):
+        await scheduler.acquire(3)
+
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert scheduler.get_stats()["waiting"] == 0
+
+    # The freed place is taken by the next turn, which starts on release
+    positions = []
+
+    async def on_position(position: int):
+        positions.append(position)
+
+    waiter = asyncio.create_task(scheduler.acquire(3, on_position=on_position))
+    await waiting(scheduler, 1)
+    scheduler.release(held)
+    ticket = await waiter
+    scheduler.release(ticket)
+
+    assert positions == [1]
+    stats = scheduler.get_stats()
+    assert (stats["running"], stats["waiting"], stats["rejected_turns"]) == (0, 0, 1)